@@ -1,18 +1,29 @@
 from flask import Flask, jsonify, request, send_from_directory, send_file
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from flask_migrate import Migrate
+from sqlalchemy.orm import selectinload, undefer, Load
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
 import uuid
 import json
+import hashlib
+import tempfile
+import threading
 from functools import wraps
 import re
 from slugify import slugify
 from dotenv import load_dotenv
+from storage import get_storage
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
 
 # Load environment variables
 load_dotenv()
@@ -23,7 +34,8 @@ app = Flask(__name__, static_folder=None)
 # Configuration
 DATABASE_URL = os.environ.get('DATABASE_URL')
 # Use absolute path for database to ensure it works regardless of working directory
-db_path = os.path.join(os.path.dirname(__file__), 'instance', 'cms.db')
+# (CMS_DB_PATH points the app at another SQLite file, e.g. the benchmark database)
+db_path = os.environ.get('CMS_DB_PATH') or os.path.join(os.path.dirname(__file__), 'instance', 'cms.db')
 if DATABASE_URL:
     # Production database (SQLite - same as local)
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
@@ -33,13 +45,81 @@ else:
 
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'your-cms-secret-key-change-this-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+# Access tokens are short-lived and carry the user's role; clients renew them with the refresh token
+app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', 15)))
+app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS', 30)))
+app.config['TOKEN_REVOCATION_SYNC_SECONDS'] = int(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', 60))
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
-app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'uploads')
+app.config['UPLOAD_FOLDER'] = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.path.dirname(__file__), 'uploads')
+
+# Media storage backend: 'local' (UPLOAD_FOLDER) or 's3' (any S3-compatible bucket, e.g. MinIO)
+app.config['MEDIA_STORAGE'] = os.environ.get('MEDIA_STORAGE', 'local')
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')
+app.config['S3_REGION'] = os.environ.get('S3_REGION')
+app.config['S3_ACCESS_KEY_ID'] = os.environ.get('S3_ACCESS_KEY_ID')
+app.config['S3_SECRET_ACCESS_KEY'] = os.environ.get('S3_SECRET_ACCESS_KEY')
+app.config['S3_PREFIX'] = os.environ.get('S3_PREFIX', '')
+app.config['S3_PUBLIC_URL'] = os.environ.get('S3_PUBLIC_URL')  # e.g. a CDN in front of the bucket
+app.config['S3_URL_EXPIRES'] = int(os.environ.get('S3_URL_EXPIRES', 3600))
+
+# Public comment intake (see comment_ingest.py). Rates are "burst/seconds".
+app.config['COMMENT_RATE_LIMIT'] = os.environ.get('COMMENT_RATE_LIMIT', '5/60')  # per client IP and post
+app.config['COMMENT_POST_RATE_LIMIT'] = os.environ.get('COMMENT_POST_RATE_LIMIT', '60/60')  # per post, all clients
+app.config['COMMENT_DUPLICATE_WINDOW'] = int(os.environ.get('COMMENT_DUPLICATE_WINDOW', 3600))
+app.config['COMMENT_MAX_LINKS'] = int(os.environ.get('COMMENT_MAX_LINKS', 2))
+app.config['COMMENT_MAX_LENGTH'] = int(os.environ.get('COMMENT_MAX_LENGTH', 5000))
+app.config['COMMENT_WRITE_QUEUE'] = os.environ.get('COMMENT_WRITE_QUEUE', 'true').lower() == 'true'
+app.config['COMMENT_BATCH_SIZE'] = int(os.environ.get('COMMENT_BATCH_SIZE', 100))
+app.config['COMMENT_BATCH_WAIT'] = float(os.environ.get('COMMENT_BATCH_WAIT', 0.05))
+app.config['COMMENT_SAVE_WAIT'] = float(os.environ.get('COMMENT_SAVE_WAIT', 2))  # then 202, still queued
+
+# Password hashing (see passwords.py): a Werkzeug method such as "scrypt:32768:8:1" or "pbkdf2:sha256:600000"
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+app.config['PASSWORD_HASH_THREADS'] = int(os.environ.get('PASSWORD_HASH_THREADS', 2))
+app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+
+# Seconds a worker reuses the admin dashboard payload (0 disables the cache)
+app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', 30))
+
+# Reverse proxies in front of the app (Render adds one), so request.remote_addr is the real client
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1 if os.environ.get('RENDER') else 0))
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+# Create the tables and default data on the first request when nothing initialized them earlier
+app.config['AUTO_INIT_DB'] = os.environ.get('AUTO_INIT_DB', 'true').lower() == 'true'
 
-# Create upload folders
-for folder in ['uploads', 'uploads/images', 'uploads/documents', 'uploads/themes', 'uploads/plugins']:
-    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], folder.split('/')[-1]), exist_ok=True)
+# Request instrumentation (see instrumentation.py): Server-Timing header, JSON request log,
+# slow statement log threshold and how often one SELECT may repeat in a request before it is flagged as N+1
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', 'true').lower() == 'true'
+app.config['REQUEST_LOG'] = os.environ.get('REQUEST_LOG', 'true').lower() == 'true'
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))
+
+# JSON responses (see json_provider.py): encoder (auto uses orjson when installed, else stdlib)
+# and the list length from which list responses are streamed in chunks (0 never streams)
+app.config['JSON_PROVIDER'] = os.environ.get('JSON_PROVIDER', 'auto').lower()
+app.config['JSON_STREAM_MIN_ITEMS'] = int(os.environ.get('JSON_STREAM_MIN_ITEMS', 200))
+
+# HTML snapshots of the public pages (see prerender.py), served instead of the bare SPA shell
+app.config['PRERENDER'] = os.environ.get('PRERENDER', 'true').lower() == 'true'
+app.config['PRERENDER_DIR'] = os.environ.get('PRERENDER_DIR') or os.path.join(app.instance_path, 'prerender')
+
+# Prometheus metrics (see metrics.py): per-process snapshots shared by all workers, how often each
+# worker writes its snapshot, and the bearer token scrapers must send (without one only loopback clients may scrape)
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR') or os.path.join(app.instance_path, 'metrics')
+app.config['METRICS_FLUSH_SECONDS'] = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Admin profiling (see profiler.py): off unless enabled; longest sample and sampling interval
+app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
+app.config['PROFILER_MAX_SECONDS'] = float(os.environ.get('PROFILER_MAX_SECONDS', 60))
+app.config['PROFILER_INTERVAL_MS'] = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+
+# Batched data migrations (see data_migrations.py): rows per write transaction and the pause between batches
+app.config['BACKFILL_BATCH_SIZE'] = int(os.environ.get('BACKFILL_BATCH_SIZE', 500))
+app.config['BACKFILL_PAUSE_MS'] = int(os.environ.get('BACKFILL_PAUSE_MS', 100))
 
 ALLOWED_EXTENSIONS = {
     # Images
@@ -57,7 +137,7 @@ ALLOWED_EXTENSIONS = {
 }
 
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+migrate = Migrate(app, db, render_as_batch=True)  # SQLite needs batch mode to alter columns
 jwt = JWTManager(app)
 CORS(app)
 
@@ -73,9 +153,10 @@ class User(db.Model):
     last_name = db.Column(db.String(50))
     role = db.Column(db.String(20), default='subscriber')  # admin, editor, author, contributor, subscriber
     avatar_url = db.Column(db.String(255))
-    bio = db.Column(db.Text)
+    # Profile text is only read when a user is serialized (see USER_PROFILE), not on every permission check
+    bio = db.deferred(db.Column(db.Text), group='profile')
     website = db.Column(db.String(255))
-    social_links = db.Column(db.Text)  # JSON string
+    social_links = db.deferred(db.Column(db.Text), group='profile')  # JSON string
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -86,7 +167,7 @@ class User(db.Model):
     media_files = db.relationship('Media', backref='uploader', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -121,6 +202,7 @@ class Category(db.Model):
     meta_description = db.Column(db.Text)
     is_visible = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Self-referential relationship for parent/child categories
     children = db.relationship('Category', backref=db.backref('parent', remote_side=[id]))
@@ -154,6 +236,7 @@ class Tag(db.Model):
     slug = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def to_dict(self):
         return {
@@ -176,7 +259,7 @@ class Post(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     slug = db.Column(db.String(255), unique=True, nullable=False)
-    content = db.Column(db.Text)
+    content = db.deferred(db.Column(db.Text))  # the article HTML; lists never need it (see POST_CONTENT)
     excerpt = db.Column(db.Text)
     featured_image = db.Column(db.String(255))
     status = db.Column(db.String(20), default='draft')  # draft, published, private, trash
@@ -192,6 +275,9 @@ class Post(db.Model):
     published_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Approved comments only; kept in sync by the comment routes (see refresh_post_comment_stats)
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_comment_at = db.Column(db.DateTime)
     
     # Relationships
     category = db.relationship('Category', backref='posts')
@@ -232,7 +318,8 @@ class Post(db.Model):
             'published_at': self.published_at.isoformat() if self.published_at else None,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat(),
-            'comments_count': len(self.comments)
+            'comments_count': self.comments_count or 0,
+            'last_comment_at': self.last_comment_at.isoformat() if self.last_comment_at else None
         }
         
         if include_content:
@@ -246,7 +333,7 @@ class PostRevision(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
     title = db.Column(db.String(255))
-    content = db.Column(db.Text)
+    content = db.deferred(db.Column(db.Text))
     excerpt = db.Column(db.Text)
     revision_type = db.Column(db.String(20), default='revision')  # revision, autosave
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
@@ -258,16 +345,17 @@ class Comment(db.Model):
     __tablename__ = 'comments'
     
     id = db.Column(db.Integer, primary_key=True)
-    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), nullable=False, index=True)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     author_name = db.Column(db.String(100))
     author_email = db.Column(db.String(120))
     author_website = db.Column(db.String(255))
     author_ip = db.Column(db.String(45))
-    content = db.Column(db.Text, nullable=False)
+    content = db.deferred(db.Column(db.Text, nullable=False))  # see COMMENT_CONTENT
     status = db.Column(db.String(20), default='pending')  # approved, pending, spam, trash
     parent_id = db.Column(db.Integer, db.ForeignKey('comments.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Self-referential relationship for reply comments
     replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]))
@@ -310,7 +398,18 @@ class Media(db.Model):
     caption = db.Column(db.Text)
     description = db.Column(db.Text)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the file bytes, shared by duplicate uploads
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def storage_key(self):
+        """Storage key of the physical file, resolved from the public URL.
+
+        ``file_path`` is specific to the backend and host that did the upload,
+        so the URL is the portable reference shared by deduplicated rows.
+        """
+        return upload_key(self.url)
     
     def to_dict(self):
         return {
@@ -327,9 +426,25 @@ class Media(db.Model):
             'description': self.description,
             'uploaded_by': self.uploaded_by,
             'uploader': self.uploader.to_dict() if self.uploader else None,
+            'content_hash': self.content_hash,
             'created_at': self.created_at.isoformat()
         }
 
+# Relationships read by to_dict(), loaded for a whole list of rows with one IN query
+# per relationship instead of lazily per row (budgets: benchmarks/query_budgets.py)
+CATEGORY_TREE = selectinload(Category.children, recursion_depth=-1)
+POST_RELATIONS = (
+    selectinload(Post.author).undefer_group('profile'),
+    selectinload(Post.category).selectinload(Category.children, recursion_depth=-1),
+    selectinload(Post.tags)
+)
+MEDIA_RELATIONS = (selectinload(Media.uploader).undefer_group('profile'),)
+
+# Deferred columns, loaded up front by the queries that serialize them
+USER_PROFILE = Load(User).undefer_group('profile')
+POST_CONTENT = undefer(Post.content)
+COMMENT_CONTENT = undefer(Comment.content)
+
 class Setting(db.Model):
     __tablename__ = 'settings'
     
@@ -367,17 +482,131 @@ class Plugin(db.Model):
     settings = db.Column(db.Text)  # JSON string
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class TokenRevocation(db.Model):
+    """A revoked token (jti), or every token of user_id issued before not_before"""
+    __tablename__ = 'token_revocations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), index=True)
+    user_id = db.Column(db.Integer, index=True)
+    not_before = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DataMigration(db.Model):
+    """Progress of a batched backfill (see data_migrations.py)"""
+    __tablename__ = 'data_migrations'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)  # highest primary key processed so far
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+
+class DeletedRecord(db.Model):
+    """Tombstone of a deleted row, so incremental exports can pass deletes on (see content_export.py)"""
+    __tablename__ = 'deleted_records'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    record_type = db.Column(db.String(20), nullable=False)  # export record type: post, comment, ...
+    record_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def parse_utc_datetime(value):
+    """Parse an ISO 8601 timestamp into the naive UTC datetime the database stores; None for empty values.
+
+    Offsets are converted to UTC (``09:00+09:00`` is 00:00); timestamps without one are taken as UTC.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def upload_key(url):
+    """Turn a public ``/uploads/<folder>/<name>`` URL into a storage key (``<folder>/<name>``)"""
+    if url and url.startswith('/uploads/'):
+        url = url[len('/uploads/'):]
+    return url or ''
+
+def media_type_for(ext):
+    """Return (file_type, folder) for an allowed file extension"""
+    if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp', 'tiff']:
+        return 'image', 'images'
+    elif ext in ['mp4', 'webm', 'ogg', 'avi', 'mov', 'wmv', 'flv', 'mkv']:
+        return 'video', 'documents'
+    elif ext in ['mp3', 'wav', 'ogg', 'm4a', 'aac', 'flac']:
+        return 'audio', 'documents'
+    elif ext in ['pdf']:
+        return 'pdf', 'documents'
+    elif ext in ['doc', 'docx']:
+        return 'word', 'documents'
+    elif ext in ['xls', 'xlsx']:
+        return 'excel', 'documents'
+    elif ext in ['ppt', 'pptx']:
+        return 'powerpoint', 'documents'
+    elif ext in ['zip', 'rar', '7z', 'tar', 'gz']:
+        return 'archive', 'documents'
+    elif ext in ['txt', 'csv', 'json', 'xml']:
+        return 'text', 'documents'
+    return 'document', 'documents'
+
+def hash_stream(stream, chunk_size=64 * 1024):
+    """Return (sha256_hex, size) of a binary stream, read in chunks"""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def save_hashed_upload(stream, temp_dir, chunk_size=64 * 1024):
+    """Stream an upload into a temp file inside temp_dir while hashing it.
+
+    Returns (temp_path, sha256_hex, size). The caller either stores the temp
+    file under its content-addressed key or removes it when the bytes already exist.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(prefix='.upload-', dir=temp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), size
+
+def stored_key_for_hash(content_hash):
+    """Storage key of an already stored file with the same bytes, or None"""
+    existing = Media.query.filter_by(content_hash=content_hash).order_by(Media.id).first()
+    if existing and get_storage().exists(existing.storage_key):
+        return existing.storage_key
+    return None
+
 def role_required(roles):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            current_user_id = get_jwt_identity()
-            user = User.query.get(current_user_id)
-            if not user or user.role not in roles:
+            # Access tokens carry the role; revoked tokens never get this far
+            role = get_jwt().get('role')
+            if role is None:
+                # Token issued before role claims existed
+                user = User.query.get(get_jwt_identity())
+                role = user.role if user else None
+            if role not in roles:
                 return jsonify({'error': 'Insufficient permissions'}), 403
             return f(*args, **kwargs)
         return decorated_function
@@ -426,6 +655,63 @@ def create_tables():
         
         db.session.commit()
 
+def create_upload_folders():
+    for folder in ['images', 'documents', 'themes', 'plugins']:
+        os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], folder), exist_ok=True)
+
+# One-time initialization is not run at import, so workers boot without
+# touching the database and a preloading gunicorn master can fork safely.
+# gunicorn.conf.py runs it in the master before forking, `flask init-db`
+# runs it explicitly, and otherwise the first request does.
+_initialized = False
+_init_lock = threading.Lock()
+
+def ensure_initialized():
+    """Create upload folders, tables and default data once per process.
+
+    A file lock in the instance folder serializes processes, so workers
+    starting together do not race on create_all or the default admin.
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        os.makedirs(app.instance_path, exist_ok=True)
+        with open(os.path.join(app.instance_path, 'init.lock'), 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                create_upload_folders()
+                with app.app_context():
+                    create_tables()
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        _initialized = True
+
+@app.before_request
+def initialize_on_first_request():
+    if not _initialized and app.config['AUTO_INIT_DB']:
+        ensure_initialized()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables, the default admin user, settings and upload folders."""
+    ensure_initialized()
+    print("Database initialized")
+
+def create_app(initialize=False):
+    """Return the app with every route and CLI command registered.
+
+    The app is a module-level singleton (routes register on it at import);
+    this only decides whether to run the one-time initialization now.
+    """
+    if initialize:
+        ensure_initialized()
+    return app
+
 # Static files are automatically served by Flask since we specified static_folder='static'
 
 # Serve manifest.json and other root static files  
@@ -460,6 +746,13 @@ def serve_react_app(path):
         path.startswith('static/')):
         return jsonify({'error': 'Not found'}), 404
     
+    # Public pages with a prerendered snapshot (home, posts, categories, tags)
+    if app.config['PRERENDER']:
+        from prerender import snapshot_response
+        snapshot = snapshot_response(path)
+        if snapshot is not None:
+            return snapshot
+    
     # Serve index.html for all other routes (React Router will handle them)
     # Try templates directory first, then static directory
     templates_index = os.path.join(app.root_path, 'templates', 'index.html')
@@ -592,10 +885,6 @@ def debug_paths():
 # Import routes to register them (after all local routes are defined)
 from routes import *
 
-# Create tables and default data
-with app.app_context():
-    create_tables()
-
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 5000))
@@ -612,4 +901,5 @@ if __name__ == '__main__':
         print("  Password: admin123")
         print("\n" + "="*60 + "\n")
     
+    ensure_initialized()
     app.run(debug=debug, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Access/refresh tokens and token revocation.
+
+Access tokens live for JWT_ACCESS_TOKEN_EXPIRES (15 minutes by default)
+and carry the user's role, so ``role_required`` needs no query. Clients
+renew them at POST /api/auth/refresh with the long-lived refresh token,
+which re-reads the user and refuses inactive accounts.
+
+Revocations (logout, deactivation, role or password changes, deletion) are
+rows in ``token_revocations``. Each worker mirrors the live rows in memory
+and re-syncs them with one incremental query whenever the stamp file next
+to the database changes (every committed revocation touches it) or at
+least every TOKEN_REVOCATION_SYNC_SECONDS. Checking a token on a request
+therefore costs a stat() call, not a database round trip, and a
+revocation takes effect in every worker on the next request.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app_unified import app, db, jwt, TokenRevocation
+
+def access_claims(user):
+    return {'role': user.role}
+
+def issue_access_token(user):
+    return create_access_token(identity=str(user.id), additional_claims=access_claims(user))
+
+def issue_tokens(user):
+    return {
+        'access_token': issue_access_token(user),
+        'refresh_token': create_refresh_token(identity=str(user.id))
+    }
+
+def _utc_timestamp(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+class RevocationCache:
+    """In-memory copy of the live token_revocations rows"""
+
+    def __init__(self, stamp_path, sync_seconds=60):
+        self.stamp_path = stamp_path
+        self.sync_seconds = sync_seconds
+        self.revoked_jtis = {}  # jti -> expiry timestamp
+        self.not_before = {}  # user_id -> tokens issued at or before this timestamp are revoked
+        self.last_id = 0
+        self.stamp_mtime = None
+        self.synced_at = 0
+        self.lock = threading.Lock()
+
+    def _stamp(self):
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def touch(self):
+        with open(self.stamp_path, 'a'):
+            pass
+        os.utime(self.stamp_path)
+
+    def sync(self):
+        stamp = self._stamp()
+        now = time.monotonic()
+        if stamp == self.stamp_mtime and now - self.synced_at < self.sync_seconds:
+            return
+
+        with self.lock:
+            rows = db.session.query(
+                TokenRevocation.id, TokenRevocation.jti, TokenRevocation.user_id,
+                TokenRevocation.not_before, TokenRevocation.expires_at
+            ).filter(TokenRevocation.id > self.last_id).order_by(TokenRevocation.id).all()
+            for row_id, jti, user_id, not_before, expires_at in rows:
+                if jti:
+                    self.revoked_jtis[jti] = _utc_timestamp(expires_at)
+                if user_id and not_before:
+                    self.not_before[user_id] = max(self.not_before.get(user_id, 0), _utc_timestamp(not_before))
+                self.last_id = row_id
+
+            # Expired tokens are rejected anyway; forget their revocations
+            wall_now = time.time()
+            for jti in [jti for jti, expires in self.revoked_jtis.items() if expires < wall_now]:
+                del self.revoked_jtis[jti]
+
+            self.stamp_mtime = stamp
+            self.synced_at = now
+
+    def is_revoked(self, payload):
+        self.sync()
+        if payload.get('jti') in self.revoked_jtis:
+            return True
+        not_before = self.not_before.get(int(payload['sub']))
+        # iat has one-second resolution, so tokens from the revocation's second are revoked too
+        return not_before is not None and payload.get('iat', 0) <= int(not_before)
+
+def get_revocation_cache():
+    cache = current_app.extensions.get('token_revocations')
+    if cache is None:
+        cache = current_app.extensions['token_revocations'] = RevocationCache(
+            os.path.join(current_app.instance_path, 'token_revocations.stamp'),
+            sync_seconds=current_app.config['TOKEN_REVOCATION_SYNC_SECONDS']
+        )
+    return cache
+
+def _mark_changed():
+    db.session.info['token_revocations_changed'] = True
+
+def _prune_expired():
+    TokenRevocation.query.filter(TokenRevocation.expires_at < datetime.utcnow()).delete(synchronize_session=False)
+
+def revoke_token(payload):
+    """Revoke one decoded token (e.g. on logout); the caller commits"""
+    _prune_expired()
+    db.session.add(TokenRevocation(
+        jti=payload['jti'],
+        user_id=int(payload['sub']),
+        expires_at=datetime.utcfromtimestamp(payload['exp'])
+    ))
+    _mark_changed()
+
+def revoke_user_tokens(user_id):
+    """Revoke every access and refresh token issued to a user so far; the caller commits"""
+    _prune_expired()
+    now = datetime.utcnow()
+    db.session.add(TokenRevocation(
+        user_id=user_id,
+        not_before=now,
+        # Tokens issued before now are all expired after the longest token lifetime
+        expires_at=now + max(app.config['JWT_ACCESS_TOKEN_EXPIRES'], app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+    ))
+    _mark_changed()
+
+@event.listens_for(Session, 'after_commit')
+def _publish_revocations(session):
+    # No SQL can run here; every worker (this one included) re-syncs on its next check
+    if session.info.pop('token_revocations_changed', False):
+        get_revocation_cache().touch()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revocations(session):
+    session.info.pop('token_revocations_changed', None)
+
+@jwt.token_in_blocklist_loader
+def is_token_revoked(jwt_header, jwt_payload):
+    return get_revocation_cache().is_revoked(jwt_payload)
@@ -0,0 +1,14 @@
+"""
+Load benchmarks against a seeded copy of the CMS.
+
+    cd cms-backend
+    python -m benchmarks seed                      # 10k posts, 200k comments, 5k tags
+    python -m benchmarks run --label before        # Flask test client, in process
+    python -m benchmarks run --target gunicorn --concurrency 8 --label before
+    python -m benchmarks compare results/<a>.json results/<b>.json
+    python -m benchmarks json                      # JSON encoding cost, stdlib vs orjson
+
+Everything runs against benchmarks/data/bench.db and benchmarks/data/uploads
+(CMS_DB_PATH / UPLOAD_FOLDER), never the real instance database. Results are
+written to benchmarks/results/ as JSON.
+"""
@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+
+# The app reads these at import, so they are set before anything imports app_unified
+BENCH_ENV = {
+    'CMS_DB_PATH': os.path.join(DATA_DIR, 'bench.db'),
+    'UPLOAD_FOLDER': os.path.join(DATA_DIR, 'uploads'),
+    'METRICS_DIR': os.path.join(DATA_DIR, 'metrics'),
+    'PRERENDER_DIR': os.path.join(DATA_DIR, 'prerender'),
+    # Per-request log lines and slow/N+1 warnings would be measured too
+    'REQUEST_LOG': 'false',
+    'SLOW_QUERY_MS': '60000',
+    'N_PLUS_ONE_THRESHOLD': '1000000',
+    # Comment flood clients are told apart by X-Forwarded-For
+    'TRUSTED_PROXIES': '1',
+}
+
+def _load_app():
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    for key, value in BENCH_ENV.items():
+        os.environ.setdefault(key, value)
+    os.makedirs(DATA_DIR, exist_ok=True)
+    from app_unified import app
+    return app
+
+def seed_command(args):
+    db_path = BENCH_ENV['CMS_DB_PATH']
+    if os.path.exists(db_path):
+        if not args.force:
+            sys.exit(f"{db_path} already exists; use --force to regenerate it")
+        os.remove(db_path)
+    app = _load_app()
+    from benchmarks.seed import DEFAULT_SIZES, seed
+
+    sizes = {name: max(int(count * args.scale), 1) for name, count in DEFAULT_SIZES.items()}
+    sizes.update({name: getattr(args, name) for name in DEFAULT_SIZES if getattr(args, name) is not None})
+    with app.app_context():
+        seed(sizes, rng_seed=args.seed)
+    print(f"Benchmark database written to {db_path}")
+
+def run_command(args):
+    if not os.path.exists(BENCH_ENV['CMS_DB_PATH']):
+        sys.exit("No benchmark database; run `python -m benchmarks seed` first")
+    app = _load_app()
+    from app_unified import db, Post, Comment, Tag, Media
+    from benchmarks.runner import ClientTarget, GunicornTarget, environment, login, print_report, run_scenario, save_result
+    from benchmarks.scenarios import SCENARIOS, Context
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    with app.app_context():
+        ctx = Context.from_database()
+        dataset = {model.__tablename__: db.session.query(model).count() for model in (Post, Comment, Tag, Media)}
+        db.engine.dispose()
+
+    if args.target == 'gunicorn':
+        target = GunicornTarget({key: os.environ[key] for key in BENCH_ENV}, workers=args.workers, threads=args.threads)
+    else:
+        target = ClientTarget(app)
+    target.start()
+    try:
+        ctx.admin_token = login(target, args.username, args.password)
+        results = {}
+        for name in names:
+            print(f"Running {name} ...", file=sys.stderr)
+            results[name] = run_scenario(
+                target, SCENARIOS[name], ctx,
+                iterations=args.iterations, duration=args.duration,
+                concurrency=args.concurrency, warmup=args.warmup, seed=args.seed
+            )
+    finally:
+        target.stop()
+
+    result = {
+        'label': args.label,
+        'environment': environment(),
+        'dataset': dataset,
+        'config': {
+            'target': target.name,
+            'concurrency': args.concurrency,
+            'iterations': args.iterations,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'workers': args.workers if args.target == 'gunicorn' else None,
+            'threads': args.threads if args.target == 'gunicorn' else None
+        },
+        'scenarios': results
+    }
+    print_report(result)
+    if not args.no_save:
+        print(f"Saved {save_result(result, args.label)}")
+
+def queries_command(args):
+    db_path = os.path.join(DATA_DIR, 'queries.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ['CMS_DB_PATH'] = db_path
+    # Revocations are re-read on a timer; keep that out of the per-request counts
+    os.environ['TOKEN_REVOCATION_SYNC_SECONDS'] = '86400'
+    app = _load_app()
+    from benchmarks.query_budgets import check
+
+    failures = check(app)
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("All routes within their query budgets")
+
+def json_command(args):
+    if not os.path.exists(BENCH_ENV['CMS_DB_PATH']):
+        sys.exit("No benchmark database; run `python -m benchmarks seed` first")
+    app = _load_app()
+    from benchmarks.json_encoding import DEFAULT_PATHS, compare_providers
+    from benchmarks.runner import ClientTarget, login
+
+    app.config['DASHBOARD_CACHE_TTL'] = 0
+    token = login(ClientTarget(app), args.username, args.password)
+    compare_providers(app, token, paths=args.paths or DEFAULT_PATHS, iterations=args.iterations, warmup=args.warmup)
+
+def compare_command(args):
+    from benchmarks.runner import compare
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    compare(before, after)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='CMS load benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='Generate the benchmark database')
+    seed.add_argument('--scale', type=float, default=1.0, help='Multiply every default table size')
+    for name in ('users', 'categories', 'tags', 'posts', 'comments', 'media'):
+        seed.add_argument(f'--{name}', type=int, help=f'Number of {name} (overrides --scale)')
+    seed.add_argument('--seed', type=int, default=42, help='Random seed, for identical datasets')
+    seed.add_argument('--force', action='store_true', help='Replace an existing benchmark database')
+    seed.set_defaults(func=seed_command)
+
+    run = commands.add_parser('run', help='Run scenarios and record latency percentiles')
+    run.add_argument('scenarios', nargs='*', help='Scenarios to run (default: all)')
+    run.add_argument('--target', choices=['client', 'gunicorn'], default='client')
+    run.add_argument('--concurrency', type=int, default=1, help='Client threads')
+    run.add_argument('--iterations', type=int, default=200, help='Iterations per scenario')
+    run.add_argument('--duration', type=float, help='Seconds per scenario (instead of --iterations)')
+    run.add_argument('--warmup', type=int, default=20, help='Unmeasured iterations first')
+    run.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    run.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    run.add_argument('--seed', type=int, default=1)
+    run.add_argument('--label', default='run', help='Name stored with the result, e.g. before/after')
+    run.add_argument('--username', default='admin')
+    run.add_argument('--password', default='admin123')
+    run.add_argument('--no-save', action='store_true', help='Only print the report')
+    run.set_defaults(func=run_command)
+
+    queries = commands.add_parser('queries', help='Check SQL statement and row budgets of every route')
+    queries.set_defaults(func=queries_command)
+
+    encoding = commands.add_parser('json', help='Compare per-response CPU of the JSON providers')
+    encoding.add_argument('paths', nargs='*', help='Routes to request (default: large post, comment and tag lists)')
+    encoding.add_argument('--iterations', type=int, default=200, help='Requests per route and provider')
+    encoding.add_argument('--warmup', type=int, default=20, help='Unmeasured requests first')
+    encoding.add_argument('--username', default='admin')
+    encoding.add_argument('--password', default='admin123')
+    encoding.set_defaults(func=json_command)
+
+    comparison = commands.add_parser('compare', help='Compare two saved results')
+    comparison.add_argument('before')
+    comparison.add_argument('after')
+    comparison.set_defaults(func=compare_command)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+JSON provider comparison.
+
+Requests the same routes through the Flask test client with each JSON
+provider (see json_provider.py) in turn and reports p50 per response:
+the CPU time of the whole request, the wall time, the encoding time the
+``Server-Timing`` header reports, and the time to encode the same payload
+on its own. Providers are swapped on the live app between requests, so
+database state, caches and the payload are the same for each; only the
+encoder differs.
+"""
+
+import json
+import re
+import time
+
+from benchmarks.runner import percentile
+
+DEFAULT_PATHS = ['/api/posts?per_page=100', '/api/comments?per_page=100', '/api/tags']
+
+def _serialize_ms(response):
+    match = re.search(r'serialize;dur=([\d.]+)', response.headers.get('Server-Timing', ''))
+    return float(match.group(1)) if match else 0.0
+
+def _p50(values):
+    return round(percentile(sorted(values), 50), 3)
+
+def _encode_ms(provider, payload, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        provider.dumpb(payload)
+    return (time.process_time() - started) / repeat * 1000
+
+def measure_path(app, client, path, headers, providers, iterations, warmup):
+    """Requests alternate between the providers, so drift in the machine's load hits all alike"""
+    samples = {name: {'cpu': [], 'wall': [], 'serialize': []} for name in providers}
+    body = b''
+    for i in range(warmup + iterations):
+        for name, provider in providers.items():
+            app.json = provider
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            response = client.get(path, headers=headers)
+            body = response.get_data()
+            cpu, wall = time.process_time() - cpu_started, time.perf_counter() - wall_started
+            if response.status_code != 200:
+                raise RuntimeError(f'{path}: HTTP {response.status_code}')
+            if i >= warmup:
+                samples[name]['cpu'].append(cpu * 1000)
+                samples[name]['wall'].append(wall * 1000)
+                samples[name]['serialize'].append(_serialize_ms(response))
+
+    # The payload on its own: encoding cost without the noise of the rest of the request
+    payload = json.loads(body)
+    return {
+        name: {
+            'cpu_ms': _p50(values['cpu']),
+            'wall_ms': _p50(values['wall']),
+            'serialize_ms': _p50(values['serialize']),
+            'encode_only_ms': round(_encode_ms(providers[name], payload, max(iterations // 4, 5)), 3),
+            'bytes': len(body)
+        }
+        for name, values in samples.items()
+    }
+
+def compare_providers(app, token, paths=DEFAULT_PATHS, providers=('stdlib', 'orjson'), iterations=200, warmup=20, echo=print):
+    """p50 per-response timings for each path under each provider; returns {path: {provider: stats}}"""
+    from instrumentation import timed_json_provider
+    from json_provider import json_provider_class
+
+    configured = app.json
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+    instances = {name: timed_json_provider(json_provider_class(name))(app) for name in providers}
+    try:
+        results = {path: measure_path(app, client, path, headers, instances, iterations, warmup) for path in paths}
+    finally:
+        app.json = configured
+
+    echo(f"{'route':<36}{'provider':>10}{'cpu ms':>10}{'wall ms':>10}{'encode ms':>11}{'alone ms':>10}{'bytes':>10}")
+    for path, by_provider in results.items():
+        for name, stats in by_provider.items():
+            echo(f"{path[:35]:<36}{name:>10}{stats['cpu_ms']:>10}{stats['wall_ms']:>10}"
+                 f"{stats['serialize_ms']:>11}{stats['encode_only_ms']:>10}{stats['bytes']:>10}")
+        if len(by_provider) > 1:
+            base, fast = by_provider[providers[0]], by_provider[providers[-1]]
+            saved = [base[key] - fast[key] for key in ('cpu_ms', 'wall_ms', 'serialize_ms', 'encode_only_ms')]
+            echo(f"{'':<36}{'saved':>10}{saved[0]:>10.3f}{saved[1]:>10.3f}{saved[2]:>11.3f}{saved[3]:>10.3f}")
+    return results
@@ -0,0 +1,282 @@
+"""
+SQL budgets per route.
+
+Every route in routes.py is either a case here or listed in EXEMPT with a
+reason; a new route without either fails the check. Each case is requested
+through the Flask test client against a freshly seeded SQLite database
+(offline, nothing but the app and its dependencies), and for each request
+the harness counts the SQL statements executed and the rows the database
+returned.
+
+List routes are requested at two page sizes. The statement count may
+differ by at most GROWTH_TOLERANCE between them (nested category trees
+take one query per level, so it depends a little on which rows are on the
+page), which an N+1 (one lazy load per row) breaks at once, and both
+counts must stay within the case's budget:
+
+    statements <= queries
+    rows       <= rows + rows_per_item * page size
+    KB of text <= kb + kb_per_item * page size   (where kb is given)
+
+The text budget counts the bytes of every string and blob value the
+database returned, so a list that starts reading a deferred column such
+as ``Post.content`` again fails even when its row count does not change.
+
+Caches are cleared before each request, so the cold path is what is
+measured.
+"""
+
+import json
+import os
+
+from sqlalchemy import event
+
+SMALL_PAGE = 5
+LARGE_PAGE = 50
+GROWTH_TOLERANCE = 2
+
+# A dataset where every list is longer than LARGE_PAGE
+DATASET = {
+    'users': 60,
+    'categories': 30,
+    'tags': 300,
+    'posts': 400,
+    'comments': 6000,
+    'media': 120,
+}
+
+class Case:
+    def __init__(self, method, path, queries, rows=0, rows_per_item=0, kb=None, kb_per_item=0, role=None, body=None):
+        self.method = method
+        self.path = path  # may use {n} (page size) and the fixture names in Fixtures
+        self.queries = queries
+        self.rows = rows
+        self.rows_per_item = rows_per_item
+        self.kb = kb  # text and blob bytes read, checked only when given
+        self.kb_per_item = kb_per_item
+        self.role = role  # None (anonymous) or 'admin'
+        self.body = body
+
+    @property
+    def paged(self):
+        return '{n}' in self.path
+
+    @property
+    def name(self):
+        return f'{self.method} {self.path}'
+
+CASES = [
+    # Auth and users
+    Case('POST', '/api/auth/login', queries=2, rows=2, body={'username': 'admin', 'password': 'admin123'}),
+    Case('GET', '/api/auth/me', queries=2, rows=2, role='admin'),
+    Case('GET', '/api/users?per_page={n}', queries=3, rows=2, rows_per_item=1, role='admin'),
+    Case('GET', '/api/users?fields=username,name&per_page={n}', queries=3, rows=2, rows_per_item=1, role='admin'),
+    Case('GET', '/api/users/{user_id}', queries=2, rows=2, role='admin'),
+    Case('PUT', '/api/users/{user_id}', queries=5, rows=4, role='admin', body={'bio': 'Updated by the query budget check'}),
+
+    # Posts
+    Case('GET', '/api/posts?per_page={n}', queries=8, rows=6, rows_per_item=12, kb=4, kb_per_item=2),
+    Case('GET', '/api/posts?status=all&per_page={n}', queries=8, rows=6, rows_per_item=12, kb=4, kb_per_item=2),
+    Case('GET', '/api/posts?tag={tag_slug}&per_page={n}', queries=8, rows=6, rows_per_item=12, kb=4, kb_per_item=2),
+    Case('GET', '/api/posts?search={search}&per_page={n}', queries=8, rows=6, rows_per_item=12, kb=4, kb_per_item=2),
+    Case('GET', '/api/posts?fields=id,title,slug,excerpt,author.name&per_page={n}', queries=3, rows=2, rows_per_item=2),
+    Case('GET', '/api/posts?fields=title&include=category,tags&per_page={n}', queries=4, rows=2, rows_per_item=12),
+    Case('GET', '/api/posts/{slug}', queries=7, rows=30),
+    Case('POST', '/api/posts', queries=19, rows=10, role='admin', body={
+        'title': 'Query budget post', 'content': '<p>Body</p>', 'status': 'published',
+        'category_id': 1, 'tags': ['budget-a', 'budget-b']
+    }),
+    Case('PUT', '/api/posts/{post_id}', queries=20, rows=30, role='admin', body={
+        'excerpt': 'Updated by the query budget check', 'tags': ['budget-a', 'budget-c']
+    }),
+    Case('GET', '/api/posts/list?limit={n}', queries=2, rows=1, rows_per_item=1, role='admin'),
+
+    # Categories and tags
+    Case('GET', '/api/categories', queries=4, rows=DATASET['categories'] + 1),
+    Case('GET', '/api/admin/categories', queries=5, rows=3 * DATASET['categories'], role='admin'),
+    Case('POST', '/api/categories', queries=4, rows=2, role='admin', body={'name': 'Budget category'}),
+    Case('PUT', '/api/categories/{category_id}', queries=5, rows=DATASET['categories'] + 2, role='admin', body={'description': 'Updated'}),
+    Case('GET', '/api/tags', queries=1, rows=DATASET['tags'] + 2),
+    Case('GET', '/api/featured-keywords', queries=1, rows=5),
+
+    # Comments
+    Case('GET', '/api/posts/{slug}/comments', queries=2, rows=1000),
+    Case('GET', '/api/posts/{slug}/comments?page=1&per_page={n}', queries=4, rows=3, rows_per_item=5, kb=2, kb_per_item=0.5),
+    Case('POST', '/api/posts/{slug}/comments', queries=4, rows=4, body={
+        'name': 'Budget', 'email': 'budget@example.com', 'content': 'A query budget comment'
+    }),
+    Case('GET', '/api/comments?per_page={n}', queries=7, rows=10, rows_per_item=3, role='admin'),
+    Case('GET', '/api/comments?fields=content,reply_count,post.title&per_page={n}', queries=5, rows=10, rows_per_item=3, role='admin'),
+    Case('PUT', '/api/comments/{comment_id}', queries=9, rows=10, role='admin', body={'status': 'approved'}),
+    Case('POST', '/api/comments/bulk', queries=8, rows=10, role='admin', body={'action': 'approve', 'comment_ids': [1, 2, 3, 4, 5]}),
+    Case('POST', '/api/comments/{comment_id}/reply', queries=10, rows=10, role='admin', body={'content': 'A budget reply'}),
+
+    # Media, settings, dashboard, themes
+    Case('GET', '/api/media?per_page={n}', queries=4, rows=2, rows_per_item=2, role='admin'),
+    Case('GET', '/api/media?fields=url,uploader.name&per_page={n}', queries=3, rows=2, rows_per_item=2, role='admin'),
+    Case('PUT', '/api/media/{media_id}', queries=6, rows=5, role='admin', body={'alt_text': 'Updated'}),
+    Case('GET', '/api/admin/storage', queries=4, rows=DATASET['users'] + 20, role='admin'),
+    Case('GET', '/api/settings', queries=2, rows=20, role='admin'),
+    Case('POST', '/api/settings', queries=6, rows=20, role='admin', body={'site_title': 'Budget blog'}),
+    Case('GET', '/api/dashboard/stats', queries=6, rows=20, role='admin'),
+    Case('GET', '/api/themes/active', queries=1, rows=1),
+]
+
+# Routes not measured here, and why
+EXEMPT = {
+    'POST /api/auth/refresh': 'needs a refresh token; same lookups as /api/auth/me',
+    'POST /api/auth/logout': 'token revocation write only',
+    'POST /api/auth/register': 'single user insert, password hashing dominates',
+    'POST /api/users': 'single user insert, password hashing dominates',
+    'DELETE /api/users/<int:user_id>': 'destructive; cost depends on the user\'s content',
+    'POST /api/posts/bulk': 'batched import, statements scale with the uploaded lines by design',
+    'DELETE /api/posts/<int:post_id>': 'destructive; cost follows the deleted comment tree',
+    'DELETE /api/categories/<int:category_id>': 'destructive',
+    'POST /api/media/upload': 'file upload, measured by the upload benchmark scenario',
+    'POST /api/media/presign': 'storage backend call',
+    'POST /api/media/complete': 'storage backend call',
+    'DELETE /api/media/<int:media_id>': 'destructive',
+    'POST /api/admin/storage/gc': 'scans the uploads tree in batches',
+    'GET /api/admin/download-database': 'file download',
+    'GET /api/admin/export': 'streams every table in batches by design',
+    'DELETE /api/comments/<int:comment_id>': 'destructive; cost follows the deleted reply tree',
+    'POST /api/themes/activate': 'writes theme rows and files',
+    'PUT /api/themes/<theme_id>/settings': 'single row update',
+    'POST /api/admin/backup': 'copies the database and uploads',
+    'GET /api/admin/download-backup/<filename>': 'file download',
+    'POST /api/admin/restore': 'replaces the database',
+    'GET /uploads/<path:filename>': 'static file, no database access',
+}
+
+class Fixtures(dict):
+    """Ids and slugs the case paths refer to, picked from the seeded data"""
+
+    @classmethod
+    def from_database(cls):
+        from sqlalchemy import func, select
+        from app_unified import db, User, Category, Post, Comment, Media, post_tags, Tag
+
+        busiest = db.session.execute(
+            select(Post.id, Post.slug).outerjoin(Category, Category.id == Post.category_id)
+            .where(Post.status == 'published', Post.post_type == 'post', Category.is_visible.isnot(False))
+            .order_by(Post.comments_count.desc()).limit(1)
+        ).one()
+        tag_slug = db.session.execute(
+            select(Tag.slug).join(post_tags, post_tags.c.tag_id == Tag.id)
+            .group_by(Tag.id).order_by(func.count().desc()).limit(1)
+        ).scalar_one()
+        return cls(
+            slug=busiest.slug,
+            post_id=busiest.id,
+            tag_slug=tag_slug,
+            search=db.session.scalar(select(Post.title).where(Post.status == 'published').limit(1)).split()[0],
+            user_id=db.session.scalar(select(func.max(User.id))),
+            category_id=db.session.scalar(select(func.max(Category.id))),
+            comment_id=db.session.scalar(select(func.min(Comment.id)).where(Comment.post_id == busiest.id)),
+            media_id=db.session.scalar(select(func.min(Media.id)))
+        )
+
+class SQLCounter:
+    """Statements executed and rows returned on an engine's connections"""
+
+    def __init__(self, engine):
+        self.statements = 0
+        self.rows = 0
+        self.bytes = 0
+        event.listen(engine, 'after_cursor_execute', self._statement)
+        event.listen(engine, 'connect', self._count_rows)
+        # Pooled connections were opened before the row factory was installed
+        engine.dispose()
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+
+    def _count_rows(self, dbapi_connection, connection_record):
+        def row_factory(cursor, row):
+            self.rows += 1
+            self.bytes += sum(len(value) for value in row if isinstance(value, (str, bytes)))
+            return row
+        dbapi_connection.row_factory = row_factory
+
+    def reset(self):
+        self.statements = 0
+        self.rows = 0
+        self.bytes = 0
+
+def route_names(app):
+    """'METHOD rule' for every view function defined in routes.py"""
+    names = set()
+    for rule in app.url_map.iter_rules():
+        view = app.view_functions[rule.endpoint]
+        if getattr(view, '__module__', None) != 'routes':
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            names.add(f'{method} {rule.rule}')
+    return names
+
+def _case_rule(app, case, fixtures):
+    path = case.path.format(n=SMALL_PAGE, **fixtures).split('?')[0]
+    rule, _ = app.url_map.bind('localhost').match(path, method=case.method, return_rule=True)
+    return f'{case.method} {rule.rule}'
+
+def measure(client, counter, case, fixtures, headers, page):
+    from cache import all_caches
+    for cache in all_caches():
+        cache.clear()
+    path = case.path.format(n=page, **fixtures)
+    kwargs = {'headers': headers if case.role else {}}
+    if case.body is not None:
+        kwargs['json'] = case.body
+    counter.reset()
+    response = client.open(path, method=case.method, **kwargs)
+    response.get_data()
+    return response.status_code, counter.statements, counter.rows, counter.bytes
+
+def check(app, echo=print):
+    """Run every case; returns the list of failure messages"""
+    from app_unified import db
+    from benchmarks.seed import seed
+
+    app.config['DASHBOARD_CACHE_TTL'] = 0
+    with app.app_context():
+        seed(DATASET, echo=lambda line: None)
+        fixtures = Fixtures.from_database()
+        counter = SQLCounter(db.engine)
+
+    client = app.test_client()
+    token = json.loads(client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    failures = []
+    covered = set()
+    echo(f"{'route':<58}{'status':>7}{'queries':>9}{'budget':>8}{'rows':>8}{'budget':>8}{'KB':>8}{'budget':>8}")
+    for case in CASES:
+        covered.add(_case_rule(app, case, fixtures))
+        pages = (SMALL_PAGE, LARGE_PAGE) if case.paged else (None,)
+        if case.method == 'GET':
+            # One unmeasured request first, so one-time lookups are not counted
+            measure(client, counter, case, fixtures, headers, pages[-1])
+        measured = []
+        for page in pages:
+            status, statements, rows, read_bytes = measure(client, counter, case, fixtures, headers, page)
+            row_budget = case.rows + case.rows_per_item * (page or 0)
+            kb_read = round(read_bytes / 1024, 1)
+            kb_budget = case.kb + case.kb_per_item * (page or 0) if case.kb is not None else None
+            label = case.name.replace('{n}', str(page)) if case.paged else case.name
+            echo(f"{label[:57]:<58}{status:>7}{statements:>9}{case.queries:>8}{rows:>8}{row_budget:>8}"
+                 f"{kb_read:>8}{'' if kb_budget is None else kb_budget:>8}")
+            if status >= 400:
+                failures.append(f'{label}: HTTP {status}')
+            if statements > case.queries:
+                failures.append(f'{label}: {statements} statements, budget {case.queries}')
+            if rows > row_budget:
+                failures.append(f'{label}: {rows} rows fetched, budget {row_budget}')
+            if kb_budget is not None and kb_read > kb_budget:
+                failures.append(f'{label}: {kb_read} KB of text read, budget {kb_budget} KB')
+            measured.append(statements)
+        if len(measured) > 1 and measured[1] - measured[0] > GROWTH_TOLERANCE:
+            failures.append(f'{case.name}: statements grow with page size ({measured[0]} at {SMALL_PAGE}, {measured[1]} at {LARGE_PAGE})')
+
+    for name in sorted(route_names(app) - covered - set(EXEMPT)):
+        failures.append(f'{name}: no query budget (add a case or an EXEMPT entry)')
+    return failures
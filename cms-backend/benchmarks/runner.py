@@ -0,0 +1,280 @@
+"""
+Drives scenarios against a target and summarizes latency.
+
+Targets:
+  client    the Flask test client in this process (no network, no server;
+            isolates the application and database cost)
+  gunicorn  a real ``gunicorn -c gunicorn.conf.py app_unified:app`` started
+            on a free local port, driven over HTTP keep-alive connections
+
+Each worker thread has its own connection and RNG and runs iterations
+until the shared budget (iterations or seconds) is used up. Latencies
+are recorded per step; a run summary has p50/p95/p99, mean and max per
+step and per iteration, throughput and the status codes seen.
+"""
+
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def summarize(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2)
+    }
+
+class ClientTarget:
+    name = 'client'
+
+    def __init__(self, app):
+        self.app = app
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def connect(self):
+        client = self.app.test_client()
+
+        def send(method, path, headers, body):
+            response = client.open(path, method=method, headers=headers, data=body)
+            data = response.get_data()
+            response.close()
+            return response.status_code, data
+        return send
+
+class GunicornTarget:
+    name = 'gunicorn'
+
+    def __init__(self, env, workers=2, threads=1, startup_timeout=60):
+        self.env = env
+        self.workers = workers
+        self.threads = threads
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.port = None
+
+    def start(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        env = {
+            **os.environ, **self.env,
+            'PORT': str(self.port),
+            'WEB_CONCURRENCY': str(self.workers),
+            'GUNICORN_THREADS': str(self.threads)
+        }
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{self.port}', 'app_unified:app'],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited during startup:\n{self.process.stderr.read().decode(errors='replace')[-2000:]}")
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                conn.request('GET', '/api/settings')
+                conn.getresponse().read()
+                conn.close()
+                # Let every worker finish booting before measuring
+                time.sleep(0.5)
+                return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError('gunicorn did not start listening in time')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def connect(self):
+        state = {'conn': None}
+
+        def send(method, path, headers, body):
+            for attempt in range(2):
+                if state['conn'] is None:
+                    state['conn'] = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                try:
+                    state['conn'].request(method, path, body=body, headers=headers)
+                    response = state['conn'].getresponse()
+                    data = response.read()
+                    return response.status, data
+                except (http.client.HTTPException, OSError):
+                    # The worker closed the keep-alive connection; reconnect once
+                    state['conn'].close()
+                    state['conn'] = None
+                    if attempt:
+                        raise
+        return send
+
+def login(target, username, password):
+    send = target.connect()
+    status, body = send('POST', '/api/auth/login', {'Content-Type': 'application/json'},
+                        json.dumps({'username': username, 'password': password}).encode())
+    if status != 200:
+        raise RuntimeError(f'Benchmark login failed with HTTP {status}')
+    return json.loads(body)['access_token']
+
+def run_scenario(target, scenario, ctx, iterations=None, duration=None, concurrency=1, warmup=0, seed=0):
+    """Run one scenario; returns its summary dict"""
+    lock = threading.Lock()
+    budget = {'left': iterations, 'deadline': None}
+    steps = {name: [] for name, _ in scenario.steps}
+    rounds = []
+    statuses = Counter()
+    errors = Counter()
+
+    def take():
+        with lock:
+            if budget['deadline'] is not None:
+                return time.perf_counter() < budget['deadline']
+            if budget['left'] <= 0:
+                return False
+            budget['left'] -= 1
+            return True
+
+    def worker(index, measure):
+        rng = random.Random(seed * 1000 + index + (0 if measure else 500))
+        send = target.connect()
+        while take():
+            round_started = time.perf_counter()
+            for name, build in scenario.steps:
+                method, path, headers, body = build(ctx, rng)
+                started = time.perf_counter()
+                try:
+                    status, _ = send(method, path, headers, body)
+                except Exception as e:
+                    status = 'error'
+                    with lock:
+                        errors[type(e).__name__] += 1
+                elapsed = time.perf_counter() - started
+                if measure:
+                    with lock:
+                        steps[name].append(elapsed)
+                        statuses[str(status)] += 1
+            if measure:
+                with lock:
+                    rounds.append(time.perf_counter() - round_started)
+
+    def run_threads(measure):
+        threads = [threading.Thread(target=worker, args=(i, measure), daemon=True) for i in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    if warmup:
+        budget['left'] = warmup
+        run_threads(False)
+
+    if duration:
+        budget['deadline'] = time.perf_counter() + duration
+    else:
+        budget['left'] = iterations
+    wall = run_threads(True)
+
+    requests_done = sum(len(values) for values in steps.values())
+    return {
+        'description': scenario.description,
+        'iterations': len(rounds),
+        'requests': requests_done,
+        'seconds': round(wall, 3),
+        'throughput_rps': round(requests_done / wall, 1) if wall else None,
+        'statuses': dict(sorted(statuses.items())),
+        'errors': dict(errors),
+        'iteration': summarize(rounds),
+        'steps': {name: summarize(values) for name, values in steps.items()}
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'git_commit': git_commit()
+    }
+
+def save_result(result, label):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    path = os.path.join(RESULTS_DIR, f"{stamp}-{label}-{result['config']['target']}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2)
+    return path
+
+def print_report(result, echo=print):
+    config = result['config']
+    echo(f"target={config['target']} concurrency={config['concurrency']} label={result['label']} "
+         f"commit={result['environment']['git_commit']}")
+    echo(f"{'scenario/step':<28}{'reqs':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}  statuses")
+    for name, scenario in result['scenarios'].items():
+        statuses = ' '.join(f'{code}:{count}' for code, count in scenario['statuses'].items())
+        it = scenario['iteration']
+        echo(f"{name:<28}{scenario['requests']:>8}{it.get('p50_ms', 0):>10}{it.get('p95_ms', 0):>10}"
+             f"{it.get('p99_ms', 0):>10}{scenario['throughput_rps'] or 0:>10}  {statuses}")
+        for step, stats in scenario['steps'].items():
+            echo(f"  {step:<26}{stats['count']:>8}{stats.get('p50_ms', 0):>10}{stats.get('p95_ms', 0):>10}{stats.get('p99_ms', 0):>10}")
+
+def _change(before, after):
+    if not before or after is None:
+        return '     n/a'
+    return f'{(after - before) / before * 100:+7.1f}%'
+
+def compare(before, after, echo=print):
+    """Print per-step p50/p95/p99 and throughput changes between two saved results"""
+    echo(f"before: {before['label']} ({before['environment']['git_commit']}, {before['config']['target']})")
+    echo(f"after:  {after['label']} ({after['environment']['git_commit']}, {after['config']['target']})")
+    echo(f"{'scenario/step':<28}{'p50':>18}{'p95':>18}{'p99':>18}{'req/s':>18}")
+    for name, scenario in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if old is None:
+            continue
+        rows = [(name, old['iteration'], scenario['iteration'], old['throughput_rps'], scenario['throughput_rps'])]
+        rows += [(f'  {step}', old['steps'].get(step, {}), stats, None, None) for step, stats in scenario['steps'].items()]
+        for label, a, b, rps_a, rps_b in rows:
+            cells = [f"{b.get(key, 0):>9}{_change(a.get(key), b.get(key))}" for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+            cells.append(f"{rps_b:>9}{_change(rps_a, rps_b)}" if rps_b is not None else '')
+            echo(f"{label:<28}" + ''.join(cells))
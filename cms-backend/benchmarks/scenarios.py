@@ -0,0 +1,119 @@
+"""
+Benchmark scenarios.
+
+A scenario is a named list of steps. Each step builds one request
+(method, path, headers, body) from the shared ``Context``, which holds
+the slugs, ids and search words sampled from the benchmark database and
+the admin token. A client calls a scenario's steps in order, which is
+one iteration of that scenario (for example, the API calls behind one
+homepage view).
+"""
+
+import json
+import random
+import uuid
+
+from sqlalchemy import select
+
+from app_unified import db, Post, Tag, Category
+
+class Context:
+    def __init__(self, slugs, tag_slugs, category_ids, words, admin_token=None):
+        self.slugs = slugs
+        self.tag_slugs = tag_slugs
+        self.category_ids = category_ids
+        self.words = words
+        self.admin_token = admin_token
+
+    @classmethod
+    def from_database(cls, sample=2000):
+        published = (Post.status == 'published', Post.post_type == 'post')
+        slugs = db.session.scalars(select(Post.slug).where(*published).order_by(Post.id.desc()).limit(sample)).all()
+        titles = db.session.scalars(select(Post.title).where(*published).limit(sample)).all()
+        return cls(
+            slugs=slugs,
+            tag_slugs=db.session.scalars(select(Tag.slug).order_by(Tag.id).limit(sample)).all(),
+            category_ids=db.session.scalars(select(Category.id)).all(),
+            words=sorted({word for title in titles for word in title.lower().split() if len(word) > 3})
+        )
+
+    def admin(self):
+        return {'Authorization': f'Bearer {self.admin_token}'}
+
+def _get(path):
+    return 'GET', path, {}, None
+
+def _json(method, path, payload, headers=None):
+    return method, path, {'Content-Type': 'application/json', **(headers or {})}, json.dumps(payload).encode()
+
+def _multipart(path, filename, content, headers):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: image/png\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return 'POST', path, {'Content-Type': f'multipart/form-data; boundary={boundary}', **headers}, body
+
+def _public_post_list(per_page, **params):
+    query = '&'.join(f'{k}={v}' for k, v in {'page': 1, 'per_page': per_page, 'status': 'published', 'post_type': 'post', **params}.items())
+    return f'/api/posts?{query}'
+
+class Scenario:
+    def __init__(self, name, description, steps, admin=False):
+        self.name = name
+        self.description = description
+        self.steps = steps  # [(step name, fn(ctx, rng) -> request)]
+        self.admin = admin
+
+def _homepage_posts(ctx, rng):
+    # Most visitors see the first pages
+    return _get(_public_post_list(9, page=min(int(rng.paretovariate(1.5)), 50)))
+
+def _comment(ctx, rng):
+    slug = ctx.slugs[min(int(rng.paretovariate(1.2)) - 1, len(ctx.slugs) - 1)]
+    payload = {
+        'name': 'Bench Reader',
+        'email': f'reader{rng.randrange(100000)}@bench.local',
+        'content': f'Benchmark comment {uuid.uuid4().hex} {rng.choice(ctx.words)}'
+    }
+    # Spread clients over many addresses (TRUSTED_PROXIES=1), so mostly the per-post limit applies
+    forwarded = {'X-Forwarded-For': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}'}
+    return _json('POST', f'/api/posts/{slug}/comments', payload, forwarded)
+
+def _upload(ctx, rng):
+    # Half the uploads repeat earlier bytes, exercising content-hash deduplication
+    content = random.Random(rng.randrange(10) if rng.random() < 0.5 else rng.random()).randbytes(32 * 1024)
+    return _multipart('/api/media/upload', f'bench-{rng.randrange(10 ** 6)}.png', content, ctx.admin())
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario('homepage', 'Home page API calls: post cards, categories, tags', [
+        ('posts', _homepage_posts),
+        ('categories', lambda ctx, rng: _get('/api/categories')),
+        ('tags', lambda ctx, rng: _get('/api/tags')),
+    ]),
+    Scenario('post_view', 'Single post page: post, sidebar lists, comment thread', [
+        ('post', lambda ctx, rng: _get(f'/api/posts/{rng.choice(ctx.slugs)}')),
+        ('recent', lambda ctx, rng: _get(_public_post_list(5))),
+        ('comments', lambda ctx, rng: _get(f'/api/posts/{rng.choice(ctx.slugs)}/comments')),
+    ]),
+    Scenario('browse', 'Category and tag listings', [
+        ('category', lambda ctx, rng: _get(_public_post_list(9, category_id=rng.choice(ctx.category_ids)))),
+        ('tag', lambda ctx, rng: _get(_public_post_list(9, tag=ctx.tag_slugs[min(int(rng.paretovariate(1.1)) - 1, len(ctx.tag_slugs) - 1)]))),
+    ]),
+    Scenario('search', 'Full-text search over titles and content', [
+        ('search', lambda ctx, rng: _get(_public_post_list(50, search=rng.choice(ctx.words)))),
+    ]),
+    Scenario('admin_lists', 'Admin screens: dashboard, posts, comments, media, users', [
+        ('dashboard', lambda ctx, rng: ('GET', '/api/dashboard/stats', ctx.admin(), None)),
+        ('posts', lambda ctx, rng: ('GET', f'/api/posts?status=all&per_page=20&page={rng.randint(1, 20)}', ctx.admin(), None)),
+        ('comments', lambda ctx, rng: ('GET', f'/api/comments?per_page=20&page={rng.randint(1, 20)}', ctx.admin(), None)),
+        ('media', lambda ctx, rng: ('GET', f'/api/media?per_page=20&page={rng.randint(1, 20)}', ctx.admin(), None)),
+        ('users', lambda ctx, rng: ('GET', '/api/users', ctx.admin(), None)),
+    ], admin=True),
+    Scenario('upload', 'Media uploads of 32 KB, half of them duplicates', [
+        ('upload', _upload),
+    ], admin=True),
+    Scenario('comment_flood', 'Anonymous comments from many addresses on a few hot posts', [
+        ('comment', _comment),
+    ]),
+]}
@@ -0,0 +1,196 @@
+"""
+Bulk data generator for the benchmark database.
+
+Rows are built in memory with a seeded RNG and written through the models'
+tables in batched executemany INSERTs, with explicit primary keys so that
+tags, replies and stats can reference rows without reading them back.
+Popularity is skewed the way a real blog is: a few tags and posts get most
+of the traffic and comments.
+"""
+
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app_unified import db, ensure_initialized, User, Category, Tag, Post, Comment, Media, post_tags
+from comment_service import reconcile_post_comment_stats
+
+BATCH_SIZE = 5000
+
+WORDS = (
+    'cell gene protein enzyme culture research lab data model analysis sequence method result '
+    'study growth design system network signal sample theory review process energy membrane '
+    'structure function pathway tissue stem clinical trial vaccine bacteria virus plant water '
+    'field student thesis campus travel japan chiba tokyo food life note experiment python flask'
+).split()
+
+DEFAULT_SIZES = {
+    'users': 50,
+    'categories': 40,
+    'tags': 5000,
+    'posts': 10000,
+    'comments': 200000,
+    'media': 2000,
+}
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def _html(rng, paragraphs):
+    parts = []
+    for i in range(paragraphs):
+        if i % 3 == 0:
+            parts.append(f'<h2>{_sentence(rng, 5)}</h2>')
+        parts.append('<p>' + ' '.join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(3, 7))) + '</p>')
+    return '\n'.join(parts)
+
+def _skewed(rng, n):
+    """Index in range(n), favouring low indexes (roughly Zipf-like)"""
+    return min(int(n * rng.random() ** 3), n - 1)
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+def _insert(table, rows, label, timings):
+    started = time.perf_counter()
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+    db.session.commit()
+    timings[label] = (len(rows), time.perf_counter() - started)
+
+def seed(sizes=None, rng_seed=42, echo=print):
+    """Fill the (empty) benchmark database; returns {table: (rows, seconds)}"""
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(rng_seed)
+    timings = {}
+    now = datetime.utcnow()
+    ensure_initialized()
+
+    password_hash = generate_password_hash('benchmark')
+    first_user = _next_id(User)
+    users = [{
+        'id': first_user + i,
+        'username': f'author{i}',
+        'email': f'author{i}@bench.local',
+        'password_hash': password_hash,
+        'first_name': rng.choice(WORDS).capitalize(),
+        'last_name': rng.choice(WORDS).capitalize(),
+        'role': rng.choice(['author', 'author', 'editor']),
+        'bio': ' '.join(_sentence(rng) for _ in range(6)),
+        'website': f'https://author{i}.example.com',
+        'social_links': json.dumps({'twitter': f'@author{i}', 'github': f'author{i}'}),
+        'is_active': True,
+        'created_at': now - timedelta(days=1500),
+        'updated_at': now - timedelta(days=rng.randint(0, 1500)),
+    } for i in range(sizes['users'])]
+    _insert(User.__table__, users, 'users', timings)
+    author_ids = [user['id'] for user in users]
+
+    first_category = _next_id(Category)
+    top_level = max(sizes['categories'] // 4, 1)
+    categories = [{
+        'id': first_category + i,
+        'name': f'{rng.choice(WORDS).capitalize()} {i}',
+        'slug': f'bench-category-{i}',
+        'description': _sentence(rng, 20),
+        'parent_id': None if i < top_level else first_category + rng.randrange(top_level),
+        'is_visible': rng.random() > 0.05,
+        'created_at': now - timedelta(days=1500),
+    } for i in range(sizes['categories'])]
+    _insert(Category.__table__, categories, 'categories', timings)
+    category_ids = [category['id'] for category in categories]
+
+    first_tag = _next_id(Tag)
+    tags = [{
+        'id': first_tag + i,
+        'name': f'{rng.choice(WORDS)}-{i}',
+        'slug': f'bench-tag-{i}',
+        'description': _sentence(rng, 8) if i % 10 == 0 else None,
+        'created_at': now - timedelta(days=1500),
+    } for i in range(sizes['tags'])]
+    _insert(Tag.__table__, tags, 'tags', timings)
+
+    first_post = _next_id(Post)
+    posts, links = [], []
+    for i in range(sizes['posts']):
+        published = now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60))
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(4, 9))).capitalize()
+        posts.append({
+            'id': first_post + i,
+            'title': title,
+            'slug': f"{title.lower().replace(' ', '-')[:200]}-{i}",
+            'content': _html(rng, rng.randint(6, 30)),
+            'excerpt': _sentence(rng, 30),
+            'featured_image': f'/uploads/images/bench-{i % 500}.png' if rng.random() < 0.7 else None,
+            'status': 'published' if rng.random() < 0.9 else 'draft',
+            'post_type': 'post' if rng.random() < 0.95 else 'page',
+            'author_id': rng.choice(author_ids),
+            'category_id': rng.choice(category_ids) if rng.random() < 0.95 else None,
+            'comment_status': 'open',
+            'view_count': int(rng.paretovariate(1.2) * 10),
+            'meta_title': title,
+            'meta_description': _sentence(rng, 20),
+            'custom_fields': json.dumps({'reading_time': rng.randint(1, 20)}) if rng.random() < 0.5 else '{}',
+            'published_at': published,
+            'created_at': published,
+            'updated_at': published + timedelta(days=rng.randint(0, 30)),
+        })
+        for tag_index in {_skewed(rng, len(tags)) for _ in range(rng.randint(0, 8))}:
+            links.append({'post_id': first_post + i, 'tag_id': tags[tag_index]['id']})
+    _insert(Post.__table__, posts, 'posts', timings)
+    _insert(post_tags, links, 'post_tags', timings)
+
+    published_posts = [post for post in posts if post['status'] == 'published']
+    first_comment = _next_id(Comment)
+    comments = []
+    recent_by_post = {}
+    for i in range(sizes['comments'] if published_posts else 0):
+        post = published_posts[_skewed(rng, len(published_posts))]
+        siblings = recent_by_post.setdefault(post['id'], [])
+        roll = rng.random()
+        comment = {
+            'id': first_comment + i,
+            'post_id': post['id'],
+            'author_name': f'{rng.choice(WORDS).capitalize()} {rng.choice(WORDS).capitalize()}',
+            'author_email': f'reader{rng.randrange(20000)}@mail.local',
+            'author_ip': f'10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}',
+            'content': ' '.join(_sentence(rng) for _ in range(rng.randint(1, 5))),
+            'status': 'approved' if roll < 0.85 else 'pending' if roll < 0.95 else 'spam',
+            'parent_id': rng.choice(siblings) if siblings and rng.random() < 0.2 else None,
+            'created_at': post['published_at'] + timedelta(minutes=rng.randint(1, 60 * 24 * 90)),
+        }
+        comments.append(comment)
+        siblings.append(comment['id'])
+        del siblings[:-20]
+    _insert(Comment.__table__, comments, 'comments', timings)
+
+    first_media = _next_id(Media)
+    media = []
+    for i in range(sizes['media']):
+        name = f'bench-{i}.png'
+        media.append({
+            'id': first_media + i,
+            'title': _sentence(rng, 4),
+            'filename': name,
+            'original_filename': name,
+            'file_path': f'images/{name}',
+            'url': f'/uploads/images/{name}',
+            'file_type': 'image',
+            'mime_type': 'image/png',
+            'file_size': rng.randint(20_000, 3_000_000),
+            'alt_text': _sentence(rng, 5),
+            'uploaded_by': rng.choice(author_ids),
+            'created_at': now - timedelta(minutes=rng.randint(0, 3 * 365 * 24 * 60)),
+        })
+    _insert(Media.__table__, media, 'media', timings)
+
+    started = time.perf_counter()
+    reconcile_post_comment_stats()
+    timings['comment stats'] = (len(published_posts), time.perf_counter() - started)
+
+    for label, (rows, seconds) in timings.items():
+        echo(f"{label:>14}: {rows:>8} rows in {seconds:6.2f} s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+    return timings
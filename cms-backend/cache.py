@@ -0,0 +1,102 @@
+"""
+Small in-process TTL caches that are cleared when their tables change.
+
+Writes are noticed per session, both ORM flushes and bulk statements run
+through ``db.session.execute`` (``update(Comment)...``), and the caches
+watching those tables are cleared once the transaction commits. Writes
+from other processes (other gunicorn workers, raw sqlite scripts) are not
+seen, so the TTL bounds how stale a worker's copy can get.
+"""
+
+import threading
+import time
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_caches = []
+
+# Counters bumped on every read; no cached value depends on them
+UNTRACKED_COLUMNS = {'posts': {'view_count'}}
+
+class TTLCache:
+    """Values by key for ``ttl`` seconds, cleared on commits that write to ``tables``"""
+
+    def __init__(self, name, tables):
+        self.name = name
+        self.tables = set(tables)
+        self.entries = {}
+        self.generation = 0  # bumped by clear(); values computed across a clear are not stored
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.append(self)
+
+    def get(self, key, factory, ttl):
+        """Cached value for key, computing it with factory() when missing or expired"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self.generation
+
+        value = factory()
+        with self.lock:
+            # A commit that cleared the cache meanwhile may have made this value stale
+            if self.generation == generation:
+                self.entries[key] = (now + ttl, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+def all_caches():
+    return list(_caches)
+
+def _note_writes(session, tables):
+    session.info.setdefault('written_tables', set()).update(tables)
+
+def _only_untracked_changes(obj):
+    untracked = UNTRACKED_COLUMNS.get(obj.__table__.name)
+    if not untracked:
+        return False
+    state = inspect(obj)
+    return all(
+        attr.key in untracked
+        for attr in state.attrs
+        if attr.history.has_changes()
+    )
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session, flush_context):
+    tables = {obj.__table__.name for obj in chain(session.new, session.deleted) if hasattr(obj, '__table__')}
+    tables.update(
+        obj.__table__.name for obj in session.dirty
+        if hasattr(obj, '__table__') and not _only_untracked_changes(obj)
+    )
+    _note_writes(session, tables)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _note_writes(orm_execute_state.session, {table.name})
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    written = session.info.pop('written_tables', None)
+    if written:
+        for cache in _caches:
+            if cache.tables & written:
+                cache.clear()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_writes(session):
+    session.info.pop('written_tables', None)
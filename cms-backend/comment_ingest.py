@@ -0,0 +1,281 @@
+"""
+Intake path for public (anonymous) comments.
+
+Every POST passes three cheap in-process gates before it reaches the
+database:
+
+- token buckets per client IP and post, and per post across all clients,
+  checked before any query runs;
+- a spam pre-filter: length limit, duplicate content hashes within a time
+  window, and link counting (comments with links wait for moderation,
+  link-stuffed ones go straight to spam);
+- a write queue whose single writer thread inserts comments in batches,
+  so a burst of comments shares one SQLite write transaction instead of
+  queueing on the write lock one commit at a time. A request waits
+  COMMENT_SAVE_WAIT seconds for its row; past that the comment stays
+  queued and ``save`` raises CommentSavePending rather than an error.
+
+State is per process: with several gunicorn workers each worker keeps its
+own buckets and duplicate window, which is enough to blunt floods without
+an external store.
+"""
+
+import hashlib
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app_unified import db, Comment
+from comment_service import refresh_post_comment_stats
+
+LINK_RE = re.compile(r'https?://|www\.', re.IGNORECASE)
+
+class CommentSavePending(Exception):
+    """The comment is still queued for the writer: it may yet be saved, so it must not be resent"""
+
+def parse_rate(value):
+    """Parse a rate such as '5/60' into (burst capacity, seconds to refill it)"""
+    count, _, seconds = str(value).partition('/')
+    return int(count), float(seconds or 60)
+
+class TokenBuckets:
+    """Token buckets by key; the least recently used are dropped beyond max_keys"""
+
+    def __init__(self, capacity, period, max_keys=10000):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Take a token for key; returns 0 when allowed, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, updated_at = self.buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+            wait = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+            return wait
+
+class RecentKeys:
+    """Keys seen within the last ``window`` seconds"""
+
+    def __init__(self, window, max_keys=50000):
+        self.window = window
+        self.max_keys = max_keys
+        self.seen_at = OrderedDict()
+        self.lock = threading.Lock()
+
+    def check_and_add(self, keys, now=None):
+        """Return True if any key was seen within the window; records all keys either way"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            while self.seen_at:
+                key, seen_at = next(iter(self.seen_at.items()))
+                if now - seen_at < self.window and len(self.seen_at) <= self.max_keys:
+                    break
+                self.seen_at.popitem(last=False)
+
+            duplicate = any(key in self.seen_at for key in keys)
+            for key in keys:
+                self.seen_at.pop(key, None)
+                self.seen_at[key] = now
+            return duplicate
+
+    def discard(self, keys):
+        """Forget keys, e.g. of a comment that could not be saved and may be sent again"""
+        with self.lock:
+            for key in keys:
+                self.seen_at.pop(key, None)
+
+def content_hash(content):
+    """Hash of the comment text with case and whitespace normalized"""
+    normalized = ' '.join(content.lower().split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+class CommentWriteQueue:
+    """Single writer thread that inserts queued comment rows in batches"""
+
+    def __init__(self, app, batch_size=100, max_wait=0.05):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.lock = threading.Lock()
+        self.queue = None
+        self.thread = None
+        self.pid = None
+
+    def submit(self, row):
+        """Queue a row for insertion; the returned Future resolves to the new comment id"""
+        future = Future()
+        self._ensure_writer().put((row, future))
+        return future
+
+    def _ensure_writer(self):
+        with self.lock:
+            # Threads do not survive fork, so each gunicorn worker starts its own writer
+            if self.pid != os.getpid():
+                self._start_writer(queue.Queue())
+            elif not self.thread.is_alive():
+                # Rows queued for the dead writer still have requests waiting on them
+                pending = queue.Queue()
+                while True:
+                    try:
+                        pending.put(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                self._start_writer(pending)
+            return self.queue
+
+    def _start_writer(self, pending):
+        self.queue = pending
+        self.thread = threading.Thread(target=self._run, args=(pending,), name='comment-writer', daemon=True)
+        self.pid = os.getpid()
+        self.thread.start()
+
+    def _run(self, pending):
+        while True:
+            items = [pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with self.app.app_context():
+                    self._write(items)
+            except Exception as e:
+                # Fail the batch rather than the writer, so later comments are still written
+                for row, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _write(self, items):
+        try:
+            comment_ids = insert_comments([row for row, future in items])
+        except Exception as e:
+            db.session.rollback()
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return
+            # Isolate the failing row by writing the batch one row per transaction
+            for item in items:
+                self._write([item])
+            return
+        for (row, future), comment_id in zip(items, comment_ids):
+            future.set_result(comment_id)
+
+def insert_comments(rows):
+    """Insert comment rows in one transaction and return their ids in order"""
+    result = db.session.execute(
+        insert(Comment).returning(Comment.id, sort_by_parameter_order=True),
+        rows
+    )
+    comment_ids = [comment_id for (comment_id,) in result]
+    refresh_post_comment_stats({row['post_id'] for row in rows if row['status'] == 'approved'})
+    db.session.commit()
+    return comment_ids
+
+class CommentIntake:
+    """Rate limits, spam pre-filter and write queue for one app"""
+
+    def __init__(self, app):
+        config = app.config
+        self.client_limits = TokenBuckets(*parse_rate(config['COMMENT_RATE_LIMIT']))
+        self.post_limits = TokenBuckets(*parse_rate(config['COMMENT_POST_RATE_LIMIT']))
+        self.recent = RecentKeys(config['COMMENT_DUPLICATE_WINDOW'])
+        self.max_links = config['COMMENT_MAX_LINKS']
+        self.max_length = config['COMMENT_MAX_LENGTH']
+        self.save_wait = config['COMMENT_SAVE_WAIT']
+        self.writer = None
+        if config['COMMENT_WRITE_QUEUE']:
+            self.writer = CommentWriteQueue(
+                app,
+                batch_size=config['COMMENT_BATCH_SIZE'],
+                max_wait=config['COMMENT_BATCH_WAIT']
+            )
+
+    def throttle(self, client_ip, post_key):
+        """Seconds the client has to wait before commenting on post_key again (0 if allowed)"""
+        return max(
+            self.client_limits.take((client_ip, post_key)),
+            self.post_limits.take(post_key)
+        )
+
+    def classify(self, post_id, client_ip, content):
+        """Return the status for a new comment, or raise ValueError to reject it"""
+        if len(content) > self.max_length:
+            raise ValueError(f'Comment is longer than {self.max_length} characters')
+
+        if self.recent.check_and_add(self._duplicate_keys(post_id, client_ip, content)):
+            raise ValueError('Duplicate comment')
+
+        links = len(LINK_RE.findall(content))
+        if links > self.max_links:
+            return 'spam'
+        if links:
+            return 'pending'
+        return 'approved'
+
+    def _duplicate_keys(self, post_id, client_ip, content):
+        digest = content_hash(content)
+        # The same text on the same post, or from the same client anywhere
+        return [('post', post_id, digest), ('client', client_ip, digest)]
+
+    def forget(self, post_id, client_ip, content):
+        """Drop a comment from the duplicate window after it failed to save, so it can be resent"""
+        self.recent.discard(self._duplicate_keys(post_id, client_ip, content))
+
+    def save(self, row):
+        """Insert a comment row (through the write queue when enabled) and return its id.
+
+        Raises CommentSavePending when the queued row is not written within
+        COMMENT_SAVE_WAIT seconds; any other exception means it was not saved.
+        """
+        if self.writer is None:
+            return insert_comments([row])[0]
+        # Hand this request's connection back to the pool while waiting, so
+        # a burst of waiting requests cannot starve the writer of connections
+        db.session.close()
+        try:
+            return self.writer.submit(row).result(timeout=self.save_wait)
+        except FutureTimeout:
+            raise CommentSavePending() from None
+
+def get_comment_intake():
+    """Comment intake for the current app, created on first use"""
+    intake = current_app.extensions.get('comment_intake')
+    if intake is None:
+        intake = current_app.extensions['comment_intake'] = CommentIntake(current_app._get_current_object())
+    return intake
+
+def build_comment_row(post_id, data, client_ip, status):
+    return {
+        'post_id': post_id,
+        'author_name': data.get('name') or 'Anonymous',
+        'author_email': data.get('email', ''),
+        'author_website': data.get('website'),
+        'author_ip': client_ip,
+        'content': data['content'],
+        'status': status,
+        'created_at': datetime.utcnow()
+    }
@@ -0,0 +1,323 @@
+"""
+Comment loading and serialization without per-row lazy loads.
+
+``Comment.to_dict`` walks ``replies`` and ``author`` lazily, which costs
+several queries per comment. These helpers fetch comments together with
+their authors in one joined query, build reply trees in memory and
+serialize each author and post once.
+"""
+
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select, update, delete, func, or_
+
+from app_unified import app, db, User, Post, Comment, USER_PROFILE, COMMENT_CONTENT, parse_utc_datetime
+from content_export import record_deletions
+
+COMMENT_STATUSES = ('pending', 'approved', 'spam', 'trash')
+
+# Bulk action -> status it sets ('delete' removes the comments and their replies)
+COMMENT_ACTIONS = {'approve': 'approved', 'unapprove': 'pending', 'spam': 'spam', 'trash': 'trash'}
+
+# Keep IN (...) lists below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+
+def post_summary(post):
+    return {
+        'id': post.id,
+        'title': post.title,
+        'slug': post.slug,
+        'status': post.status
+    } if post else None
+
+def comment_dict(comment, post, author):
+    """Same shape as Comment.to_dict, with the post summary and author dict supplied by the caller"""
+    return {
+        'id': comment.id,
+        'post_id': comment.post_id,
+        'post': post,
+        'author_id': comment.author_id,
+        'author': author,
+        'author_name': comment.author_name,
+        'author_email': comment.author_email,
+        'author_website': comment.author_website,
+        'content': comment.content,
+        'status': comment.status,
+        'parent_id': comment.parent_id,
+        'created_at': comment.created_at.isoformat(),
+        'replies': []
+    }
+
+def _serialize_rows(rows, post):
+    """Serialize (Comment, User) rows, converting each distinct author once"""
+    summary = post_summary(post)
+    authors = {}
+    nodes = {}
+    for comment, author in rows:
+        if author is not None and author.id not in authors:
+            authors[author.id] = author.to_dict()
+        nodes[comment.id] = comment_dict(comment, summary, authors.get(comment.author_id))
+    return nodes
+
+def _link_replies(nodes, ordered_ids):
+    """Append each node in ordered_ids to its parent's replies when the parent is loaded"""
+    for comment_id in ordered_ids:
+        node = nodes[comment_id]
+        parent = nodes.get(node['parent_id'])
+        if parent is not None:
+            parent['replies'].append(node)
+
+def descendants_cte(root_ids, status=None, nesting=False):
+    """Recursive CTE of the ids of every reply below root_ids (a list or an id SELECT), optionally only through comments with status"""
+    base = select(Comment.id).where(Comment.parent_id.in_(root_ids))
+    if status:
+        base = base.where(Comment.status == status)
+    tree = base.cte('comment_tree', recursive=True, nesting=nesting)
+    step = select(Comment.id).join(tree, Comment.parent_id == tree.c.id)
+    if status:
+        step = step.where(Comment.status == status)
+    return tree.union_all(step)
+
+def load_comment_tree(post, status='approved'):
+    """All comments of a post with the given status as nested threads, in one query.
+
+    Top-level comments are newest first, replies oldest first. Replies whose
+    parent is not visible (e.g. still pending) are left out with it.
+    """
+    rows = db.session.query(Comment, User).options(COMMENT_CONTENT, USER_PROFILE).outerjoin(
+        User, Comment.author_id == User.id
+    ).filter(
+        Comment.post_id == post.id,
+        Comment.status == status
+    ).order_by(Comment.created_at, Comment.id).all()
+
+    nodes = _serialize_rows(rows, post)
+    ordered_ids = [comment.id for comment, author in rows]
+    _link_replies(nodes, ordered_ids)
+
+    threads = [nodes[comment_id] for comment_id in ordered_ids if nodes[comment_id]['parent_id'] is None]
+    threads.reverse()
+    return threads
+
+def count_replies(node):
+    return sum(1 + count_replies(reply) for reply in node['replies'])
+
+def load_comment_threads_page(post, page=1, per_page=10, preview=3, status='approved'):
+    """One page of top-level threads with a preview of their replies.
+
+    Each thread carries ``reply_count`` (all replies below it) and at most
+    ``preview`` direct replies, each with their own nested replies.
+    """
+    root_filter = (
+        Comment.post_id == post.id,
+        Comment.parent_id == None,
+        Comment.status == status
+    )
+    total = Comment.query.filter(*root_filter).count()
+
+    root_rows = db.session.query(Comment, User).options(COMMENT_CONTENT, USER_PROFILE).outerjoin(
+        User, Comment.author_id == User.id
+    ).filter(
+        *root_filter
+    ).order_by(Comment.created_at.desc(), Comment.id.desc()).limit(per_page).offset((page - 1) * per_page).all()
+    root_ids = [comment.id for comment, author in root_rows]
+
+    reply_rows = []
+    if root_ids:
+        tree = descendants_cte(root_ids, status=status)
+        reply_rows = db.session.query(Comment, User).options(COMMENT_CONTENT, USER_PROFILE).outerjoin(
+            User, Comment.author_id == User.id
+        ).filter(
+            Comment.id.in_(select(tree.c.id))
+        ).order_by(Comment.created_at, Comment.id).all()
+
+    nodes = _serialize_rows(root_rows + reply_rows, post)
+    _link_replies(nodes, [comment.id for comment, author in reply_rows])
+
+    threads = []
+    for root_id in root_ids:
+        node = nodes[root_id]
+        node['reply_count'] = count_replies(node)
+        node['replies'] = node['replies'][:preview]
+        threads.append(node)
+
+    return {
+        'comments': threads,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page if per_page else 0,
+        'current_page': page
+    }
+
+def serialize_comments(comments):
+    """Serialize a flat list of comments (e.g. one admin page) with batched lookups.
+
+    Posts, authors and reply counts are each loaded with one IN query for the
+    whole list. Rows carry ``reply_count`` instead of nested ``replies``,
+    since every reply is listed as its own row.
+    """
+    if not comments:
+        return []
+
+    post_ids = {comment.post_id for comment in comments}
+    author_ids = {comment.author_id for comment in comments if comment.author_id}
+    comment_ids = [comment.id for comment in comments]
+
+    posts = {
+        post_id: {'id': post_id, 'title': title, 'slug': slug, 'status': status}
+        for post_id, title, slug, status in db.session.query(
+            Post.id, Post.title, Post.slug, Post.status
+        ).filter(Post.id.in_(post_ids))
+    }
+    authors = {
+        user.id: user.to_dict()
+        for user in (User.query.options(USER_PROFILE).filter(User.id.in_(author_ids)).all() if author_ids else [])
+    }
+    reply_counts = dict(
+        db.session.query(Comment.parent_id, func.count(Comment.id))
+        .filter(Comment.parent_id.in_(comment_ids))
+        .group_by(Comment.parent_id)
+    )
+
+    result = []
+    for comment in comments:
+        data = comment_dict(comment, posts.get(comment.post_id), authors.get(comment.author_id))
+        del data['replies']
+        data['reply_count'] = reply_counts.get(comment.id, 0)
+        result.append(data)
+    return result
+
+def comment_status_counts():
+    """Comment totals per status from a single GROUP BY"""
+    counts = dict(db.session.query(Comment.status, func.count(Comment.id)).group_by(Comment.status))
+    stats = {'total': sum(counts.values())}
+    for status in COMMENT_STATUSES:
+        stats[status] = counts.get(status, 0)
+    return stats
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def comment_filter_select(filters):
+    """SELECT of the ids of comments matching a moderation filter.
+
+    Supported keys: ``status``, ``post_id``, ``author_email``, ``author_ip``,
+    ``search`` (substring of content, author name or email), ``before``
+    (ISO timestamp) and ``older_than_hours``. At least one key is required
+    so a malformed request cannot match every comment.
+    """
+    conditions = []
+    if filters.get('status'):
+        conditions.append(Comment.status == filters['status'])
+    if filters.get('post_id'):
+        conditions.append(Comment.post_id == int(filters['post_id']))
+    if filters.get('author_email'):
+        conditions.append(Comment.author_email == filters['author_email'])
+    if filters.get('author_ip'):
+        conditions.append(Comment.author_ip == filters['author_ip'])
+    if filters.get('search'):
+        # Matched literally: a % or _ in the term must not widen a bulk delete
+        escaped = filters['search'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f'%{escaped}%'
+        conditions.append(or_(
+            Comment.content.like(pattern, escape='\\'),
+            Comment.author_name.like(pattern, escape='\\'),
+            Comment.author_email.like(pattern, escape='\\')
+        ))
+    if filters.get('before'):
+        conditions.append(Comment.created_at < parse_utc_datetime(filters['before']))
+    if filters.get('older_than_hours') is not None:
+        cutoff = datetime.utcnow() - timedelta(hours=float(filters['older_than_hours']))
+        conditions.append(Comment.created_at < cutoff)
+
+    if not conditions:
+        raise ValueError('At least one filter is required')
+    return select(Comment.id).where(*conditions)
+
+def _target_batches(comment_ids=None, filters=None):
+    """Yield id sources for one statement each: id chunks, or a single filter subquery"""
+    if filters:
+        yield comment_filter_select(filters)
+    else:
+        for chunk in _chunks(comment_ids or []):
+            yield chunk
+
+def _post_ids_for(targets):
+    return set(db.session.execute(select(Comment.post_id).where(Comment.id.in_(targets)).distinct()).scalars())
+
+def set_comment_status(status, comment_ids=None, filters=None):
+    """Set status on the selected comments with UPDATE statements; returns the number of rows changed"""
+    changed = 0
+    post_ids = set()
+    for targets in _target_batches(comment_ids, filters):
+        post_ids |= _post_ids_for(targets)
+        result = db.session.execute(
+            update(Comment).where(Comment.id.in_(targets), Comment.status != status).values(status=status),
+            execution_options={'synchronize_session': False}
+        )
+        changed += result.rowcount
+    if changed:
+        refresh_post_comment_stats(post_ids)
+    return changed
+
+def delete_comments(comment_ids=None, filters=None):
+    """Delete the selected comments and every reply below them; returns the number of rows deleted"""
+    deleted = 0
+    post_ids = set()
+    for targets in _target_batches(comment_ids, filters):
+        # Replies always belong to the same post as their root
+        post_ids |= _post_ids_for(targets)
+        # Nested so the WITH renders inside the subquery: the statement still starts with DELETE
+        tree = descendants_cte(targets, nesting=True)
+        deleted_ids = db.session.scalars(
+            delete(Comment).where(or_(Comment.id.in_(targets), Comment.id.in_(select(tree.c.id))))
+            .returning(Comment.id),
+            execution_options={'synchronize_session': False}
+        ).all()
+        record_deletions('comment', deleted_ids)
+        deleted += len(deleted_ids)
+    if deleted:
+        refresh_post_comment_stats(post_ids)
+    return deleted
+
+def comment_stats_values():
+    approved = (Comment.post_id == Post.id, Comment.status == 'approved')
+    return {
+        'comments_count': select(func.count(Comment.id)).where(*approved).scalar_subquery(),
+        'last_comment_at': select(func.max(Comment.created_at)).where(*approved).scalar_subquery(),
+        # Comment activity is not an edit of the post
+        'updated_at': Post.updated_at
+    }
+
+def refresh_post_comment_stats(post_ids):
+    """Recompute Post.comments_count and last_comment_at for post_ids inside the current transaction.
+
+    Called by every code path that creates, moderates or deletes comments,
+    before it commits, so the counters change together with the comments.
+    """
+    for chunk in _chunks(post_ids):
+        db.session.execute(
+            update(Post).where(Post.id.in_(chunk)).values(**comment_stats_values()),
+            execution_options={'synchronize_session': False}
+        )
+
+def reconcile_post_comment_stats():
+    """Fix the comment counters of every post that has drifted; returns the number of posts corrected"""
+    values = comment_stats_values()
+    result = db.session.execute(
+        update(Post).where(or_(
+            Post.comments_count.is_distinct_from(values['comments_count']),
+            Post.last_comment_at.is_distinct_from(values['last_comment_at'])
+        )).values(**values),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return result.rowcount
+
+@app.cli.command('reconcile-comment-stats')
+def reconcile_comment_stats_command():
+    """Recompute comments_count and last_comment_at for all posts."""
+    fixed = reconcile_post_comment_stats()
+    click.echo(f"Corrected comment stats on {fixed} posts")
@@ -0,0 +1,149 @@
+"""
+Streaming NDJSON export of the content graph.
+
+Every line is ``{"type": ..., "data": {...}}``. Rows are read with
+``yield_per`` (a server-side cursor on PostgreSQL, incremental fetches on
+SQLite) as plain column tuples, so memory stays flat however large the
+archive is. The last line is a watermark whose ``next_since`` can be passed
+back as ``since`` for the next incremental sync.
+
+An incremental export holds every row whose ``updated_at`` is at or after
+``since``, so edits and moderation (a comment marked spam, a category
+hidden) are picked up, plus a ``deleted`` record (``{"type": ...,
+"id": ..., "deleted_at": ...}``) per row deleted since then. Deleted rows
+are remembered as tombstones in ``deleted_records``: ORM deletes record
+them on flush, bulk deletes call ``record_deletions``.
+"""
+
+import json
+from datetime import datetime
+
+import click
+from sqlalchemy import event, insert, select
+from sqlalchemy.orm import Session
+
+from app_unified import app, db, User, Category, Tag, Post, Comment, Media, DeletedRecord, post_tags, parse_utc_datetime
+
+EXPORT_TYPES = ('users', 'categories', 'tags', 'posts', 'comments', 'media')
+
+# type -> (record type, model, column used for ``since``, exported columns)
+EXPORT_SOURCES = {
+    'users': ('user', User, User.updated_at, [
+        'id', 'username', 'email', 'first_name', 'last_name', 'role', 'avatar_url', 'bio',
+        'website', 'social_links', 'is_active', 'created_at', 'updated_at'
+    ]),
+    'categories': ('category', Category, Category.updated_at, [
+        'id', 'name', 'slug', 'description', 'parent_id', 'image_url', 'meta_title',
+        'meta_description', 'is_visible', 'created_at', 'updated_at'
+    ]),
+    'tags': ('tag', Tag, Tag.updated_at, ['id', 'name', 'slug', 'description', 'created_at', 'updated_at']),
+    'posts': ('post', Post, Post.updated_at, [
+        'id', 'title', 'slug', 'content', 'excerpt', 'featured_image', 'status', 'post_type',
+        'author_id', 'category_id', 'comment_status', 'view_count', 'meta_title',
+        'meta_description', 'meta_keywords', 'custom_fields', 'published_at', 'created_at', 'updated_at'
+    ]),
+    'comments': ('comment', Comment, Comment.updated_at, [
+        'id', 'post_id', 'author_id', 'author_name', 'author_email', 'author_website',
+        'content', 'status', 'parent_id', 'created_at', 'updated_at'
+    ]),
+    'media': ('media', Media, Media.updated_at, [
+        'id', 'title', 'filename', 'original_filename', 'url', 'file_type', 'mime_type',
+        'file_size', 'content_hash', 'alt_text', 'caption', 'description', 'uploaded_by',
+        'created_at', 'updated_at'
+    ])
+}
+
+RECORD_TYPES = {model: record_type for record_type, model, _, _ in EXPORT_SOURCES.values()}
+
+JSON_COLUMNS = {'social_links', 'custom_fields'}
+
+def _record(columns, row):
+    record = {}
+    # Datetimes are left to the JSON provider, which writes them as ISO 8601
+    for name, value in zip(columns, row):
+        if name in JSON_COLUMNS:
+            try:
+                value = json.loads(value) if value else {}
+            except ValueError:
+                value = {}
+        record[name] = value
+    return record
+
+def record_deletions(record_type, ids):
+    """Add tombstones for deleted rows to the current transaction"""
+    if ids:
+        db.session.execute(insert(DeletedRecord), [{'record_type': record_type, 'record_id': id_} for id_ in ids])
+
+@event.listens_for(Session, 'after_flush')
+def _record_orm_deletions(session, flush_context):
+    rows = [
+        {'record_type': RECORD_TYPES[type(obj)], 'record_id': obj.id}
+        for obj in session.deleted if type(obj) in RECORD_TYPES
+    ]
+    if rows:
+        session.connection().execute(insert(DeletedRecord.__table__), rows)
+
+def _post_tag_ids(post_ids):
+    tag_ids = {post_id: [] for post_id in post_ids}
+    rows = db.session.execute(
+        select(post_tags.c.post_id, post_tags.c.tag_id).where(post_tags.c.post_id.in_(post_ids))
+    )
+    for post_id, tag_id in rows:
+        tag_ids[post_id].append(tag_id)
+    return tag_ids
+
+def export_records(since=None, types=EXPORT_TYPES, batch_size=500):
+    """Yield export records as dicts, one table at a time in id order"""
+    started_at = datetime.utcnow()
+    yield {'type': 'export', 'data': {
+        'started_at': started_at.isoformat(),
+        'since': since.isoformat() if since else None,
+        'types': list(types)
+    }}
+
+    for export_type in types:
+        record_type, model, changed_column, columns = EXPORT_SOURCES[export_type]
+        query = select(*[getattr(model, name) for name in columns]).order_by(model.id)
+        if since:
+            query = query.where(changed_column >= since)
+
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            records = [_record(columns, row) for row in rows]
+            if export_type == 'posts':
+                tag_ids = _post_tag_ids([record['id'] for record in records])
+                for record in records:
+                    record['tag_ids'] = tag_ids[record['id']]
+            for record in records:
+                yield {'type': record_type, 'data': record}
+
+        if since:
+            deletions = select(DeletedRecord.record_id, DeletedRecord.deleted_at).where(
+                DeletedRecord.record_type == record_type, DeletedRecord.deleted_at >= since
+            ).order_by(DeletedRecord.id)
+            for record_id, deleted_at in db.session.execute(deletions.execution_options(yield_per=batch_size)):
+                yield {'type': 'deleted', 'data': {'type': record_type, 'id': record_id, 'deleted_at': deleted_at}}
+
+    yield {'type': 'watermark', 'data': {'next_since': started_at.isoformat()}}
+
+def export_ndjson(since=None, types=EXPORT_TYPES, batch_size=500):
+    """Yield the export as NDJSON lines (UTF-8 bytes, encoded by the app's JSON provider)"""
+    for record in export_records(since=since, types=types, batch_size=batch_size):
+        yield app.json.dumpb(record) + b'\n'
+
+def parse_since(value):
+    """Parse the ``since`` watermark (ISO 8601, converted to UTC); returns None for empty values"""
+    return parse_utc_datetime(value)
+
+@app.cli.command('export-content')
+@click.option('--since', default=None, help='Only rows changed since this ISO timestamp (a previous next_since).')
+@click.option('--types', default=','.join(EXPORT_TYPES), show_default=True, help='Comma separated record types.')
+@click.option('--output', type=click.File('wb'), default='-', help='Output file (default stdout).')
+def export_content_command(since, types, output):
+    """Export posts, tags, categories, comments, media metadata and users as NDJSON."""
+    types = [t.strip() for t in types.split(',') if t.strip()]
+    unknown = set(types) - set(EXPORT_TYPES)
+    if unknown:
+        raise click.BadParameter(f"Unknown types: {', '.join(sorted(unknown))}", param_hint='--types')
+    for line in export_ndjson(since=parse_since(since), types=types):
+        output.write(line)
@@ -0,0 +1,80 @@
+"""
+Admin dashboard statistics.
+
+All totals come from a single SELECT of scalar subqueries, the recent posts
+and comments from a few batched queries, and the whole payload is cached
+for DASHBOARD_CACHE_TTL seconds per worker, cleared when posts, comments,
+users or media are written.
+"""
+
+from flask import current_app
+from sqlalchemy import select, func
+
+from app_unified import db, User, Post, Comment, Media, USER_PROFILE, COMMENT_CONTENT
+from cache import TTLCache
+from comment_service import serialize_comments
+
+dashboard_cache = TTLCache('dashboard', tables={'posts', 'comments', 'users', 'media'})
+
+RECENT_LIMIT = 5
+
+def _count(model, *conditions):
+    return select(func.count(model.id)).where(*conditions).scalar_subquery()
+
+def dashboard_totals():
+    """Every dashboard total in one round trip"""
+    row = db.session.execute(select(
+        _count(Post, Post.status == 'published').label('total_posts'),
+        _count(Post, Post.post_type == 'page', Post.status == 'published').label('total_pages'),
+        _count(Comment, Comment.status == 'approved').label('total_comments'),
+        _count(User, User.is_active == True).label('total_users'),
+        _count(Media).label('total_media')
+    )).one()
+    return dict(row._mapping)
+
+def recent_posts(limit=RECENT_LIMIT):
+    """Latest posts without content, with authors loaded in one IN query"""
+    rows = db.session.query(
+        Post.id, Post.title, Post.slug, Post.excerpt, Post.status, Post.post_type,
+        Post.author_id, Post.view_count, Post.published_at, Post.created_at, Post.updated_at
+    ).order_by(Post.created_at.desc()).limit(limit).all()
+
+    author_ids = {row.author_id for row in rows if row.author_id}
+    authors = {
+        user.id: user.to_dict()
+        for user in (User.query.options(USER_PROFILE).filter(User.id.in_(author_ids)).all() if author_ids else [])
+    }
+    return [
+        {
+            'id': row.id,
+            'title': row.title,
+            'slug': row.slug,
+            'excerpt': row.excerpt,
+            'status': row.status,
+            'post_type': row.post_type,
+            'author_id': row.author_id,
+            'author': authors.get(row.author_id),
+            'view_count': row.view_count,
+            'published_at': row.published_at.isoformat() if row.published_at else None,
+            'created_at': row.created_at.isoformat(),
+            'updated_at': row.updated_at.isoformat() if row.updated_at else None
+        }
+        for row in rows
+    ]
+
+def recent_comments(limit=RECENT_LIMIT):
+    comments = Comment.query.options(COMMENT_CONTENT).order_by(Comment.created_at.desc()).limit(limit).all()
+    return serialize_comments(comments)
+
+def build_dashboard_stats():
+    stats = dashboard_totals()
+    stats['recent_posts'] = recent_posts()
+    stats['recent_comments'] = recent_comments()
+    return stats
+
+def dashboard_stats():
+    """Dashboard payload, served from the per-worker cache when fresh"""
+    ttl = current_app.config['DASHBOARD_CACHE_TTL']
+    if ttl <= 0:
+        return build_dashboard_stats()
+    return dashboard_cache.get('stats', build_dashboard_stats, ttl)
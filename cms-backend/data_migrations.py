@@ -0,0 +1,290 @@
+"""
+Batched data migrations (backfills) and the ``flask backfill`` command.
+
+Schema revisions in migrations/ only make quick changes (new tables, ADD
+COLUMN with a default, CREATE INDEX) and run with ``flask db upgrade``.
+Filling a new column for existing rows is a backfill registered here,
+run afterwards with ``flask backfill`` while the site keeps serving.
+
+Rows are visited in primary-key order, BACKFILL_BATCH_SIZE at a time.
+Anything slow (reading files, hashing) happens before a batch's write
+transaction starts; each write transaction covers one batch and is
+followed by a pause of BACKFILL_PAUSE_MS, so the SQLite write lock is
+only ever held for a single batch. Progress is saved in the same
+transaction as each batch, so an interrupted backfill resumes where it
+stopped.
+
+``flask backfill --dry-run`` runs a few batches, rolls them back and
+estimates how long the full run takes and how long each batch holds the
+write lock.
+"""
+
+import math
+import statistics
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import click
+from sqlalchemy import bindparam, func, inspect, select, update
+from sqlalchemy.exc import OperationalError
+
+from app_unified import app, db, Post, Category, Tag, Comment, Media, DataMigration, hash_stream, upload_key
+from comment_service import comment_stats_values
+from storage import get_storage
+
+LOCK_RETRIES = 5
+
+# Schema checks for revisions that must also work on databases created by create_all()
+
+def has_table(bind, table):
+    return inspect(bind).has_table(table)
+
+def has_column(bind, table, column):
+    return has_table(bind, table) and column in {c['name'] for c in inspect(bind).get_columns(table)}
+
+def has_index(bind, table, index):
+    return has_table(bind, table) and index in {i['name'] for i in inspect(bind).get_indexes(table)}
+
+class Backfill(ABC):
+    """A resumable data migration over one table, walked in primary-key order; subclasses implement ``apply``"""
+
+    name = None
+    description = ''
+    model = None
+    requires = ()  # columns added by the schema revision this backfill belongs to
+
+    @property
+    def table(self):
+        return self.model.__table__
+
+    def columns(self):
+        return [self.table.c.id]
+
+    def pending(self):
+        """Condition for rows that still need work (None: every row)"""
+        return None
+
+    def _select(self, *columns):
+        condition = self.pending()
+        query = select(*columns)
+        return query.where(condition) if condition is not None else query
+
+    def count(self, conn, after_id):
+        return conn.execute(self._select(func.count()).select_from(self.table).where(self.table.c.id > after_id)).scalar()
+
+    def fetch(self, conn, after_id, limit):
+        return conn.execute(
+            self._select(*self.columns()).where(self.table.c.id > after_id).order_by(self.table.c.id).limit(limit)
+        ).all()
+
+    def prepare(self, rows):
+        """Compute new values before the write transaction starts"""
+        return rows
+
+    @abstractmethod
+    def apply(self, conn, prepared):
+        """Write one batch; returns the number of rows changed"""
+
+class MediaContentHash(Backfill):
+    name = 'media_content_hash'
+    description = 'SHA-256 of each stored media file (revision 0003)'
+    model = Media
+    requires = (('media', 'content_hash'),)
+
+    def columns(self):
+        return [self.table.c.id, self.table.c.url]
+
+    def pending(self):
+        return self.table.c.content_hash.is_(None)
+
+    def prepare(self, rows):
+        storage = get_storage()
+        hashes = []
+        for media_id, url in rows:
+            key = upload_key(url)
+            # Files that are not in this storage backend stay NULL and are skipped from now on
+            if not key or not storage.exists(key):
+                continue
+            with storage.open(key) as f:
+                hashes.append({'media_id': media_id, 'hash': hash_stream(f)[0]})
+        return hashes
+
+    def apply(self, conn, hashes):
+        if not hashes:
+            return 0
+        conn.execute(
+            update(self.table).where(self.table.c.id == bindparam('media_id')).values(content_hash=bindparam('hash')),
+            hashes
+        )
+        return len(hashes)
+
+class PostCommentStats(Backfill):
+    name = 'post_comment_stats'
+    description = 'Approved comments_count and last_comment_at on posts (revision 0004)'
+    model = Post
+    requires = (('posts', 'comments_count'), ('posts', 'last_comment_at'))
+
+    def apply(self, conn, rows):
+        post_ids = [row.id for row in rows]
+        return conn.execute(update(Post).where(Post.id.in_(post_ids)).values(**comment_stats_values())).rowcount
+
+class UpdatedAtFromCreatedAt(Backfill):
+    """updated_at = created_at for rows from before the table had updated_at"""
+
+    def __init__(self, model):
+        self.model = model
+        self.name = f'{model.__tablename__}_updated_at'
+        self.description = f'updated_at of existing {model.__tablename__} for incremental exports (revision 0006)'
+        self.requires = ((model.__tablename__, 'updated_at'),)
+
+    def pending(self):
+        return self.table.c.updated_at.is_(None)
+
+    def apply(self, conn, rows):
+        return conn.execute(
+            update(self.table).where(self.table.c.id.in_([row.id for row in rows]))
+            .values(updated_at=func.coalesce(self.table.c.created_at, func.current_timestamp()))
+        ).rowcount
+
+BACKFILLS = [MediaContentHash(), PostCommentStats()] + [
+    UpdatedAtFromCreatedAt(model) for model in (Category, Tag, Comment, Media)
+]
+
+def get_backfill(name):
+    for backfill in BACKFILLS:
+        if backfill.name == name:
+            return backfill
+    raise click.BadParameter(f"Unknown backfill '{name}'. Known: {', '.join(b.name for b in BACKFILLS)}")
+
+def missing_schema(conn, backfill):
+    missing = [] if has_table(conn, 'data_migrations') else ['data_migrations']
+    return missing + [f"{table}.{column}" for table, column in backfill.requires if not has_column(conn, table, column)]
+
+def load_progress(conn, name):
+    table = DataMigration.__table__
+    return conn.execute(select(table).where(table.c.name == name)).first()
+
+def save_progress(conn, name, last_id, rows_done, completed=False):
+    table = DataMigration.__table__
+    now = datetime.utcnow()
+    values = {'last_id': last_id, 'rows_done': rows_done, 'updated_at': now, 'completed_at': now if completed else None}
+    if not conn.execute(update(table).where(table.c.name == name).values(**values)).rowcount:
+        conn.execute(table.insert().values(name=name, started_at=now, **values))
+
+def _write_batch(conn, backfill, prepared, progress, dry_run):
+    """Apply one batch in its own transaction, retrying while another writer holds the lock"""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            started = time.perf_counter()
+            changed = backfill.apply(conn, prepared)
+            save_progress(conn, backfill.name, *progress)
+            if dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+            return changed, (time.perf_counter() - started) * 1000
+        except OperationalError:
+            conn.rollback()
+            if attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(0.5 * (attempt + 1))
+
+def run_backfill(backfill, batch_size, pause, restart=False, dry_run=False, sample_batches=3):
+    """Run (or with dry_run, time and roll back a few batches of) one backfill.
+
+    Returns a dict with pending, batches, rows_changed, prepare_ms and write_ms
+    lists, or None when the backfill already completed or its columns are missing.
+    """
+    with db.engine.connect() as conn:
+        missing = missing_schema(conn, backfill)
+        if missing:
+            click.echo(f"{backfill.name}: waiting for `flask db upgrade` (missing {', '.join(missing)})")
+            return None
+
+        progress = load_progress(conn, backfill.name)
+        if progress and progress.completed_at and not restart:
+            click.echo(f"{backfill.name}: completed {progress.completed_at:%Y-%m-%d %H:%M} ({progress.rows_done} rows)")
+            return None
+        last_id, rows_done = (progress.last_id, progress.rows_done) if progress and not restart else (0, 0)
+
+        stats = {'pending': backfill.count(conn, last_id), 'batches': 0, 'rows_changed': 0, 'prepare_ms': [], 'write_ms': []}
+        conn.commit()
+        click.echo(f"{backfill.name}: {stats['pending']} rows to visit after id {last_id}{' (dry run)' if dry_run else ''}")
+
+        while not (dry_run and stats['batches'] >= sample_batches):
+            rows = backfill.fetch(conn, last_id, batch_size)
+            # End the read transaction before the slow part so writers are never blocked by it
+            conn.commit()
+            if not rows:
+                if not dry_run:
+                    save_progress(conn, backfill.name, last_id, rows_done, completed=True)
+                    conn.commit()
+                break
+
+            started = time.perf_counter()
+            prepared = backfill.prepare(rows)
+            stats['prepare_ms'].append((time.perf_counter() - started) * 1000)
+
+            last_id, rows_done = rows[-1].id, rows_done + len(rows)
+            changed, write_ms = _write_batch(conn, backfill, prepared, (last_id, rows_done), dry_run)
+            stats['write_ms'].append(write_ms)
+            stats['rows_changed'] += changed
+            stats['batches'] += 1
+            if not dry_run and stats['batches'] % 20 == 0:
+                click.echo(f"  {rows_done} rows, last id {last_id}")
+            time.sleep(pause)
+        return stats
+
+def _median(values):
+    return statistics.median(values) if values else 0.0
+
+def report(backfill, stats, batch_size, pause, dry_run):
+    if not stats:
+        return
+    prepare_ms, write_ms = _median(stats['prepare_ms']), _median(stats['write_ms'])
+    lock_ms = max(stats['write_ms'], default=0.0)
+    if dry_run:
+        batches = math.ceil(stats['pending'] / batch_size)
+        estimate = batches * ((prepare_ms + write_ms) / 1000 + pause)
+        click.echo(
+            f"  sampled {stats['batches']} batches of {batch_size}: prepare {prepare_ms:.1f} ms, "
+            f"write {write_ms:.1f} ms (longest write lock {lock_ms:.1f} ms); "
+            f"estimated {batches} batches, {estimate:.1f} s including pauses"
+        )
+    else:
+        click.echo(
+            f"  done: {stats['batches']} batches, {stats['rows_changed']} rows changed, "
+            f"median write {write_ms:.1f} ms, longest write lock {lock_ms:.1f} ms"
+        )
+
+@app.cli.command('backfill')
+@click.argument('names', nargs=-1)
+@click.option('--batch-size', type=int, help='Rows per write transaction (default: BACKFILL_BATCH_SIZE).')
+@click.option('--pause-ms', type=int, help='Pause between batches (default: BACKFILL_PAUSE_MS).')
+@click.option('--dry-run', is_flag=True, help='Time a few batches, roll them back and estimate the full run.')
+@click.option('--sample-batches', default=3, show_default=True, help='Batches timed by --dry-run.')
+@click.option('--restart', is_flag=True, help='Visit every row again, even if the backfill completed.')
+@click.option('--list', 'list_only', is_flag=True, help='Show known backfills and their progress.')
+def backfill_command(names, batch_size, pause_ms, dry_run, sample_batches, restart, list_only):
+    """Run pending batched data migrations (after `flask db upgrade`)."""
+    backfills = [get_backfill(name) for name in names] or BACKFILLS
+    batch_size = batch_size or app.config['BACKFILL_BATCH_SIZE']
+    pause = (app.config['BACKFILL_PAUSE_MS'] if pause_ms is None else pause_ms) / 1000
+
+    if list_only:
+        with db.engine.connect() as conn:
+            for backfill in backfills:
+                progress = load_progress(conn, backfill.name) if has_table(conn, 'data_migrations') else None
+                if progress is None:
+                    state = 'not started'
+                elif progress.completed_at:
+                    state = f"completed {progress.completed_at:%Y-%m-%d %H:%M}"
+                else:
+                    state = f"in progress, last id {progress.last_id}"
+                click.echo(f"{backfill.name}: {backfill.description} [{state}]")
+        return
+
+    for backfill in backfills:
+        stats = run_backfill(backfill, batch_size, pause, restart=restart, dry_run=dry_run, sample_batches=sample_batches)
+        report(backfill, stats, batch_size, pause, dry_run)
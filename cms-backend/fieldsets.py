@@ -0,0 +1,256 @@
+"""
+Sparse fieldsets for list endpoints.
+
+``?fields=id,title,slug,excerpt,author.name`` returns only those fields,
+and ``?include=author,tags`` adds whole related records. The selected
+columns are pushed down into the SQL SELECT: the route swaps its ORM
+entity for ``fieldset.columns`` (keeping its filters, ordering and
+paging), and each included relation is loaded with one IN query that
+selects only the related columns asked for.
+
+    fields=title,author.name    title, plus author with only ``name``
+    include=author              every default field of the author
+    fields=author               same as include=author
+    include=tags&fields=slug    slug and full tags
+
+``id`` is always returned. Without ``fields`` every default field of the
+resource is returned (plus ``include``); without both parameters the
+route answers as it always has. Related records in a fieldset are flat:
+a category comes without its ``children``.
+"""
+
+import json
+from datetime import datetime
+
+from sqlalchemy import select, func
+
+from app_unified import db, User, Category, Tag, Post, Comment, Media, post_tags
+
+# Keep IN (...) lists below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+
+# Text columns holding JSON, returned decoded like the to_dict() methods do
+JSON_COLUMNS = {'social_links', 'custom_fields'}
+
+class FieldsetError(ValueError):
+    pass
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _value(name, value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if name in JSON_COLUMNS:
+        try:
+            return json.loads(value) if value else {}
+        except ValueError:
+            return {}
+    return value
+
+class Resource:
+    """Fields one model exposes: plain columns, values computed from columns,
+    per-row counts loaded in one query, and relations to other resources"""
+
+    def __init__(self, model, columns, computed=None, counts=None, relations=None):
+        self.model = model
+        self.columns = columns
+        self.computed = computed or {}  # name -> (column names it reads, fn(row mapping))
+        self.counts = counts or {}  # name -> fn(ids) -> {id: value}
+        self.relations = relations or {}  # name -> Relation
+
+    @property
+    def fields(self):
+        return [*self.columns, *self.computed, *self.counts]
+
+class Relation:
+    """A related resource keyed by a column of the parent row.
+
+    ``fetch(keys, columns)`` returns {key: [rows]} with ``columns`` of the
+    related model; ``many`` relations serialize as a list.
+    """
+
+    def __init__(self, target, key, fetch, many=False):
+        self.target = target  # name in RESOURCES
+        self.key = key
+        self.fetch = fetch
+        self.many = many
+
+def _fetch_by_id(model):
+    def fetch(keys, columns):
+        found = {}
+        for chunk in _chunks(keys):
+            for row in db.session.execute(select(*columns).where(model.id.in_(chunk))):
+                found[row.id] = [row]
+        return found
+    return fetch
+
+def _fetch_post_tags(post_ids, columns):
+    found = {}
+    for chunk in _chunks(post_ids):
+        rows = db.session.execute(
+            select(post_tags.c.post_id.label('_key'), *columns)
+            .join(post_tags, post_tags.c.tag_id == Tag.id)
+            .where(post_tags.c.post_id.in_(chunk))
+            .order_by(post_tags.c.post_id, Tag.id)
+        )
+        for row in rows:
+            found.setdefault(row._key, []).append(row)
+    return found
+
+def _reply_counts(comment_ids):
+    counts = {}
+    for chunk in _chunks(comment_ids):
+        counts.update(db.session.query(Comment.parent_id, func.count(Comment.id))
+                      .filter(Comment.parent_id.in_(chunk)).group_by(Comment.parent_id))
+    return counts
+
+def _display_name(row):
+    full_name = ' '.join(part for part in (row['first_name'], row['last_name']) if part)
+    return full_name or row['username']
+
+USER_COLUMNS = [
+    'id', 'username', 'email', 'first_name', 'last_name', 'role', 'avatar_url', 'bio',
+    'website', 'social_links', 'is_active', 'created_at', 'updated_at'
+]
+
+RESOURCES = {
+    'users': Resource(User, USER_COLUMNS, computed={
+        'name': (('first_name', 'last_name', 'username'), _display_name)
+    }),
+    'categories': Resource(Category, [
+        'id', 'name', 'slug', 'description', 'parent_id', 'image_url', 'meta_title',
+        'meta_description', 'is_visible', 'created_at'
+    ]),
+    'tags': Resource(Tag, ['id', 'name', 'slug', 'description', 'created_at']),
+    'posts': Resource(Post, [
+        'id', 'title', 'slug', 'excerpt', 'featured_image', 'status', 'post_type', 'author_id',
+        'category_id', 'comment_status', 'view_count', 'meta_title', 'meta_description',
+        'meta_keywords', 'custom_fields', 'published_at', 'created_at', 'updated_at',
+        'comments_count', 'last_comment_at'
+    ], relations={
+        'author': Relation('users', 'author_id', _fetch_by_id(User)),
+        'category': Relation('categories', 'category_id', _fetch_by_id(Category)),
+        'tags': Relation('tags', 'id', _fetch_post_tags, many=True)
+    }),
+    'comments': Resource(Comment, [
+        'id', 'post_id', 'author_id', 'author_name', 'author_email', 'author_website',
+        'content', 'status', 'parent_id', 'created_at'
+    ], counts={'reply_count': _reply_counts}, relations={
+        'post': Relation('posts', 'post_id', _fetch_by_id(Post)),
+        'author': Relation('users', 'author_id', _fetch_by_id(User))
+    }),
+    'media': Resource(Media, [
+        'id', 'title', 'filename', 'original_filename', 'url', 'file_type', 'mime_type',
+        'file_size', 'alt_text', 'caption', 'description', 'uploaded_by', 'content_hash', 'created_at'
+    ], relations={
+        'uploader': Relation('users', 'uploaded_by', _fetch_by_id(User))
+    })
+}
+
+# Fields a fieldset may name that full list responses leave out (e.g. post content)
+EXTRA_FIELDS = {'posts': ['content']}
+
+def _split(value):
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+class Fieldset:
+    def __init__(self, resource, fields, nested):
+        self.resource = resource
+        self.fields = fields  # own fields, in the order asked
+        self.nested = nested  # relation name -> Fieldset of the related resource
+
+    def _own_columns(self):
+        names = {'id'}
+        for field in self.fields:
+            if field in self.resource.computed:
+                names.update(self.resource.computed[field][0])
+            elif field not in self.resource.counts:
+                names.add(field)
+        for name in self.nested:
+            names.add(self.resource.relations[name].key)
+        return names
+
+    @property
+    def columns(self):
+        """Column expressions for the SELECT; ``id`` first"""
+        model = self.resource.model
+        names = self._own_columns() - {'id'}
+        return [model.id, *(getattr(model, name) for name in sorted(names))]
+
+    def _serialize_row(self, mapping, counts):
+        item = {'id': mapping['id']}
+        for field in self.fields:
+            if field in self.resource.computed:
+                item[field] = self.resource.computed[field][1](mapping)
+            elif field in counts:
+                item[field] = counts[field].get(mapping['id'], 0)
+            else:
+                item[field] = _value(field, mapping[field])
+        return item
+
+    def serialize(self, rows):
+        """Dicts for rows selected with ``columns``, relations loaded in one query each"""
+        mappings = [row._mapping for row in rows]
+        ids = [mapping['id'] for mapping in mappings]
+        counts = {name: fn(ids) for name, fn in self.resource.counts.items() if name in self.fields}
+        items = [self._serialize_row(mapping, counts) for mapping in mappings]
+
+        for name, fieldset in self.nested.items():
+            relation = self.resource.relations[name]
+            keys = {mapping[relation.key] for mapping in mappings} - {None}
+            found = relation.fetch(keys, fieldset.columns) if keys else {}
+            related = {key: fieldset.serialize(rows) for key, rows in found.items()}
+            for item, mapping in zip(items, mappings):
+                values = related.get(mapping[relation.key], [])
+                item[name] = values if relation.many else (values[0] if values else None)
+        return items
+
+def _resource_fields(resource_name):
+    return RESOURCES[resource_name].fields + EXTRA_FIELDS.get(resource_name, [])
+
+def _build(resource_name, fields, includes):
+    resource = RESOURCES[resource_name]
+    allowed = _resource_fields(resource_name)
+    own, nested_fields = [], {}
+    for field in fields:
+        name, _, sub = field.partition('.')
+        if name in resource.relations:
+            nested_fields.setdefault(name, [])
+            if sub:
+                nested_fields[name].append(sub)
+        elif sub or name not in allowed:
+            raise FieldsetError(f"Unknown field '{field}' for {resource_name}; "
+                                f"choose from {', '.join(allowed + list(resource.relations))}")
+        elif name not in own:
+            own.append(name)
+
+    for name in includes:
+        if name not in resource.relations:
+            raise FieldsetError(f"Unknown include '{name}' for {resource_name}; "
+                                f"choose from {', '.join(resource.relations)}")
+        # A bare include asks for the whole record
+        nested_fields[name] = []
+
+    if not fields:
+        own = list(resource.fields)
+    nested = {}
+    for name, sub_fields in nested_fields.items():
+        related = resource.relations[name].target
+        for sub in sub_fields:
+            if sub not in _resource_fields(related):
+                raise FieldsetError(f"Unknown field '{name}.{sub}'; choose from {', '.join(_resource_fields(related))}")
+        nested[name] = Fieldset(RESOURCES[related], sub_fields or list(RESOURCES[related].fields), {})
+    return Fieldset(resource, [field for field in own if field != 'id'], nested)
+
+def requested_fieldset(resource_name, args):
+    """Fieldset from ?fields= and ?include=, or None when neither is given.
+
+    Raises FieldsetError (a ValueError) for unknown fields.
+    """
+    fields, includes = _split(args.get('fields')), _split(args.get('include'))
+    if not fields and not includes:
+        return None
+    return _build(resource_name, fields, includes)
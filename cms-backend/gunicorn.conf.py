@@ -0,0 +1,40 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py app_unified:app
+
+The app is imported once in the master (preload_app) and the one-time
+database initialization runs there before any worker is forked, so
+workers start without importing or initializing anything.
+"""
+
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Worker metric snapshots (see metrics.py); totals restart with the master
+metrics_dir = os.environ.get('METRICS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics')
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    # Runs in the master once the preloaded app is imported, before any worker is forked
+    if not preload_app:
+        return
+    from app_unified import app, db, ensure_initialized
+    ensure_initialized()
+    # Workers must not share the master's SQLite connections
+    with app.app_context():
+        db.engine.dispose()
+
+def post_fork(server, worker):
+    # Labels this worker in cms_worker_info
+    os.environ['GUNICORN_WORKER_AGE'] = str(worker.age)
+    if not preload_app:
+        return
+    from app_unified import app, db
+    # Drop pooled connections inherited from the master without closing them under it
+    with app.app_context():
+        db.engine.dispose(close=False)
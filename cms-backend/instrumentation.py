@@ -0,0 +1,175 @@
+"""
+Per-request performance instrumentation.
+
+Every request records its wall time, the number and total duration of the
+SQL statements it ran (SQLAlchemy cursor events on every engine) and the
+time spent encoding JSON. The numbers go out in a ``Server-Timing``
+header, shown in the browser's network panel, and as one JSON line per
+request on the ``cms.requests`` logger.
+
+Statements slower than SLOW_QUERY_MS are logged on ``cms.sql`` with the
+endpoint that ran them. A SELECT repeated N_PLUS_ONE_THRESHOLD times or
+more within one request, usually a relationship lazy-loaded once per row
+of a list, is flagged there too and listed in the request's log line.
+
+For streamed responses (exports, long lists) the timings cover the work done before
+the body starts streaming.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app_unified import app
+from json_provider import json_provider_class
+
+request_log = logging.getLogger('cms.requests')
+sql_log = logging.getLogger('cms.sql')
+
+MAX_STATEMENT_LENGTH = 1000
+
+def _json_lines(logger):
+    # One JSON object per line on stderr, which gunicorn and Render collect as-is
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+_json_lines(request_log)
+_json_lines(sql_log)
+
+def _short(statement):
+    return re.sub(r'\s+', ' ', statement).strip()[:MAX_STATEMENT_LENGTH]
+
+class RequestStats:
+    """Timings collected for the current request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.selects = Counter()
+
+    def record_query(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        if statement.lstrip()[:6].upper() == 'SELECT':
+            self.selects[statement] += 1
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def repeated_selects(self, threshold):
+        return [(statement, count) for statement, count in self.selects.most_common() if count >= threshold]
+
+    def server_timing(self, total):
+        app_time = max(total - self.db_time - self.serialize_time, 0)
+        return ', '.join([
+            f'app;dur={app_time * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}'
+        ])
+
+def current_stats():
+    """Stats of the request being handled on this thread, or None"""
+    return g.get('perf') if has_request_context() else None
+
+@contextmanager
+def _serialize_timer():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = current_stats()
+        if stats is not None:
+            stats.serialize_time += time.perf_counter() - started
+
+def timed_json_provider(base):
+    """``base`` (a JSON provider class) adding its encoding time to the request's stats"""
+
+    class TimedJSONProvider(base):
+        def dumps(self, obj, **kwargs):
+            with _serialize_timer():
+                return super().dumps(obj, **kwargs)
+
+        def dumpb(self, obj, **kwargs):
+            with _serialize_timer():
+                return super().dumpb(obj, **kwargs)
+
+    return TimedJSONProvider
+
+app.json = timed_json_provider(json_provider_class(app.config['JSON_PROVIDER']))(app)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_started', time.perf_counter())
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.record_query(statement, elapsed)
+    if elapsed * 1000 >= app.config['SLOW_QUERY_MS']:
+        # Parameters are left out: they can hold password hashes and personal data
+        sql_log.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(elapsed * 1000, 1),
+            'endpoint': request.endpoint,
+            'path': request.path,
+            'statement': _short(statement)
+        }))
+
+@app.before_request
+def start_request_stats():
+    g.perf = RequestStats()
+
+@app.after_request
+def report_request_stats(response):
+    stats = g.get('perf')
+    if stats is None:
+        return response
+    total = stats.elapsed()
+
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = stats.server_timing(total)
+
+    repeated = stats.repeated_selects(app.config['N_PLUS_ONE_THRESHOLD'])
+    for statement, count in repeated:
+        sql_log.warning(json.dumps({
+            'event': 'n_plus_one',
+            'count': count,
+            'endpoint': request.endpoint,
+            'path': request.path,
+            'statement': _short(statement)
+        }))
+
+    if app.config['REQUEST_LOG']:
+        entry = {
+            'event': 'request',
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 1),
+            'db_queries': stats.queries,
+            'db_ms': round(stats.db_time * 1000, 1),
+            'serialize_ms': round(stats.serialize_time * 1000, 1)
+        }
+        if repeated:
+            entry['n_plus_one'] = [{'count': count, 'statement': _short(statement)[:200]} for statement, count in repeated]
+        request_log.info(json.dumps(entry))
+    return response
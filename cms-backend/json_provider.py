@@ -0,0 +1,129 @@
+"""
+JSON encoding of responses.
+
+JSON_PROVIDER picks the encoder behind ``jsonify``:
+
+  auto    orjson when it is installed, the standard library otherwise
+  orjson  orjson (startup fails when it is not installed)
+  stdlib  Python's json module, as Flask ships it
+
+Both providers write compact UTF-8 (indented only in debug mode), keep
+Flask's sorted keys, and encode datetime and date values as ISO 8601
+instead of Flask's HTTP dates, so payloads may hold them directly.
+orjson encodes those natively, as well as dicts, lists and strings, in C
+and straight to bytes.
+
+``json_list_response`` streams long lists: the items are serialized and
+encoded a chunk at a time while the body is sent, so the dicts for the
+whole list are never built at once. ``app.json.dumpb`` encodes one value
+to bytes, e.g. for NDJSON lines.
+"""
+
+from datetime import date
+
+from flask import current_app, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDERS = ('auto', 'orjson', 'stdlib')
+
+# Items serialized and encoded per chunk of a streamed list
+STREAM_CHUNK_SIZE = 100
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider with ISO 8601 dates and unescaped UTF-8"""
+
+    default = staticmethod(_default)
+    ensure_ascii = False
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def _encode(self, obj, pretty=False):
+        if pretty:
+            return DefaultJSONProvider.dumps(self, obj, indent=2).encode()
+        return DefaultJSONProvider.dumps(self, obj, separators=(',', ':')).encode()
+
+    def dumpb(self, obj, pretty=False):
+        """JSON as UTF-8 bytes, compact unless ``pretty``"""
+        return self._encode(obj, pretty)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumpb(obj, pretty=self._pretty()) + b'\n', mimetype=self.mimetype)
+
+class OrjsonJSONProvider(StdlibJSONProvider):
+    """orjson for encoding and decoding; falls back to the stdlib for what it
+    rejects (integers beyond 64 bits, non-scalar dict keys, json.dumps arguments)"""
+
+    def _options(self, pretty):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, pretty=False):
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._options(pretty))
+        except orjson.JSONEncodeError:
+            return super()._encode(obj, pretty)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+def json_provider_class(name):
+    """Provider class for a JSON_PROVIDER setting"""
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(JSON_PROVIDERS)}, not {name!r}")
+    if name == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson but orjson is not installed (pip install orjson)')
+    if name == 'stdlib' or orjson is None:
+        return StdlibJSONProvider
+    return OrjsonJSONProvider
+
+def json_list_response(rows, serialize, key=None, **fields):
+    """``jsonify`` of a list, or of ``{key: list, **fields}``, streamed when long.
+
+    ``serialize`` turns a list of rows into a list of dicts and is called
+    once per chunk, so batched serializers (one IN query per relation)
+    stay batched. Lists shorter than JSON_STREAM_MIN_ITEMS, and every
+    list when it is 0, are answered in one piece.
+    """
+    min_items = current_app.config['JSON_STREAM_MIN_ITEMS']
+    if not min_items or len(rows) < min_items:
+        items = serialize(rows)
+        return jsonify(items if key is None else {key: items, **fields})
+
+    provider = current_app.json
+
+    def generate():
+        if key is None:
+            yield b'['
+        else:
+            # The other fields first, then the list as the last member
+            head = provider.dumpb(fields)[:-1]
+            yield head + (b',' if fields else b'') + provider.dumpb(key) + b':['
+        for start in range(0, len(rows), STREAM_CHUNK_SIZE):
+            chunk = provider.dumpb(serialize(rows[start:start + STREAM_CHUNK_SIZE]))[1:-1]
+            yield (b',' if start else b'') + chunk
+        yield b']\n' if key is None else b']}\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=provider.mimetype)
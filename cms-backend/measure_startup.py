@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Measure backend startup cost: module import time (the part --preload moves
+into the gunicorn master), one-time initialization and the first request.
+
+    python measure_startup.py [--runs 5] [--top 15]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def import_profile():
+    """Run `python -X importtime -c "import app_unified"` and return (total_us, {module: cumulative_us})"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app_unified'],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+        env={**os.environ, 'AUTO_INIT_DB': 'false'}
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        cumulative[name] = int(cumulative_us)
+    return cumulative.get('app_unified', 0), cumulative
+
+def init_and_first_request():
+    code = (
+        "import time\n"
+        "from app_unified import app, ensure_initialized\n"
+        "started = time.perf_counter(); ensure_initialized(); init = time.perf_counter() - started\n"
+        "client = app.test_client()\n"
+        "started = time.perf_counter(); client.get('/api/posts'); first = time.perf_counter() - started\n"
+        "started = time.perf_counter(); client.get('/api/posts'); second = time.perf_counter() - started\n"
+        "print(init, first, second)\n"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(result.stderr)
+    return [float(value) for value in result.stdout.split()[-3:]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Slowest top-level imports to list')
+    args = parser.parse_args()
+
+    totals = []
+    profiles = []
+    for _ in range(args.runs):
+        total, cumulative = import_profile()
+        totals.append(total / 1000)
+        profiles.append(cumulative)
+
+    print(f"import app_unified: median {statistics.median(totals):.0f} ms "
+          f"(min {min(totals):.0f}, max {max(totals):.0f}) over {args.runs} runs")
+
+    last = profiles[-1]
+    print("\nSlowest imports (cumulative, last run):")
+    for name, us in sorted(last.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    init, first, second = init_and_first_request()
+    print(f"\nensure_initialized(): {init * 1000:.0f} ms")
+    print(f"first GET /api/posts: {first * 1000:.0f} ms, second: {second * 1000:.0f} ms")
+    print("\nWith preload_app (gunicorn.conf.py) the import and initialization run once in the master;")
+    print("forked workers only pay the first-request cost.")
+
+if __name__ == '__main__':
+    main()
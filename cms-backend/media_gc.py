@@ -0,0 +1,183 @@
+"""
+Orphaned upload garbage collection and storage usage reporting.
+
+Stored upload files are cross-referenced against everything in the database
+that can point at them. Scans list storage keys in sorted order and stop
+after ``limit`` files, returning a cursor so large trees or buckets can be
+processed in several passes from the CLI or the admin endpoint.
+"""
+
+import re
+import time
+
+import click
+from sqlalchemy import func
+
+from app_unified import app, db, User, Post, PostRevision, Category, Media, Setting, upload_key
+from storage import get_storage
+
+# Only the folders media uploads write to; themes/ and plugins/ are managed separately.
+# incoming/ holds direct-to-bucket uploads that were never completed.
+GC_FOLDERS = ('documents/', 'images/', 'incoming/')
+
+UPLOAD_REF_RE = re.compile(r'/uploads/([^"\'\s)<>?#]+)')
+
+def _add_refs(refs, text):
+    if text:
+        for match in UPLOAD_REF_RE.findall(text):
+            refs.add(match)
+
+def referenced_upload_paths(batch_size=500):
+    """Return the set of upload paths (relative, '/'-separated) referenced anywhere in the database"""
+    refs = set()
+
+    for (url,) in db.session.query(Media.url).yield_per(batch_size):
+        refs.add(upload_key(url))
+
+    for featured_image, content in db.session.query(Post.featured_image, Post.content).yield_per(batch_size):
+        _add_refs(refs, featured_image)
+        _add_refs(refs, content)
+
+    # Revisions can be restored, so their images are still in use
+    for (content,) in db.session.query(PostRevision.content).yield_per(batch_size):
+        _add_refs(refs, content)
+
+    for (avatar_url,) in db.session.query(User.avatar_url).yield_per(batch_size):
+        _add_refs(refs, avatar_url)
+
+    for (image_url,) in db.session.query(Category.image_url).yield_per(batch_size):
+        _add_refs(refs, image_url)
+
+    for (value,) in db.session.query(Setting.value).yield_per(batch_size):
+        _add_refs(refs, value)
+
+    return refs
+
+def collect_garbage(delete=False, cursor=None, limit=1000, min_age=3600, refs=None):
+    """Scan up to ``limit`` upload files after ``cursor`` and report (or delete) unreferenced ones.
+
+    Files younger than ``min_age`` seconds are never reported, so uploads that
+    are still being written or committed are left alone. Returns a dict with
+    the orphans found and ``next_cursor`` (None once the tree is exhausted).
+    """
+    storage = get_storage()
+    if refs is None:
+        refs = referenced_upload_paths()
+
+    now = time.time()
+    scanned = 0
+    orphans = []
+    orphan_bytes = 0
+    deleted = 0
+    errors = []
+    next_cursor = None
+
+    keys = (item for item in storage.iter_keys(start_after=cursor) if item[0].startswith(GC_FOLDERS))
+    for key, size, mtime in keys:
+        if scanned >= limit:
+            break
+        scanned += 1
+        next_cursor = key
+
+        if key in refs or now - mtime < min_age:
+            continue
+
+        orphans.append({'path': key, 'size': size, 'modified': int(mtime)})
+        orphan_bytes += size
+
+        if delete:
+            try:
+                storage.delete(key)
+                deleted += 1
+            except Exception as e:
+                app.logger.warning("Failed to delete orphaned upload %s: %s", key, e)
+                errors.append({'path': key, 'error': str(e)})
+    else:
+        # Loop ran to completion: nothing left after this batch
+        next_cursor = None
+
+    return {
+        'scanned': scanned,
+        'orphans': orphans,
+        'orphan_count': len(orphans),
+        'orphan_bytes': orphan_bytes,
+        'deleted': deleted,
+        'errors': errors,
+        'next_cursor': next_cursor
+    }
+
+def storage_report():
+    """Storage totals per file type and per uploader.
+
+    ``bytes`` counts every media row; ``stored_bytes`` counts each physical
+    file once, since deduplicated uploads share files.
+    """
+    by_type = [
+        {'file_type': file_type, 'count': count, 'bytes': int(total or 0)}
+        for file_type, count, total in db.session.query(
+            Media.file_type, func.count(Media.id), func.sum(Media.file_size)
+        ).group_by(Media.file_type).order_by(func.sum(Media.file_size).desc())
+    ]
+
+    by_user = [
+        {'user_id': user_id, 'username': username, 'count': count, 'bytes': int(total or 0)}
+        for user_id, username, count, total in db.session.query(
+            Media.uploaded_by, User.username, func.count(Media.id), func.sum(Media.file_size)
+        ).outerjoin(User, User.id == Media.uploaded_by)
+        .group_by(Media.uploaded_by, User.username)
+        .order_by(func.sum(Media.file_size).desc())
+    ]
+
+    files = db.session.query(Media.url, func.max(Media.file_size).label('size')).group_by(Media.url).subquery()
+    stored_files, stored_bytes = db.session.query(func.count(), func.sum(files.c.size)).one()
+    total_rows, total_bytes = db.session.query(func.count(Media.id), func.sum(Media.file_size)).one()
+
+    return {
+        'total_media': total_rows,
+        'bytes': int(total_bytes or 0),
+        'stored_files': stored_files,
+        'stored_bytes': int(stored_bytes or 0),
+        'by_type': by_type,
+        'by_user': by_user
+    }
+
+@app.cli.command('gc-uploads')
+@click.option('--delete', is_flag=True, help='Delete orphaned files instead of only reporting them.')
+@click.option('--batch-size', default=1000, show_default=True, help='Files scanned per batch.')
+@click.option('--min-age', default=3600, show_default=True, help='Ignore files modified in the last N seconds.')
+def gc_uploads_command(delete, batch_size, min_age):
+    """Find (and optionally delete) upload files no longer referenced by the database."""
+    refs = referenced_upload_paths()
+    click.echo(f"{len(refs)} referenced upload paths")
+
+    cursor = None
+    totals = {'scanned': 0, 'orphans': 0, 'bytes': 0, 'deleted': 0}
+    while True:
+        result = collect_garbage(delete=delete, cursor=cursor, limit=batch_size, min_age=min_age, refs=refs)
+        for orphan in result['orphans']:
+            click.echo(f"{'deleted' if delete else 'orphan'}: {orphan['path']} ({orphan['size']} bytes)")
+        totals['scanned'] += result['scanned']
+        totals['orphans'] += result['orphan_count']
+        totals['bytes'] += result['orphan_bytes']
+        totals['deleted'] += result['deleted']
+        cursor = result['next_cursor']
+        if not cursor:
+            break
+
+    click.echo(
+        f"Scanned {totals['scanned']} files, {totals['orphans']} orphaned "
+        f"({totals['bytes']} bytes), {totals['deleted']} deleted"
+    )
+
+@app.cli.command('storage-report')
+def storage_report_command():
+    """Print media storage totals per file type and per user."""
+    report = storage_report()
+    click.echo(f"Media rows: {report['total_media']} ({report['bytes']} bytes)")
+    click.echo(f"Stored files: {report['stored_files']} ({report['stored_bytes']} bytes)")
+    click.echo("By type:")
+    for row in report['by_type']:
+        click.echo(f"  {row['file_type']}: {row['count']} files, {row['bytes']} bytes")
+    click.echo("By user:")
+    for row in report['by_user']:
+        click.echo(f"  {row['username'] or row['user_id']}: {row['count']} files, {row['bytes']} bytes")
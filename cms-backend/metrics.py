@@ -0,0 +1,290 @@
+"""
+Prometheus metrics at /metrics, aggregated across gunicorn workers.
+
+Each process keeps its counters, histograms and gauges in memory and
+writes a snapshot to its own file in METRICS_DIR at most every
+METRICS_FLUSH_SECONDS, and at exit. /metrics merges every snapshot in the
+directory. Counters and histograms are summed, including those of
+workers that have exited, so totals never go backwards. Gauges are
+reported per live pid. The gunicorn master empties the directory when it
+starts (gunicorn.conf.py).
+
+/metrics answers loopback clients, or any client that sends METRICS_TOKEN
+as a bearer token when one is set.
+"""
+
+import atexit
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from flask import Response, g, request, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app_unified import app, db
+from cache import all_caches
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BACKUP_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'cms_http_requests_total': ('counter', 'Requests handled, by Flask endpoint, method and status', None),
+    'cms_http_request_duration_seconds': ('histogram', 'Request wall time by Flask endpoint', LATENCY_BUCKETS),
+    'cms_db_statements_total': ('counter', 'SQL statements run by requests, by Flask endpoint', None),
+    'cms_db_duration_seconds_total': ('counter', 'Time requests spent in SQL statements, by Flask endpoint', None),
+    'cms_sqlite_write_seconds': ('histogram', 'INSERT/UPDATE/DELETE statement time, including waits for the SQLite write lock', LATENCY_BUCKETS),
+    'cms_sqlite_lock_errors_total': ('counter', 'Statements that failed with "database is locked"', None),
+    'cms_db_pool_size': ('gauge', 'Connections kept by the SQLAlchemy pool', None),
+    'cms_db_pool_checked_out': ('gauge', 'Pool connections currently in use', None),
+    'cms_db_pool_overflow': ('gauge', 'Connections open beyond the pool size', None),
+    'cms_cache_hits_total': ('counter', 'In-process cache hits, by cache', None),
+    'cms_cache_misses_total': ('counter', 'In-process cache misses, by cache', None),
+    'cms_cache_hit_ratio': ('gauge', 'Hits / (hits + misses) over all workers, by cache', None),
+    'cms_uploads_total': ('counter', 'Media uploads, by storage backend and whether the bytes were already stored', None),
+    'cms_upload_bytes_total': ('counter', 'Bytes received in media uploads, by storage backend', None),
+    'cms_backup_duration_seconds': ('histogram', 'Backup and restore time, by operation and HTTP status', BACKUP_BUCKETS),
+    'cms_worker_info': ('gauge', 'One per live worker process', None),
+    'cms_process_start_time_seconds': ('gauge', 'Worker start time (Unix seconds)', None),
+    'cms_process_cpu_seconds': ('gauge', 'CPU time used by the worker', None),
+    'cms_process_resident_memory_bytes': ('gauge', 'Worker resident memory', None),
+}
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Registry:
+    """This process's metric values, written to its own snapshot file"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}  # key -> [per-bucket counts..., +Inf count], sum
+        self.started = time.time()
+        self.flushed_at = 0.0
+
+    def inc(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[_key(name, labels)] += amount
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+        with self.lock:
+            counts, total = self.histograms.get(_key(name, labels)) or ([0] * (len(buckets) + 1), 0.0)
+            counts[index] += 1
+            self.histograms[_key(name, labels)] = (counts, total + value)
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            histograms = [[name, labels, list(counts), total] for (name, labels), (counts, total) in self.histograms.items()]
+        for cache in all_caches():
+            counters[_key('cms_cache_hits_total', {'cache': cache.name})] = cache.hits
+            counters[_key('cms_cache_misses_total', {'cache': cache.name})] = cache.misses
+        return {
+            'pid': os.getpid(),
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'histograms': histograms,
+            'gauges': [[name, labels, value] for (name, labels), value in _process_gauges().items()]
+        }
+
+    def path(self):
+        # Start time in the name: a recycled pid must not overwrite an exited worker's totals
+        return os.path.join(app.config['METRICS_DIR'], f'{os.getpid()}-{int(self.started * 1000)}.json')
+
+    def flush(self):
+        directory = app.config['METRICS_DIR']
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, self.path())
+        self.flushed_at = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed_at >= app.config['METRICS_FLUSH_SECONDS']:
+            self.flush()
+
+_registries = {}
+
+def registry():
+    """Registry of the current process (a forked worker starts from zero)"""
+    pid = os.getpid()
+    if pid not in _registries:
+        _registries.clear()
+        _registries[pid] = Registry()
+    return _registries[pid]
+
+def inc(name, amount=1, **labels):
+    registry().inc(name, amount, **labels)
+
+def observe(name, value, **labels):
+    registry().observe(name, value, **labels)
+
+def timed(name, **labels):
+    """Observe a view's duration in histogram ``name``, labelled with the response status"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            response = f(*args, **kwargs)
+            status = app.make_response(response).status_code
+            observe(name, time.perf_counter() - started, status=status, **labels)
+            return response
+        return wrapper
+    return decorator
+
+def record_upload(storage, size, deduplicated):
+    inc('cms_uploads_total', storage=storage.name, deduplicated=str(deduplicated).lower())
+    inc('cms_upload_bytes_total', size, storage=storage.name)
+
+def _resident_memory():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+def _process_gauges():
+    pid = {'pid': os.getpid()}
+    gauges = {
+        _key('cms_worker_info', {**pid, 'worker': os.environ.get('GUNICORN_WORKER_AGE', 'main')}): 1,
+        _key('cms_process_start_time_seconds', pid): registry().started,
+        _key('cms_process_cpu_seconds', pid): time.process_time(),
+        _key('cms_process_resident_memory_bytes', pid): _resident_memory(),
+    }
+    pool = db.engine.pool
+    if hasattr(pool, 'checkedout'):
+        gauges[_key('cms_db_pool_size', pid)] = pool.size()
+        gauges[_key('cms_db_pool_checked_out', pid)] = pool.checkedout()
+        gauges[_key('cms_db_pool_overflow', pid)] = max(pool.overflow(), 0)
+    return gauges
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect():
+    """Merge every process snapshot: (counters, histograms, gauges) keyed by (name, labels)"""
+    counters, histograms, gauges = defaultdict(float), {}, {}
+    for path in glob.glob(os.path.join(app.config['METRICS_DIR'], '*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(map(tuple, labels))] += value
+        for name, labels, counts, total in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged_counts, merged_total = histograms.get(key) or ([0] * len(counts), 0.0)
+            histograms[key] = ([a + b for a, b in zip(merged_counts, counts)], merged_total + total)
+        if snapshot['pid'] == os.getpid() or _alive(snapshot['pid']):
+            for name, labels, value in snapshot['gauges']:
+                gauges[name, tuple(map(tuple, labels))] = value
+
+    caches = {labels for name, labels in counters if name == 'cms_cache_hits_total'}
+    for labels in caches:
+        hits = counters['cms_cache_hits_total', labels]
+        lookups = hits + counters['cms_cache_misses_total', labels]
+        gauges['cms_cache_hit_ratio', labels] = hits / lookups if lookups else 0.0
+    return counters, histograms, gauges
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _series(name, labels, value, extra=()):
+    pairs = list(labels) + list(extra)
+    label_text = '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + '}' if pairs else ''
+    return f'{name}{label_text} {_number(value)}'
+
+def render():
+    """Prometheus text exposition format (version 0.0.4)"""
+    counters, histograms, gauges = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        source = {'counter': counters, 'gauge': gauges, 'histogram': histograms}[kind]
+        series = sorted((labels, value) for (metric, labels), value in source.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind != 'histogram':
+                lines.append(_series(name, labels, value))
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], counts):
+                cumulative += count
+                lines.append(_series(f'{name}_bucket', labels, cumulative, extra=[('le', bound)]))
+            lines.append(_series(f'{name}_sum', labels, total))
+            lines.append(_series(f'{name}_count', labels, cumulative))
+    return '\n'.join(lines) + '\n'
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_write_timer(conn, cursor, statement, parameters, context, executemany):
+    if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.info['write_started'] = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_write(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('write_started', None)
+    if started is not None and conn.engine.dialect.name == 'sqlite':
+        observe('cms_sqlite_write_seconds', time.perf_counter() - started)
+
+@event.listens_for(Engine, 'handle_error')
+def _record_lock_error(exception_context):
+    if exception_context.connection is not None:
+        exception_context.connection.info.pop('write_started', None)
+    if 'database is locked' in str(exception_context.original_exception):
+        inc('cms_sqlite_lock_errors_total')
+
+@app.after_request
+def record_request_metrics(response):
+    stats = g.get('perf')
+    if stats is not None and request.endpoint != 'metrics':
+        endpoint = request.endpoint or 'unmatched'
+        inc('cms_http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        observe('cms_http_request_duration_seconds', stats.elapsed(), endpoint=endpoint)
+        inc('cms_db_statements_total', stats.queries, endpoint=endpoint)
+        inc('cms_db_duration_seconds_total', stats.db_time, endpoint=endpoint)
+        registry().maybe_flush()
+    return response
+
+@atexit.register
+def _flush_at_exit():
+    if os.getpid() in _registries:
+        try:
+            with app.app_context():
+                registry().flush()
+        except Exception:
+            pass
+
+@app.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    if token:
+        presented = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(presented.encode(), token.encode()):
+            abort(401)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(404)
+    registry().flush()
+    return Response(render(), mimetype='text/plain; version=0.0.4')
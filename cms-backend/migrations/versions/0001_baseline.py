@@ -0,0 +1,217 @@
+"""baseline schema
+
+Tables as they were before migrations were introduced. Databases created
+earlier by db.create_all() already have some or all of them, so every
+table is only created when missing, and a categories table from before
+is_visible existed gets the column (this replaces add_category_visibility.py;
+the server default fills existing rows, so no full-table UPDATE is needed).
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 12:48:53.087431
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from data_migrations import has_table, has_column
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not has_table(bind, 'categories'):
+        op.create_table('categories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('slug', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.Column('image_url', sa.String(length=255), nullable=True),
+        sa.Column('meta_title', sa.String(length=255), nullable=True),
+        sa.Column('meta_description', sa.Text(), nullable=True),
+        sa.Column('is_visible', sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_id'], ['categories.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+        )
+    if not has_table(bind, 'plugins'):
+        op.create_table('plugins',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('slug', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.String(length=20), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('author', sa.String(length=100), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('settings', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+        )
+    if not has_table(bind, 'settings'):
+        op.create_table('settings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('value', sa.Text(), nullable=True),
+        sa.Column('autoload', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('key')
+        )
+    if not has_table(bind, 'tags'):
+        op.create_table('tags',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('slug', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+        sa.UniqueConstraint('slug')
+        )
+    if not has_table(bind, 'themes'):
+        op.create_table('themes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('slug', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.String(length=20), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('author', sa.String(length=100), nullable=True),
+        sa.Column('screenshot', sa.String(length=255), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('settings', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+        )
+    if not has_table(bind, 'users'):
+        op.create_table('users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('first_name', sa.String(length=50), nullable=True),
+        sa.Column('last_name', sa.String(length=50), nullable=True),
+        sa.Column('role', sa.String(length=20), nullable=True),
+        sa.Column('avatar_url', sa.String(length=255), nullable=True),
+        sa.Column('bio', sa.Text(), nullable=True),
+        sa.Column('website', sa.String(length=255), nullable=True),
+        sa.Column('social_links', sa.Text(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+        sa.UniqueConstraint('username')
+        )
+    if not has_table(bind, 'media'):
+        op.create_table('media',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('original_filename', sa.String(length=255), nullable=False),
+        sa.Column('file_path', sa.String(length=500), nullable=False),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('file_type', sa.String(length=50), nullable=True),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('alt_text', sa.String(length=255), nullable=True),
+        sa.Column('caption', sa.Text(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('uploaded_by', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['uploaded_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table(bind, 'posts'):
+        op.create_table('posts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('slug', sa.String(length=255), nullable=False),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('excerpt', sa.Text(), nullable=True),
+        sa.Column('featured_image', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('post_type', sa.String(length=20), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.Column('category_id', sa.Integer(), nullable=True),
+        sa.Column('comment_status', sa.String(length=20), nullable=True),
+        sa.Column('view_count', sa.Integer(), nullable=True),
+        sa.Column('meta_title', sa.String(length=255), nullable=True),
+        sa.Column('meta_description', sa.Text(), nullable=True),
+        sa.Column('meta_keywords', sa.String(length=255), nullable=True),
+        sa.Column('custom_fields', sa.Text(), nullable=True),
+        sa.Column('published_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+        )
+    if not has_table(bind, 'comments'):
+        op.create_table('comments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('author_name', sa.String(length=100), nullable=True),
+        sa.Column('author_email', sa.String(length=120), nullable=True),
+        sa.Column('author_website', sa.String(length=255), nullable=True),
+        sa.Column('author_ip', sa.String(length=45), nullable=True),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['parent_id'], ['comments.id'], ),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table(bind, 'post_revisions'):
+        op.create_table('post_revisions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('excerpt', sa.Text(), nullable=True),
+        sa.Column('revision_type', sa.String(length=20), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not has_table(bind, 'post_tags'):
+        op.create_table('post_tags',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ),
+        sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ),
+        sa.PrimaryKeyConstraint('post_id', 'tag_id')
+        )
+
+    if not has_column(bind, 'categories', 'is_visible'):
+        op.add_column('categories', sa.Column('is_visible', sa.Boolean(), server_default=sa.true(), nullable=False))
+
+
+def downgrade():
+    op.drop_table('post_tags')
+    op.drop_table('post_revisions')
+    op.drop_table('comments')
+    op.drop_table('posts')
+    op.drop_table('media')
+    op.drop_table('users')
+    op.drop_table('themes')
+    op.drop_table('tags')
+    op.drop_table('settings')
+    op.drop_table('plugins')
+    op.drop_table('categories')
@@ -0,0 +1,36 @@
+"""data migration progress table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 13:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from data_migrations import has_table
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if has_table(op.get_bind(), 'data_migrations'):
+        return
+    op.create_table('data_migrations',
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('rows_done', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('data_migrations')
@@ -0,0 +1,36 @@
+"""media content hash
+
+Adds media.content_hash and its index. Existing rows are hashed by the
+media_content_hash backfill (`flask backfill`), which replaces
+add_media_content_hash.py.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 13:07:40.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from data_migrations import has_column, has_index
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not has_column(bind, 'media', 'content_hash'):
+        op.add_column('media', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    if not has_index(bind, 'media', 'ix_media_content_hash'):
+        op.create_index('ix_media_content_hash', 'media', ['content_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_media_content_hash', table_name='media')
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_column('content_hash')
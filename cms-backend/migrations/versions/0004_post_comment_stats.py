@@ -0,0 +1,40 @@
+"""post comment stats
+
+Adds posts.comments_count and posts.last_comment_at, plus the
+comments.post_id index the counts rely on. Existing posts are filled in
+by the post_comment_stats backfill (`flask backfill`), which replaces
+add_post_comment_stats.py.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 13:09:02.551364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from data_migrations import has_column, has_index
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not has_column(bind, 'posts', 'comments_count'):
+        op.add_column('posts', sa.Column('comments_count', sa.Integer(), server_default='0', nullable=False))
+    if not has_column(bind, 'posts', 'last_comment_at'):
+        op.add_column('posts', sa.Column('last_comment_at', sa.DateTime(), nullable=True))
+    if not has_index(bind, 'comments', 'ix_comments_post_id'):
+        op.create_index('ix_comments_post_id', 'comments', ['post_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_comments_post_id', table_name='comments')
+    with op.batch_alter_table('posts', schema=None) as batch_op:
+        batch_op.drop_column('last_comment_at')
+        batch_op.drop_column('comments_count')
@@ -0,0 +1,40 @@
+"""token revocations
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 13:10:27.007845
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from data_migrations import has_table
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if has_table(op.get_bind(), 'token_revocations'):
+        return
+    op.create_table('token_revocations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=36), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('not_before', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('token_revocations', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_token_revocations_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_token_revocations_jti'), ['jti'], unique=False)
+        batch_op.create_index(batch_op.f('ix_token_revocations_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    op.drop_table('token_revocations')
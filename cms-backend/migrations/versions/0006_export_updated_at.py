@@ -0,0 +1,49 @@
+"""export updated_at and tombstones
+
+Adds updated_at to categories, tags, comments and media, so incremental
+exports see rows changed after they were created, and the
+deleted_records table of tombstones for deleted rows. Existing rows get
+updated_at = created_at from the *_updated_at backfills (`flask backfill`).
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 13:48:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from data_migrations import has_column, has_table
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+TABLES = ('categories', 'tags', 'comments', 'media')
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in TABLES:
+        if not has_column(bind, table, 'updated_at'):
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+    if not has_table(bind, 'deleted_records'):
+        op.create_table('deleted_records',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('record_type', sa.String(length=20), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('deleted_records', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_deleted_records_deleted_at'), ['deleted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_table('deleted_records')
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,144 @@
+"""
+Password hashing policy, bounded verification pool and hash benchmark.
+
+The policy is a Werkzeug method string in PASSWORD_HASH_METHOD, e.g.
+``scrypt:32768:8:1`` (Werkzeug's default) or ``pbkdf2:sha256:600000``.
+New passwords are hashed with it, and a successful login rehashes any
+stored hash made with different parameters.
+
+Verification runs on a small per-process thread pool (hashlib releases the
+GIL while hashing). At most PASSWORD_HASH_THREADS hashes run at once and
+at most PASSWORD_HASH_MAX_PENDING checks are in flight, running or queued.
+Anything beyond that is refused immediately, so a burst of logins or a
+credential-stuffing run cannot take all CPU away from page serving.
+"""
+
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import click
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app_unified import app
+
+class PasswordCheckBusy(Exception):
+    """Too many password checks are already queued in this process, or this one took too long"""
+
+class PasswordHasher:
+    def __init__(self, method, threads=2, max_pending=16):
+        self.method = method
+        self.threads = threads
+        self.semaphore = threading.BoundedSemaphore(max_pending)
+        self.pool = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self._stored_prefix = None
+
+    def _executor(self):
+        with self.lock:
+            # Pools do not survive fork; each worker process gets its own
+            if self.pid != os.getpid():
+                self.pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='password-hash')
+                self.pid = os.getpid()
+            return self.pool
+
+    def _run(self, fn, *args, timeout=30):
+        if not self.semaphore.acquire(blocking=False):
+            raise PasswordCheckBusy()
+        try:
+            future = self._executor().submit(fn, *args)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        # The slot is held until the hash itself finishes, not until this caller stops waiting,
+        # so checks that time out still count against PASSWORD_HASH_MAX_PENDING
+        future.add_done_callback(lambda _: self.semaphore.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise PasswordCheckBusy() from None
+
+    @property
+    def stored_prefix(self):
+        """Method prefix of hashes made with the current policy, e.g. 'scrypt:32768:8:1'"""
+        if self._stored_prefix is None:
+            # Werkzeug fills in default parameters, so read them back from a real hash
+            self._stored_prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return self._stored_prefix
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.stored_prefix
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+def get_password_hasher():
+    """Password hasher for the current app, created on first use"""
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        config = current_app.config
+        hasher = current_app.extensions['password_hasher'] = PasswordHasher(
+            config['PASSWORD_HASH_METHOD'],
+            threads=config['PASSWORD_HASH_THREADS'],
+            max_pending=config['PASSWORD_HASH_MAX_PENDING']
+        )
+    return hasher
+
+def verify_and_update(user, password):
+    """Check a login password on the hash pool; rehash it in place if the policy changed.
+
+    Returns True when the password matches. The caller commits the session
+    so an upgraded hash is saved. Raises PasswordCheckBusy when overloaded.
+    """
+    if not password or not user.password_hash:
+        return False
+    hasher = get_password_hasher()
+    if not hasher.verify(user.password_hash, password):
+        return False
+    if hasher.needs_rehash(user.password_hash):
+        user.password_hash = hasher.hash(password)
+    return True
+
+def _time_calls(fn, rounds):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+@app.cli.command('bench-password-hash')
+@click.option('--method', 'methods', multiple=True,
+              help='Werkzeug hash method to time (repeatable). Defaults to PASSWORD_HASH_METHOD.')
+@click.option('--rounds', default=5, show_default=True, help='Verifications timed per method.')
+@click.option('--concurrency', default=0, help='Also time N parallel verifications (default: PASSWORD_HASH_THREADS).')
+def bench_password_hash_command(methods, rounds, concurrency):
+    """Report password hash and verify latency on this machine."""
+    methods = methods or [app.config['PASSWORD_HASH_METHOD']]
+    concurrency = concurrency or app.config['PASSWORD_HASH_THREADS']
+    click.echo(f"CPUs: {os.cpu_count()}, rounds: {rounds}, concurrency: {concurrency}")
+
+    for method in methods:
+        password_hash = generate_password_hash('benchmark-password', method=method)
+        verify = lambda: check_password_hash(password_hash, 'benchmark-password')
+
+        hash_ms = _time_calls(lambda: generate_password_hash('benchmark-password', method=method), rounds)
+        verify_ms = _time_calls(verify, rounds)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            started = time.perf_counter()
+            list(pool.map(lambda _: verify(), range(concurrency * rounds)))
+            elapsed = time.perf_counter() - started
+
+        click.echo(
+            f"{password_hash.split('$', 1)[0]}: hash median {statistics.median(hash_ms):.1f} ms, "
+            f"verify median {statistics.median(verify_ms):.1f} ms (max {max(verify_ms):.1f} ms), "
+            f"{concurrency * rounds / elapsed:.1f} verifications/s with {concurrency} threads"
+        )
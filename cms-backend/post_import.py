@@ -0,0 +1,238 @@
+"""
+Bulk post importer.
+
+Reads posts as NDJSON (one JSON object per line, same fields as
+POST /api/posts) and inserts them in batches. Each batch resolves tags and
+slugs with a handful of set-wise queries, inserts posts, tag links and
+revisions with executemany, and commits once.
+"""
+
+import json
+from datetime import datetime
+
+import click
+from slugify import slugify
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+
+from app_unified import app, db, User, Post, Tag, PostRevision, post_tags, parse_utc_datetime
+
+# Keep IN (...) lists below SQLite's bound parameter limit
+IN_CHUNK_SIZE = 500
+
+def _chunks(items, size=IN_CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _parse_item(line_no, line, default_author_id, allow_author_override):
+    """Turn one NDJSON line into a row dict for the posts table"""
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError('Each line must be a JSON object')
+    if not data.get('title'):
+        raise ValueError('title is required')
+
+    author_id = default_author_id
+    if allow_author_override and data.get('author_id'):
+        author_id = int(data['author_id'])
+
+    status = data.get('status', 'draft')
+    published_at = parse_utc_datetime(data.get('published_at'))
+    if status == 'published' and not published_at:
+        published_at = datetime.utcnow()
+
+    row = {
+        'title': data['title'],
+        'slug': slugify(data.get('slug') or data['title']),
+        'content': data.get('content', ''),
+        'excerpt': data.get('excerpt', ''),
+        'featured_image': data.get('featured_image'),
+        'status': status,
+        'post_type': data.get('post_type', 'post'),
+        'author_id': author_id,
+        'category_id': data.get('category_id') or None,
+        'comment_status': data.get('comment_status', 'open'),
+        'view_count': 0,
+        'meta_title': data.get('meta_title'),
+        'meta_description': data.get('meta_description'),
+        'meta_keywords': data.get('meta_keywords'),
+        'custom_fields': json.dumps(data.get('custom_fields', {})),
+        'published_at': published_at
+    }
+    created_at = parse_utc_datetime(data.get('created_at'))
+    if created_at:
+        row['created_at'] = created_at
+        row['updated_at'] = parse_utc_datetime(data.get('updated_at')) or created_at
+
+    tags = [name.strip() for name in data.get('tags', []) if name and name.strip()]
+    return {'line': line_no, 'row': row, 'base_slug': row['slug'], 'tags': tags}
+
+def _resolve_tags(items):
+    """Map every tag name used in the batch to a tag id, creating missing tags in one insert"""
+    names = {name for item in items for name in item['tags']}
+    if not names:
+        return {}
+
+    slugs = {slugify(name) for name in names}
+    by_name, by_slug = {}, {}
+    for chunk in _chunks(names):
+        for tag_id, name, slug in db.session.query(Tag.id, Tag.name, Tag.slug).filter(Tag.name.in_(chunk)):
+            by_name[name] = tag_id
+            by_slug[slug] = tag_id
+    for chunk in _chunks(slugs):
+        for tag_id, name, slug in db.session.query(Tag.id, Tag.name, Tag.slug).filter(Tag.slug.in_(chunk)):
+            by_name.setdefault(name, tag_id)
+            by_slug[slug] = tag_id
+
+    # Same rules as create_post: match by name, then by slug, else create
+    missing = {}
+    for name in sorted(names):
+        if name not in by_name and slugify(name) not in by_slug:
+            missing.setdefault(slugify(name), name)
+    if missing:
+        now = datetime.utcnow()
+        result = db.session.execute(
+            insert(Tag).returning(Tag.id, Tag.slug, sort_by_parameter_order=True),
+            [{'name': name, 'slug': slug, 'created_at': now} for slug, name in missing.items()]
+        )
+        for tag_id, slug in result:
+            by_slug[slug] = tag_id
+
+    return {name: by_name.get(name) or by_slug[slugify(name)] for name in names}
+
+def _assign_slugs(items):
+    """Give every item a slug unique against the table and the rest of the batch"""
+    bases = {item['base_slug'] for item in items}
+    taken = set()
+    for chunk in _chunks(bases):
+        taken.update(slug for (slug,) in db.session.query(Post.slug).filter(Post.slug.in_(chunk)))
+
+    # Only bases that collide need their numbered variants loaded
+    seen = set()
+    colliding = set()
+    for item in items:
+        base = item['base_slug']
+        if base in taken or base in seen:
+            colliding.add(base)
+        seen.add(base)
+    for chunk in _chunks(colliding, 100):
+        conditions = [Post.slug.like(f'{base}-%') for base in chunk]
+        taken.update(slug for (slug,) in db.session.query(Post.slug).filter(or_(*conditions)))
+
+    for item in items:
+        base = item['base_slug']
+        slug = base
+        counter = 1
+        while slug in taken:
+            slug = f"{base}-{counter}"
+            counter += 1
+        taken.add(slug)
+        item['row']['slug'] = slug
+
+def _insert_batch(items, revision_author_id):
+    """Insert one batch of parsed items in a single transaction and return their new ids"""
+    tag_ids = _resolve_tags(items)
+    _assign_slugs(items)
+
+    result = db.session.execute(
+        insert(Post).returning(Post.id, sort_by_parameter_order=True),
+        [item['row'] for item in items]
+    )
+    post_ids = [post_id for (post_id,) in result]
+
+    links = {
+        (post_id, tag_ids[name])
+        for item, post_id in zip(items, post_ids)
+        for name in item['tags']
+    }
+    if links:
+        db.session.execute(insert(post_tags), [{'post_id': p, 'tag_id': t} for p, t in links])
+
+    now = datetime.utcnow()
+    db.session.execute(insert(PostRevision), [
+        {
+            'post_id': post_id,
+            'title': item['row']['title'],
+            'content': item['row']['content'],
+            'excerpt': item['row']['excerpt'],
+            'created_by': revision_author_id,
+            'created_at': now
+        }
+        for item, post_id in zip(items, post_ids)
+    ])
+
+    db.session.commit()
+    return post_ids
+
+def _flush_batch(items, revision_author_id):
+    """Insert a batch, falling back to one item per transaction if the batch conflicts"""
+    try:
+        post_ids = _insert_batch(items, revision_author_id)
+        return [
+            {'line': item['line'], 'status': 'created', 'id': post_id, 'slug': item['row']['slug'], 'title': item['row']['title']}
+            for item, post_id in zip(items, post_ids)
+        ]
+    except Exception as e:
+        db.session.rollback()
+        if len(items) == 1:
+            item = items[0]
+            if isinstance(e, IntegrityError):
+                # A concurrent writer took the slug or a tag between our lookup and insert
+                return [{'line': item['line'], 'status': 'error', 'error': 'Conflicting slug or tag, please retry'}]
+            return [{'line': item['line'], 'status': 'error', 'error': str(e)}]
+        # Isolate the failing item by retrying the batch one item per transaction
+        results = []
+        for item in items:
+            results.extend(_flush_batch([item], revision_author_id))
+        return results
+
+def import_posts(lines, author_id, batch_size=200, allow_author_override=False):
+    """Import posts from an iterable of NDJSON lines.
+
+    Yields one result per non-empty line, in input order: ``created`` with the
+    new id and slug, or ``error`` with a message. Only ``batch_size`` parsed
+    items are held in memory at a time.
+    """
+    batch = []
+    for line_no, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            batch.append(_parse_item(line_no, line, author_id, allow_author_override))
+        except Exception as e:
+            # Errors are reported in line order, so flush what is pending first
+            if batch:
+                yield from _flush_batch(batch, author_id)
+                batch = []
+            yield {'line': line_no, 'status': 'error', 'error': str(e)}
+            continue
+
+        if len(batch) >= batch_size:
+            yield from _flush_batch(batch, author_id)
+            batch = []
+
+    if batch:
+        yield from _flush_batch(batch, author_id)
+
+@app.cli.command('import-posts')
+@click.argument('path', type=click.File('rb'))
+@click.option('--author', 'author_username', default='admin', show_default=True,
+              help='Username that owns the imported posts (unless a line sets author_id).')
+@click.option('--batch-size', default=500, show_default=True, help='Posts inserted per transaction.')
+def import_posts_command(path, author_username, batch_size):
+    """Import posts from an NDJSON file (one post object per line)."""
+    author = User.query.filter_by(username=author_username).first()
+    if not author:
+        raise click.ClickException(f"User '{author_username}' not found")
+
+    created = failed = 0
+    for result in import_posts(path, author.id, batch_size=batch_size, allow_author_override=True):
+        if result['status'] == 'created':
+            created += 1
+        else:
+            failed += 1
+            click.echo(f"line {result['line']}: {result['error']}")
+    click.echo(f"Imported {created} posts, {failed} failed")
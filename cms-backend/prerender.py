@@ -0,0 +1,403 @@
+"""
+Prerendered public pages.
+
+The home page, every published post and every category and tag listing
+are served as HTML snapshots: index.html (the SPA shell) with
+the page's title and description, its main content as plain HTML for
+crawlers and first paint, and the API responses the page requests on
+load embedded as JSON (``#prerendered-data``). The frontend answers
+those requests from the embedded copy while it stays on that page, so a
+first view costs one static file instead of several API calls.
+
+``flask prerender`` writes every snapshot (the publish step) and removes
+those of pages that no longer exist. Afterwards snapshots are kept
+current incrementally: a commit that changes a post or category deletes
+the snapshots of the pages showing it, and ``serve_react_app`` renders a
+missing snapshot again on its next request.
+
+    post edited                     its page, the home page and its category
+                                    and tag listings (before and after)
+    post published, unpublished,    every page: the sidebars list the
+    deleted or re-tagged, or one    recent posts and tag counts
+    of the RECENT_POSTS newest
+    edited
+    category or tag changed         every page: they all embed the category
+                                    tree and the tags
+
+View and comment counters are not tracked, so snapshots show them as of
+their last render; comments themselves are always loaded live. Author
+profile edits and writes from outside the app are not seen either; run
+``flask prerender`` after them.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import time
+from itertools import chain
+from urllib.parse import quote, urlencode
+
+import click
+from flask import Response, send_file
+from markupsafe import escape
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app_unified import app, db, Post, Category, Tag, post_tags, POST_RELATIONS, POST_CONTENT
+
+# Posts in the "recent posts" sidebar of post, category and tag pages
+RECENT_POSTS = 5
+
+HOME_POSTS = 9
+LISTING_POSTS = 12
+
+# Counters bumped by reads and comments; no snapshot is re-rendered for them
+COUNTER_COLUMNS = {'view_count', 'comments_count', 'last_comment_at'}
+
+# Written by bulk INSERT/DELETE statements (imports, deletes); any change there re-renders everything
+WATCHED_TABLES = {'posts', 'post_tags', 'tags', 'categories'}
+
+# Marker for "every page" in a set of page keys
+ALL_PAGES = '*'
+
+PAGE_PATTERN = re.compile(r'^(post|category|tag)/([A-Za-z0-9_-]{1,200})$')
+
+# The SPA shell, looked up where serve_react_app serves it from
+SHELL_PATHS = (
+    os.path.join(app.root_path, 'templates', 'index.html'),
+    os.path.join(app.root_path, 'static', 'index.html'),
+)
+
+def shell_path():
+    """Path of the SPA shell, or None when the frontend is not built"""
+    return next((path for path in SHELL_PATHS if os.path.exists(path)), None)
+
+def page_key(path):
+    """Key of the prerendered page at a URL path ('' for home), or None"""
+    path = path.strip('/')
+    if path == '' or PAGE_PATTERN.match(path):
+        return path
+    return None
+
+def _pages_dir():
+    return os.path.join(app.config['PRERENDER_DIR'], 'pages')
+
+def _stamp_path():
+    return os.path.join(app.config['PRERENDER_DIR'], 'invalidated')
+
+def snapshot_path(key):
+    return os.path.join(_pages_dir(), f'{key or "index"}.html')
+
+def _api_key(url, params=None):
+    """Key of an API response in the embedded data, as the frontend builds it (sorted query)"""
+    if not params:
+        return url
+    return f'{url}?{urlencode(sorted(params.items()), quote_via=quote)}'
+
+def _posts_params(per_page, **filters):
+    return {'page': 1, 'per_page': per_page, 'status': 'published', **filters}
+
+class Renderer:
+    """Builds snapshots; API responses shared by many pages are fetched once per renderer"""
+
+    def __init__(self):
+        self.responses = {}
+
+    def api(self, endpoint, url, params=None):
+        """The JSON a public GET route answers, called in-process; None unless 200"""
+        key = _api_key(url, params)
+        if key not in self.responses:
+            with app.test_request_context(url, query_string=params or {}):
+                response = app.make_response(app.view_functions[endpoint]())
+                self.responses[key] = response.get_json() if response.status_code == 200 else None
+        return self.responses[key]
+
+    def _sidebar(self, recent=True):
+        keys = [('get_categories', '/categories', None), ('get_tags', '/tags', None)]
+        if recent:
+            keys.append(('get_posts', '/posts', _posts_params(RECENT_POSTS, post_type='post')))
+        return {_api_key(url, params): self.api(endpoint, url, params) for endpoint, url, params in keys}
+
+    def _listing(self, params):
+        return _api_key('/posts', params), self.api('get_posts', '/posts', params)
+
+    def home(self):
+        key, posts = self._listing(_posts_params(HOME_POSTS, post_type='post'))
+        return {
+            'title': None,
+            'description': None,
+            'body': _listing_html(None, None, posts['posts']),
+            'responses': {key: posts, **self._sidebar(recent=False)}
+        }
+
+    def post(self, slug):
+        post = Post.query.options(*POST_RELATIONS, POST_CONTENT).filter_by(slug=slug, status='published').first()
+        if post is None or (post.category and not post.category.is_visible):
+            return None
+        # What GET /api/posts/<slug> answers, without counting a view
+        data = post.to_dict()
+        return {
+            'title': data['meta_title'] or data['title'],
+            'description': data['meta_description'] or data['excerpt'],
+            'image': data['featured_image'],
+            'body': f'<article><h1>{escape(data["title"])}</h1>{data["content"] or ""}</article>',
+            'responses': {_api_key(f'/posts/{slug}'): data, **self._sidebar()}
+        }
+
+    def category(self, slug):
+        # The category page looks its category up among the visible top-level ones
+        categories = self.api('get_categories', '/categories') or []
+        category = next((item for item in categories if item['slug'] == slug), None)
+        if category is None:
+            return None
+        return self._listing_page(category, _posts_params(LISTING_POSTS, category_id=category['id']))
+
+    def tag(self, slug):
+        tags = self.api('get_tags', '/tags') or []
+        tag = next((item for item in tags if item['slug'] == slug), None)
+        if tag is None:
+            return None
+        return self._listing_page(tag, _posts_params(LISTING_POSTS, tag=slug))
+
+    def _listing_page(self, item, params):
+        key, posts = self._listing(params)
+        return {
+            'title': item['name'],
+            'description': item['description'],
+            'body': _listing_html(item['name'], item['description'], posts['posts']),
+            'responses': {key: posts, **self._sidebar()}
+        }
+
+    def render(self, key):
+        """HTML of a page, or None when it does not exist (unpublished, hidden, unknown)"""
+        if key == '':
+            page = self.home()
+        else:
+            kind, slug = PAGE_PATTERN.match(key).groups()
+            page = getattr(self, kind)(slug)
+        if page is None:
+            return None
+        return _html(page, '/' + key)
+
+def _listing_html(name, description, posts):
+    parts = ['<main>']
+    if name:
+        parts.append(f'<h1>{escape(name)}</h1>')
+    if description:
+        parts.append(f'<p>{escape(description)}</p>')
+    parts.append('<ul>')
+    for post in posts:
+        parts.append(f'<li><a href="/post/{escape(post["slug"])}">{escape(post["title"])}</a>')
+        if post['excerpt']:
+            parts.append(f'<p>{escape(post["excerpt"])}</p>')
+        parts.append('</li>')
+    parts.append('</ul></main>')
+    return ''.join(parts)
+
+def _html(page, path):
+    with open(shell_path(), encoding='utf-8') as f:
+        html = f.read()
+
+    site_title = re.search(r'<title>(.*?)</title>', html, re.S)
+    site_title = site_title.group(1) if site_title else ''
+    title = f'{escape(page["title"])} - {site_title}' if page['title'] else site_title
+    html = re.sub(r'<title>.*?</title>', lambda m: f'<title>{title}</title>', html, count=1, flags=re.S)
+
+    head = [f'<meta property="og:title" content="{escape(page["title"] or site_title)}"/>']
+    if page['description']:
+        description = escape(page['description'])
+        html = re.sub(r'<meta name="description" content="[^"]*"/?>',
+                      lambda m: f'<meta name="description" content="{description}"/>', html, count=1)
+        head.append(f'<meta property="og:description" content="{description}"/>')
+    if page.get('image'):
+        head.append(f'<meta property="og:image" content="{escape(page["image"])}"/>')
+
+    # "</" is escaped so the JSON cannot close its script element
+    data = app.json.dumpb({'path': path, 'responses': page['responses']}).decode().replace('</', '<\\/')
+    head.append(f'<script id="prerendered-data" type="application/json">{data}</script>')
+
+    html = html.replace('</head>', ''.join(head) + '</head>', 1)
+    return html.replace('<div id="root"></div>', f'<div id="root">{page["body"]}</div>', 1)
+
+def _invalidated_at():
+    try:
+        return os.stat(_stamp_path()).st_mtime
+    except FileNotFoundError:
+        return 0
+
+def save_snapshot(key, html, started):
+    """Write a snapshot atomically, unless an invalidation happened since ``started``
+    (the render may then have read data that is already outdated); returns whether it was written"""
+    path = snapshot_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(html)
+    if _invalidated_at() > started:
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, path)
+    return True
+
+def invalidate(keys):
+    """Delete the snapshots of these pages (ALL_PAGES for every page)"""
+    os.makedirs(app.config['PRERENDER_DIR'], exist_ok=True)
+    with open(_stamp_path(), 'a'):
+        os.utime(_stamp_path())
+    if ALL_PAGES in keys:
+        shutil.rmtree(_pages_dir(), ignore_errors=True)
+        return
+    for key in keys:
+        try:
+            os.remove(snapshot_path(key))
+        except FileNotFoundError:
+            pass
+
+def _count_view(slug):
+    # The frontend reads the post from the snapshot instead of GET /api/posts/<slug>, which counts views
+    post = Post.query.filter_by(slug=slug).first()
+    if post is not None:
+        post.view_count += 1
+        db.session.commit()
+
+def snapshot_response(path):
+    """The page's snapshot, rendered now when missing; None when the path has none (serve the shell)"""
+    key = page_key(path)
+    if key is None or shell_path() is None:
+        return None
+    if key.startswith('post/'):
+        _count_view(key[len('post/'):])
+
+    snapshot = snapshot_path(key)
+    if os.path.exists(snapshot):
+        return send_file(snapshot, mimetype='text/html', max_age=0)
+
+    started = time.time()
+    html = Renderer().render(key)
+    if html is None:
+        return None
+    save_snapshot(key, html, started)
+    return Response(html, mimetype='text/html')
+
+def all_page_keys(renderer):
+    keys = ['']
+    published = select(Post.slug).outerjoin(Category, Category.id == Post.category_id).where(
+        Post.status == 'published', Category.is_visible.isnot(False)
+    ).order_by(Post.id)
+    keys += [f'post/{slug}' for slug in db.session.scalars(published) if page_key(f'post/{slug}') is not None]
+    keys += [f'category/{item["slug"]}' for item in renderer.api('get_categories', '/categories') or []]
+    keys += [f'tag/{item["slug"]}' for item in renderer.api('get_tags', '/tags') or []]
+    return keys
+
+# Invalidation: what a transaction changed is collected at each flush, and the pages
+# showing it are worked out and dropped on commit (unless every page goes anyway)
+
+def _before(state, key):
+    history = state.attrs[key].history
+    return (history.deleted or history.unchanged or history.added or [None])[0]
+
+def _collect_post(session, post, stale, edited):
+    state = inspect(post)
+    is_new, is_deleted = post in session.new, post in session.deleted
+    changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
+    if not (is_new or is_deleted) and changed <= COUNTER_COLUMNS:
+        return
+
+    was_published = not is_new and _before(state, 'status') == 'published'
+    is_published = not is_deleted and post.status == 'published'
+    if not (was_published or is_published):
+        return
+    if was_published != is_published or changed & {'tags', 'published_at', 'post_type'}:
+        stale.add(ALL_PAGES)
+        return
+
+    # Edited in place: same tags and place among the recent posts before and after
+    pages = edited.setdefault(post.id, {'slugs': set(), 'category_ids': set()})
+    pages['slugs'].update({_before(state, 'slug'), post.slug})
+    pages['category_ids'].update({_before(state, 'category_id'), post.category_id})
+
+def _edited_post_pages(edited):
+    """Keys of the pages showing posts edited in place; ALL_PAGES when one is among the recent posts"""
+    category_ids = {id_ for pages in edited.values() for id_ in pages['category_ids'] if id_ is not None}
+    with db.engine.connect() as connection:
+        recent = connection.scalars(
+            select(Post.id).where(Post.status == 'published', Post.post_type == 'post')
+            .order_by(Post.published_at.desc()).limit(RECENT_POSTS)
+        ).all()
+        if set(recent) & set(edited):
+            return {ALL_PAGES}
+        tags = select(Tag.slug).join(post_tags, post_tags.c.tag_id == Tag.id).where(post_tags.c.post_id.in_(list(edited)))
+        categories = select(Category.slug).where(Category.id.in_(category_ids))
+        pages = {''}
+        pages.update(f'tag/{slug}' for slug in connection.scalars(tags))
+        pages.update(f'category/{slug}' for slug in connection.scalars(categories))
+    pages.update(f'post/{slug}' for post in edited.values() for slug in post['slugs'])
+    return pages
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    if not app.config['PRERENDER']:
+        return
+    stale = session.info.setdefault('prerender_stale', set())
+    edited = session.info.setdefault('prerender_edited', {})
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if ALL_PAGES in stale:
+            return
+        # Tags are dirtied by (re)tagging posts too, through the backref
+        if isinstance(obj, Category) or (isinstance(obj, Tag) and obj not in session.new):
+            stale.add(ALL_PAGES)
+        elif isinstance(obj, Post):
+            _collect_post(session, obj, stale, edited)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_writes(orm_execute_state):
+    # Bulk UPDATEs of posts only refresh comment statistics, or move posts off a category
+    # that is deleted in the same transaction; inserts and deletes are imports and deletions
+    if not app.config['PRERENDER'] or not (orm_execute_state.is_insert or orm_execute_state.is_delete
+                                           or orm_execute_state.is_update):
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    if table is None or table.name not in WATCHED_TABLES:
+        return
+    if orm_execute_state.is_update and table.name == 'posts':
+        return
+    orm_execute_state.session.info.setdefault('prerender_stale', set()).add(ALL_PAGES)
+
+@event.listens_for(Session, 'after_commit')
+def _drop_stale_pages(session):
+    stale = session.info.pop('prerender_stale', set())
+    edited = session.info.pop('prerender_edited', None)
+    if edited and ALL_PAGES not in stale:
+        stale |= _edited_post_pages(edited)
+    if stale:
+        invalidate(stale)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_stale_pages(session):
+    session.info.pop('prerender_stale', None)
+    session.info.pop('prerender_edited', None)
+
+@app.cli.command('prerender')
+def prerender_command():
+    """Render every public page snapshot and remove those of pages that no longer exist."""
+    if shell_path() is None:
+        raise click.ClickException(f"No SPA shell to render into; build the frontend first ({' or '.join(SHELL_PATHS)})")
+    started = time.time()
+    renderer = Renderer()
+    keys = all_page_keys(renderer)
+    written = 0
+    for key in keys:
+        html = renderer.render(key)
+        if html is not None and save_snapshot(key, html, started):
+            written += 1
+
+    current = {os.path.normpath(snapshot_path(key)) for key in keys}
+    removed = 0
+    for root, dirs, files in os.walk(_pages_dir()):
+        for name in files:
+            path = os.path.normpath(os.path.join(root, name))
+            if path not in current:
+                os.remove(path)
+                removed += 1
+    click.echo(f"Rendered {written} of {len(keys)} pages to {_pages_dir()}, removed {removed} outdated")
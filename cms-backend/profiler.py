@@ -0,0 +1,188 @@
+"""
+Opt-in production profiling for admins (PROFILER_ENABLED=true).
+
+POST /api/admin/profiler/sample starts a sampling profiler on the worker
+that receives it. A background thread reads every other thread's stack
+each PROFILER_INTERVAL_MS for the requested number of seconds, while the
+worker keeps serving traffic. The result is collapsed stacks (one
+``thread;file:function;...;file:function count`` line per distinct
+stack), which flamegraph.pl, speedscope or inferno render as a
+flamegraph. It is written to the instance folder, so
+GET /api/admin/profiler/<id> can fetch it from any worker; a
+``<id>.running`` marker next to it holds the sample's deadline, so the
+result URL answers 202 only while the sample can still finish and 404
+for unknown ids or samples whose worker went away.
+
+Adding ``?__profile=1`` to any request made with an admin token runs
+that request under cProfile and returns the stats as text instead of the
+normal response (``__sort=tottime|calls``, ``__limit=N`` lines).
+
+When disabled, the only cost is one config check per request.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Response, g, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, verify_jwt_in_request
+
+from app_unified import app, role_required
+
+PROFILE_ID_RE = re.compile(r'[0-9a-f]{32}')
+KEEP_PROFILES_SECONDS = 24 * 3600
+# Time past a sample's deadline allowed for writing its result before it is given up on
+RESULT_GRACE_SECONDS = 30
+PSTATS_SORTS = {'cumulative', 'tottime', 'calls', 'ncalls'}
+
+_sampling = threading.Lock()
+
+def profiles_dir():
+    return os.path.join(app.instance_path, 'profiles')
+
+def _frame_name(frame):
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+def collapsed_stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def sample_stacks(seconds, interval):
+    """Count the stacks of every other thread in this process, sampled every ``interval`` seconds"""
+    me = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != me:
+                counts[f"{names.get(ident, ident)};{collapsed_stack(frame)}"] += 1
+        time.sleep(interval)
+    return counts
+
+def _remove_old_profiles(directory):
+    cutoff = time.time() - KEEP_PROFILES_SECONDS
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+def _profile_path(profile_id, suffix):
+    return os.path.join(profiles_dir(), f'{profile_id}.{suffix}')
+
+def _is_running(profile_id):
+    """Whether the sample's marker exists and its deadline (plus grace) has not passed"""
+    try:
+        with open(_profile_path(profile_id, 'running')) as f:
+            deadline = float(f.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return False
+    return time.time() < deadline + RESULT_GRACE_SECONDS
+
+def _run_sampler(profile_id, seconds, interval):
+    try:
+        counts = sample_stacks(seconds, interval)
+        path = _profile_path(profile_id, 'collapsed')
+        with open(path + '.tmp', 'w') as f:
+            for stack, count in counts.most_common():
+                f.write(f'{stack} {count}\n')
+        os.replace(path + '.tmp', path)
+    finally:
+        try:
+            os.remove(_profile_path(profile_id, 'running'))
+        except FileNotFoundError:
+            pass
+        _sampling.release()
+
+@app.route('/api/admin/profiler/sample', methods=['POST'])
+@jwt_required()
+@role_required(['admin'])
+def start_sampling_profiler():
+    """Sample this worker's stacks for ?seconds= (default 10) in the background"""
+    if not app.config['PROFILER_ENABLED']:
+        return jsonify({'error': 'Profiling is disabled (PROFILER_ENABLED)'}), 404
+    try:
+        seconds = min(float(request.args.get('seconds', 10)), app.config['PROFILER_MAX_SECONDS'])
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    if not _sampling.acquire(blocking=False):
+        return jsonify({'error': 'A profile is already being sampled on this worker'}), 409
+
+    try:
+        os.makedirs(profiles_dir(), exist_ok=True)
+        _remove_old_profiles(profiles_dir())
+        profile_id = uuid.uuid4().hex
+        with open(_profile_path(profile_id, 'running'), 'w') as f:
+            f.write(str(time.time() + seconds))
+        threading.Thread(
+            target=_run_sampler,
+            args=(profile_id, seconds, app.config['PROFILER_INTERVAL_MS'] / 1000),
+            name='sampling-profiler',
+            daemon=True
+        ).start()
+    except Exception:
+        _sampling.release()
+        raise
+
+    return jsonify({
+        'id': profile_id,
+        'pid': os.getpid(),
+        'seconds': seconds,
+        'result_url': f'/api/admin/profiler/{profile_id}'
+    }), 202
+
+@app.route('/api/admin/profiler/<profile_id>', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def get_sampling_profile(profile_id):
+    """Collapsed stacks of a finished sample; 202 while it is still running, else 404"""
+    if not app.config['PROFILER_ENABLED']:
+        return jsonify({'error': 'Profiling is disabled (PROFILER_ENABLED)'}), 404
+    if not PROFILE_ID_RE.fullmatch(profile_id):
+        return jsonify({'error': 'Invalid profile id'}), 400
+    path = _profile_path(profile_id, 'collapsed')
+    if not os.path.exists(path):
+        if _is_running(profile_id):
+            return jsonify({'status': 'running'}), 202
+        return jsonify({'error': 'No such profile (unknown id, expired, or its worker stopped while sampling)'}), 404
+    with open(path) as f:
+        return Response(f.read(), mimetype='text/plain')
+
+def _is_admin_request():
+    try:
+        verify_jwt_in_request()
+    except Exception:
+        return False
+    return get_jwt().get('role') == 'admin'
+
+@app.before_request
+def start_request_profile():
+    if not app.config['PROFILER_ENABLED'] or request.args.get('__profile') != '1':
+        return
+    if _is_admin_request():
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+@app.after_request
+def return_request_profile(response):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    sort = request.args.get('__sort', 'cumulative')
+    if sort not in PSTATS_SORTS:
+        sort = 'cumulative'
+    limit = request.args.get('__limit', '60')
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats(sort).print_stats(int(limit) if limit.isdigit() else 60)
+    return Response(f"{request.method} {request.full_path} -> {response.status}\n\n{out.getvalue()}", mimetype='text/plain')
@@ -1,12 +1,35 @@
-from app_unified import app, db, jwt, allowed_file, role_required, User, Post, Category, Tag, Comment, Media, Setting, Theme, Plugin, PostRevision
-from flask import jsonify, request, send_from_directory, send_file
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from app_unified import app, db, jwt, allowed_file, role_required, save_hashed_upload, hash_stream, media_type_for, stored_key_for_hash, User, Post, Category, Tag, Comment, Media, Setting, Theme, Plugin, PostRevision, post_tags, CATEGORY_TREE, POST_RELATIONS, MEDIA_RELATIONS, USER_PROFILE, POST_CONTENT, COMMENT_CONTENT
+from flask import jsonify, request, send_from_directory, send_file, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, decode_token
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import os
+import re
 import uuid
 import json
+from contextlib import closing
+from sqlalchemy import func
 from slugify import slugify
+from media_gc import collect_garbage, storage_report
+from post_import import import_posts
+from content_export import export_ndjson, parse_since, EXPORT_TYPES
+from comment_service import (
+    load_comment_tree, load_comment_threads_page, serialize_comments, comment_status_counts,
+    COMMENT_ACTIONS, set_comment_status, delete_comments, comment_dict, post_summary,
+    refresh_post_comment_stats
+)
+from comment_ingest import get_comment_intake, build_comment_row, CommentSavePending
+from dashboard import dashboard_stats
+from fieldsets import requested_fieldset, FieldsetError
+from json_provider import json_list_response
+from passwords import verify_and_update, PasswordCheckBusy
+from auth_tokens import issue_tokens, issue_access_token, revoke_token, revoke_user_tokens
+from storage import get_storage
+import data_migrations  # noqa: F401 - registers `flask backfill`
+import instrumentation  # noqa: F401 - request timing, slow query and N+1 logs
+from metrics import timed, record_upload  # also serves /metrics
+import profiler  # noqa: F401 - admin sampling profiler and ?__profile=1
+import prerender  # noqa: F401 - page snapshots, their invalidation and `flask prerender`
 
 # Authentication Routes
 @app.route('/api/auth/login', methods=['POST'])
@@ -15,19 +38,54 @@ def login():
     username = data.get('username')
     password = data.get('password')
     
-    user = User.query.filter(
+    user = User.query.options(USER_PROFILE).filter(
         (User.username == username) | (User.email == username)
     ).first()
     
-    if user and user.check_password(password) and user.is_active:
-        access_token = create_access_token(identity=str(user.id))
+    try:
+        valid = bool(user and user.is_active and verify_and_update(user, password))
+    except PasswordCheckBusy:
+        response = jsonify({'error': 'Too many login attempts in progress, please retry'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    
+    if valid:
+        if db.session.dirty:
+            # The password was rehashed with the current policy
+            db.session.commit()
+        tokens = issue_tokens(user)
         return jsonify({
-            'access_token': access_token,
+            'access_token': tokens['access_token'],
+            'refresh_token': tokens['refresh_token'],
             'user': user.to_dict()
         })
     
     return jsonify({'error': 'Invalid credentials'}), 401
 
+@app.route('/api/auth/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_access_token():
+    user = User.query.get(get_jwt_identity())
+    if not user or not user.is_active:
+        return jsonify({'error': 'Account is not active'}), 401
+    return jsonify({'access_token': issue_access_token(user)})
+
+@app.route('/api/auth/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    revoke_token(get_jwt())
+    # Also revoke the refresh token when the client sends it
+    refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
+    if refresh_token:
+        try:
+            payload = decode_token(refresh_token)
+            if payload['sub'] == get_jwt_identity():
+                revoke_token(payload)
+        except Exception:
+            pass
+    db.session.commit()
+    return jsonify({'message': 'Logged out'})
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -57,7 +115,7 @@ def register():
 @jwt_required()
 def get_current_user():
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
+    user = User.query.options(USER_PROFILE).get(user_id)
     return jsonify(user.to_dict() if user else None)
 
 # User Management Routes
@@ -68,21 +126,24 @@ def get_users():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     role = request.args.get('role')
+    try:
+        fieldset = requested_fieldset('users', request.args)
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     
     query = User.query
     if role:
         query = query.filter_by(role=role)
+    query = query.with_entities(*fieldset.columns) if fieldset else query.options(USER_PROFILE)
     
     users = query.order_by(User.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
-    return jsonify({
-        'users': [user.to_dict() for user in users.items],
-        'total': users.total,
-        'pages': users.pages,
-        'current_page': page
-    })
+    return json_list_response(
+        users.items, fieldset.serialize if fieldset else lambda rows: [user.to_dict() for user in rows],
+        key='users', total=users.total, pages=users.pages, current_page=page
+    )
 
 @app.route('/api/users', methods=['POST'])
 @jwt_required()
@@ -137,7 +198,7 @@ def create_user():
 @app.route('/api/users/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = User.query.options(USER_PROFILE).get_or_404(user_id)
     return jsonify(user.to_dict())
 
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
@@ -145,7 +206,7 @@ def get_user(user_id):
 def update_user(user_id):
     current_user_id = get_jwt_identity()
     current_user = User.query.get(current_user_id)
-    user = User.query.get_or_404(user_id)
+    user = User.query.options(USER_PROFILE).get_or_404(user_id)
     
     # Check permissions
     if current_user.role != 'admin' and current_user_id != str(user_id):
@@ -163,6 +224,8 @@ def update_user(user_id):
     if data.get('social_links'):
         user.social_links = json.dumps(data['social_links'])
     
+    previous_role, was_active = user.role, user.is_active
+    
     # Only admins can change roles and activation status
     if current_user.role == 'admin':
         user.role = data.get('role', user.role)
@@ -171,6 +234,10 @@ def update_user(user_id):
     if data.get('password'):
         user.set_password(data['password'])
     
+    # Issued tokens carry the old role and stay valid until revoked
+    if user.role != previous_role or (was_active and not user.is_active) or data.get('password'):
+        revoke_user_tokens(user.id)
+    
     user.updated_at = datetime.utcnow()
     db.session.commit()
     
@@ -181,6 +248,7 @@ def update_user(user_id):
 @role_required(['admin'])
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
+    revoke_user_tokens(user.id)
     db.session.delete(user)
     db.session.commit()
     return '', 204
@@ -196,6 +264,10 @@ def get_posts():
     tag = request.args.get('tag')
     author_id = request.args.get('author_id', type=int)
     search = request.args.get('search')
+    try:
+        fieldset = requested_fieldset('posts', request.args)
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     
     query = Post.query
     
@@ -225,34 +297,36 @@ def get_posts():
             (Post.content.contains(search))
         )
     
+    # ?fields=/?include= select only the requested columns instead of whole posts
+    query = query.with_entities(*fieldset.columns) if fieldset else query.options(*POST_RELATIONS)
     posts = query.order_by(Post.published_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
-    return jsonify({
-        'posts': [post.to_dict(include_content=False) for post in posts.items],
-        'total': posts.total,
-        'pages': posts.pages,
-        'current_page': page
-    })
+    return json_list_response(
+        posts.items, fieldset.serialize if fieldset else lambda rows: [post.to_dict(include_content=False) for post in rows],
+        key='posts', total=posts.total, pages=posts.pages, current_page=page
+    )
 
 @app.route('/api/posts/<slug>', methods=['GET'])
 def get_post(slug):
+    query = Post.query.options(*POST_RELATIONS, POST_CONTENT)
     if slug.isdigit():
-        post = Post.query.get_or_404(int(slug))
+        post = query.filter(Post.id == int(slug)).first_or_404()
     else:
-        post = Post.query.filter_by(slug=slug).first_or_404()
+        post = query.filter_by(slug=slug).first_or_404()
     
     # Check if post belongs to a hidden category
     if post.category and not post.category.is_visible:
         # Return 404 for posts in hidden categories
         return jsonify({'error': 'Post not found'}), 404
     
-    # Increment view count
+    # Increment view count; serialized first, since the commit expires the loaded relationships
     post.view_count += 1
+    result = post.to_dict()
     db.session.commit()
     
-    return jsonify(post.to_dict())
+    return jsonify(result)
 
 @app.route('/api/posts', methods=['POST'])
 @jwt_required()
@@ -262,21 +336,10 @@ def create_post():
         data = request.get_json()
         current_user_id = get_jwt_identity()
         
-        # Debug logging - safely handle Unicode characters
-        try:
-            # Create a safe representation of the data for logging
-            safe_data = {
-                'title': data.get('title', '').encode('ascii', 'replace').decode('ascii'),
-                'slug': data.get('slug', ''),
-                'content_length': len(data.get('content', '')),
-                'status': data.get('status', 'draft'),
-                'category_id': data.get('category_id')
-            }
-            print(f"[DEBUG] Creating post with data: {safe_data}")
-            print(f"[DEBUG] Current user ID: {current_user_id}")
-        except Exception as debug_error:
-            print(f"[DEBUG] Creating post (debug logging failed): {str(debug_error)}")
-            print(f"[DEBUG] Current user ID: {current_user_id}")
+        app.logger.debug(
+            "Creating post %r (%s, %d characters) for user %s",
+            data.get('title'), data.get('status', 'draft'), len(data.get('content') or ''), current_user_id
+        )
         
         post = Post(
             title=data['title'],
@@ -342,29 +405,47 @@ def create_post():
         db.session.add(revision)
         
         db.session.commit()
-        print("[SUCCESS] Post created successfully")
         
         return jsonify(post.to_dict()), 201
     
     except Exception as e:
-        # Safe error logging to avoid Unicode encoding issues
-        try:
-            error_msg = str(e).encode('ascii', 'replace').decode('ascii')
-            print(f"[ERROR] Error creating post: {error_msg}")
-            print(f"[ERROR] Error type: {type(e).__name__}")
-            print(f"[ERROR] Error args length: {len(e.args) if hasattr(e, 'args') else 0}")
-        except Exception as log_error:
-            print(f"[ERROR] Error creating post (logging failed): {type(e).__name__}")
-            print(f"[ERROR] Logging error: {str(log_error)}")
+        app.logger.exception("Error creating post")
         
         db.session.rollback()
         return jsonify({'error': f'Failed to create post: {str(e)}'}), 500
 
+@app.route('/api/posts/bulk', methods=['POST'])
+@jwt_required()
+@role_required(['admin', 'editor'])
+def bulk_import_posts():
+    """Create many posts from an NDJSON body (one post object per line)"""
+    current_user_id = int(get_jwt_identity())
+    current_user = User.query.get(current_user_id)
+    batch_size = min(request.args.get('batch_size', 200, type=int), 1000)
+    
+    try:
+        results = list(import_posts(
+            request.stream,
+            current_user_id,
+            batch_size=batch_size,
+            allow_author_override=current_user.role == 'admin'
+        ))
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to import posts: {str(e)}'}), 500
+    
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), 200 if created == len(results) else 207
+
 @app.route('/api/posts/<int:post_id>', methods=['PUT'])
 @jwt_required()
 @role_required(['admin', 'editor', 'author'])
 def update_post(post_id):
-    post = Post.query.get_or_404(post_id)
+    post = Post.query.options(POST_CONTENT).get_or_404(post_id)
     current_user_id = get_jwt_identity()
     current_user = User.query.get(current_user_id)
     
@@ -456,7 +537,7 @@ def delete_post(post_id):
 # Category Management Routes
 @app.route('/api/categories', methods=['GET'])
 def get_categories():
-    categories = Category.query.filter_by(parent_id=None, is_visible=True).all()
+    categories = Category.query.options(CATEGORY_TREE).filter_by(parent_id=None, is_visible=True).all()
     return jsonify([cat.to_dict() for cat in categories])
 
 @app.route('/api/categories', methods=['POST'])
@@ -528,21 +609,24 @@ def get_media():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     file_type = request.args.get('file_type')
+    try:
+        fieldset = requested_fieldset('media', request.args)
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     
     query = Media.query
     if file_type:
         query = query.filter_by(file_type=file_type)
+    query = query.with_entities(*fieldset.columns) if fieldset else query.options(*MEDIA_RELATIONS)
     
     media = query.order_by(Media.created_at.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
-    return jsonify({
-        'media': [item.to_dict() for item in media.items],
-        'total': media.total,
-        'pages': media.pages,
-        'current_page': page
-    })
+    return json_list_response(
+        media.items, fieldset.serialize if fieldset else lambda rows: [item.to_dict() for item in rows],
+        key='media', total=media.total, pages=media.pages, current_page=page
+    )
 
 @app.route('/api/media/upload', methods=['POST'])
 @jwt_required()
@@ -557,52 +641,30 @@ def upload_media():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         ext = filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4().hex}.{ext}"
-        
-        # Determine file type and folder
-        if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp', 'tiff']:
-            file_type = 'image'
-            folder = 'images'
-        elif ext in ['mp4', 'webm', 'ogg', 'avi', 'mov', 'wmv', 'flv', 'mkv']:
-            file_type = 'video'
-            folder = 'documents'
-        elif ext in ['mp3', 'wav', 'ogg', 'm4a', 'aac', 'flac']:
-            file_type = 'audio'
-            folder = 'documents'
-        elif ext in ['pdf']:
-            file_type = 'pdf'
-            folder = 'documents'
-        elif ext in ['doc', 'docx']:
-            file_type = 'word'
-            folder = 'documents'
-        elif ext in ['xls', 'xlsx']:
-            file_type = 'excel'
-            folder = 'documents'
-        elif ext in ['ppt', 'pptx']:
-            file_type = 'powerpoint'
-            folder = 'documents'
-        elif ext in ['zip', 'rar', '7z', 'tar', 'gz']:
-            file_type = 'archive'
-            folder = 'documents'
-        elif ext in ['txt', 'csv', 'json', 'xml']:
-            file_type = 'text'
-            folder = 'documents'
-        else:
-            file_type = 'document'
-            folder = 'documents'
         
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], folder, unique_filename)
-        file.save(file_path)
+        file_type, folder = media_type_for(ext)
+        storage = get_storage()
+        
+        # Hash while streaming to a temp file so identical bytes share one stored file
+        temp_path, content_hash, file_size = save_hashed_upload(file.stream, storage.temp_dir(f"{folder}/"))
+        key = stored_key_for_hash(content_hash)
+        record_upload(storage, file_size, deduplicated=bool(key))
+        if key:
+            os.remove(temp_path)
+        else:
+            key = f"{folder}/{content_hash}.{ext}"
+            storage.store(temp_path, key, file.content_type)
         
         media = Media(
             title=request.form.get('title', filename),
-            filename=unique_filename,
+            filename=key.rsplit('/', 1)[-1],
             original_filename=filename,
-            file_path=file_path,
-            url=f"/uploads/{folder}/{unique_filename}",
+            file_path=storage.describe(key),
+            url=f"/uploads/{key}",
             file_type=file_type,
             mime_type=file.content_type,
-            file_size=os.path.getsize(file_path),
+            file_size=file_size,
+            content_hash=content_hash,
             alt_text=request.form.get('alt_text', ''),
             caption=request.form.get('caption', ''),
             description=request.form.get('description', ''),
@@ -616,6 +678,76 @@ def upload_media():
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+@app.route('/api/media/presign', methods=['POST'])
+@jwt_required()
+def presign_media_upload():
+    """Start a direct browser-to-bucket upload; finish it with /api/media/complete"""
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename', ''))
+    if not filename or not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    
+    storage = get_storage()
+    if not storage.supports_direct_upload:
+        return jsonify({'error': 'Direct uploads require an object storage backend (MEDIA_STORAGE=s3)'}), 400
+    
+    ext = filename.rsplit('.', 1)[1].lower()
+    key = f"incoming/{uuid.uuid4().hex}.{ext}"
+    content_type = data.get('content_type') or 'application/octet-stream'
+    
+    return jsonify({
+        'key': key,
+        'upload': storage.presign_upload(key, content_type, app.config['MAX_CONTENT_LENGTH'])
+    })
+
+@app.route('/api/media/complete', methods=['POST'])
+@jwt_required()
+def complete_media_upload():
+    """Register a file uploaded directly to the bucket as a Media row"""
+    data = request.get_json() or {}
+    key = data.get('key', '')
+    if not re.fullmatch(r'incoming/[0-9a-f]{32}\.[a-z0-9]+', key) or not allowed_file(key):
+        return jsonify({'error': 'Invalid upload key'}), 400
+    
+    storage = get_storage()
+    if not storage.exists(key):
+        return jsonify({'error': 'Uploaded file not found'}), 404
+    
+    ext = key.rsplit('.', 1)[1]
+    file_type, folder = media_type_for(ext)
+    
+    # Hash the object in the bucket, then move it to its content-addressed key
+    with closing(storage.open(key)) as stream:
+        content_hash, file_size = hash_stream(stream)
+    final_key = stored_key_for_hash(content_hash)
+    record_upload(storage, file_size, deduplicated=bool(final_key))
+    if not final_key:
+        final_key = f"{folder}/{content_hash}.{ext}"
+        storage.copy(key, final_key)
+    storage.delete(key)
+    
+    filename = secure_filename(data.get('filename', '')) or key.rsplit('/', 1)[-1]
+    media = Media(
+        title=data.get('title', filename),
+        filename=final_key.rsplit('/', 1)[-1],
+        original_filename=filename,
+        file_path=storage.describe(final_key),
+        url=f"/uploads/{final_key}",
+        file_type=file_type,
+        mime_type=data.get('content_type'),
+        file_size=file_size,
+        content_hash=content_hash,
+        alt_text=data.get('alt_text', ''),
+        caption=data.get('caption', ''),
+        description=data.get('description', ''),
+        uploaded_by=get_jwt_identity()
+    )
+    
+    db.session.add(media)
+    db.session.commit()
+    
+    return jsonify(media.to_dict()), 201
+
 @app.route('/api/media/<int:media_id>', methods=['PUT'])
 @jwt_required()
 @role_required(['admin', 'editor', 'author'])
@@ -650,17 +782,43 @@ def delete_media(media_id):
     if current_user.role not in ['admin', 'editor'] and media.uploaded_by != int(current_user_id):
         return jsonify({'error': 'Insufficient permissions'}), 403
     
-    # Delete physical file
-    try:
-        if os.path.exists(media.file_path):
-            os.remove(media.file_path)
-    except Exception as e:
-        print(f"Error deleting file: {e}")
+    # Delete physical file only when no other media row shares it
+    shared = Media.query.filter(Media.url == media.url, Media.id != media.id).count()
+    if not shared:
+        try:
+            get_storage().delete(media.storage_key)
+        except Exception as e:
+            # Leave the file for the orphan collector (flask gc-uploads) instead of failing the delete
+            app.logger.warning("Error deleting file %s: %s", media.storage_key, e)
     
     db.session.delete(media)
     db.session.commit()
     return jsonify({'message': 'Media deleted successfully'})
 
+@app.route('/api/admin/storage', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def get_storage_report():
+    """Media storage totals per file type and per user"""
+    return jsonify(storage_report())
+
+@app.route('/api/admin/storage/gc', methods=['POST'])
+@jwt_required()
+@role_required(['admin'])
+def gc_uploads():
+    """Scan one batch of the uploads tree for orphaned files, optionally deleting them"""
+    data = request.get_json(silent=True) or {}
+    try:
+        result = collect_garbage(
+            delete=bool(data.get('delete', False)),
+            cursor=data.get('cursor'),
+            limit=min(int(data.get('limit', 1000)), 10000),
+            min_age=int(data.get('min_age', 3600))
+        )
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Settings Routes
 @app.route('/api/settings', methods=['GET'])
 @jwt_required()
@@ -692,18 +850,7 @@ def update_settings():
 @jwt_required()
 @role_required(['admin', 'editor'])
 def get_dashboard_stats():
-    stats = {
-        'total_posts': Post.query.filter_by(status='published').count(),
-        'total_pages': Post.query.filter_by(post_type='page', status='published').count(),
-        'total_comments': Comment.query.filter_by(status='approved').count(),
-        'total_users': User.query.filter_by(is_active=True).count(),
-        'total_media': Media.query.count(),
-        'recent_posts': [post.to_dict(include_content=False) for post in 
-                        Post.query.order_by(Post.created_at.desc()).limit(5).all()],
-        'recent_comments': [comment.to_dict() for comment in 
-                           Comment.query.order_by(Comment.created_at.desc()).limit(5).all()]
-    }
-    return jsonify(stats)
+    return jsonify(dashboard_stats())
 
 # Admin Routes
 @app.route('/api/admin/categories', methods=['GET'])
@@ -711,8 +858,18 @@ def get_dashboard_stats():
 @role_required(['admin', 'editor'])
 def get_admin_categories():
     """Get categories with posts count for admin interface"""
-    categories = Category.query.all()
-    return jsonify([cat.to_dict(include_posts_count=True) for cat in categories])
+    categories = Category.query.options(CATEGORY_TREE).all()
+    posts_counts = dict(
+        db.session.query(Post.category_id, func.count(Post.id))
+        .filter(Post.status == 'published')
+        .group_by(Post.category_id)
+    )
+    result = []
+    for cat in categories:
+        data = cat.to_dict()
+        data['posts_count'] = posts_counts.get(cat.id, 0)
+        result.append(data)
+    return jsonify(result)
 
 @app.route('/api/admin/download-database', methods=['GET'])
 @jwt_required()
@@ -737,6 +894,27 @@ def download_database():
     except Exception as e:
         return jsonify({'error': f'Failed to download database: {str(e)}'}), 500
 
+@app.route('/api/admin/export', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def export_content():
+    """Stream the content graph as NDJSON; pass the last line's next_since as ?since= for incremental syncs"""
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'since must be an ISO 8601 timestamp'}), 400
+    
+    types = [t for t in request.args.get('types', ','.join(EXPORT_TYPES)).split(',') if t]
+    if not types or set(types) - set(EXPORT_TYPES):
+        return jsonify({'error': f'types must be a subset of: {", ".join(EXPORT_TYPES)}'}), 400
+    
+    filename = f"cms-export-{datetime.utcnow().strftime('%Y-%m-%dT%H%M%S')}.ndjson"
+    return Response(
+        stream_with_context(export_ndjson(since=since, types=types)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # Comments Routes
 @app.route('/api/posts/<slug>/comments', methods=['GET'])
 def get_post_comments(slug):
@@ -744,31 +922,55 @@ def get_post_comments(slug):
     if not post:
         return jsonify({'error': 'Post not found'}), 404
     
-    comments = Comment.query.filter_by(post_id=post.id, status='approved').order_by(Comment.created_at.desc()).all()
-    return jsonify([comment.to_dict() for comment in comments])
+    # ?page= switches to paged top-level threads with a preview of their replies
+    if 'page' in request.args:
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
+        preview = max(request.args.get('preview', 3, type=int), 0)
+        return jsonify(load_comment_threads_page(post, page=page, per_page=per_page, preview=preview))
+    
+    return jsonify(load_comment_tree(post))
 
 @app.route('/api/posts/<slug>/comments', methods=['POST'])
 def add_post_comment(slug):
-    post = Post.query.filter_by(slug=slug).first()
+    intake = get_comment_intake()
+    client_ip = request.remote_addr or 'unknown'
+    
+    # Throttle before touching the database
+    retry_after = intake.throttle(client_ip, slug)
+    if retry_after:
+        response = jsonify({'error': 'Too many comments, please slow down'})
+        response.headers['Retry-After'] = str(int(retry_after) + 1)
+        return response, 429
+    
+    data = request.get_json(silent=True)
+    if not data or not str(data.get('content', '')).strip():
+        return jsonify({'error': 'Comment content is required'}), 400
+    data['content'] = str(data['content']).strip()
+    
+    post = db.session.query(Post.id, Post.title, Post.slug, Post.status).filter(Post.slug == slug).first()
     if not post:
         return jsonify({'error': 'Post not found'}), 404
     
-    data = request.get_json()
-    if not data or not data.get('content'):
-        return jsonify({'error': 'Comment content is required'}), 400
-    
-    comment = Comment(
-        post_id=post.id,
-        author_name=data.get('name', 'Anonymous'),
-        author_email=data.get('email', ''),
-        content=data['content'],
-        status='approved'  # Auto-approve for now, can be changed to 'pending' for moderation
-    )
+    try:
+        status = intake.classify(post.id, client_ip, data['content'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    db.session.add(comment)
-    db.session.commit()
+    row = build_comment_row(post.id, data, client_ip, status)
+    try:
+        comment_id = intake.save(row)
+    except CommentSavePending:
+        # Still queued and likely to be written: the client must not send it again
+        app.logger.warning("Comment on post %s is still queued after %ss", post.id, app.config['COMMENT_SAVE_WAIT'])
+        return jsonify(comment_dict(Comment(id=None, **row), post_summary(post), None)), 202
+    except Exception as e:
+        app.logger.error("Failed to save comment on post %s: %s", post.id, e)
+        intake.forget(post.id, client_ip, data['content'])
+        return jsonify({'error': 'Could not save comment, please try again'}), 503
     
-    return jsonify(comment.to_dict()), 201
+    comment = Comment(id=comment_id, **row)
+    return jsonify(comment_dict(comment, post_summary(post), None)), 201
 
 # Admin Comments Management
 @app.route('/api/comments', methods=['GET'])
@@ -781,6 +983,7 @@ def get_all_comments():
         status = request.args.get('status', 'all')
         search = request.args.get('search', '')
         post_id = request.args.get('post_id', type=int)
+        fieldset = requested_fieldset('comments', request.args)
         
         # Base query
         query = Comment.query
@@ -805,6 +1008,7 @@ def get_all_comments():
         
         # Order by created_at desc
         query = query.order_by(Comment.created_at.desc())
+        query = query.with_entities(*fieldset.columns) if fieldset else query.options(COMMENT_CONTENT)
         
         # Paginate
         comments = query.paginate(
@@ -814,23 +1018,16 @@ def get_all_comments():
         )
         
         # Get stats
-        stats = {
-            'total': Comment.query.count(),
-            'pending': Comment.query.filter(Comment.status == 'pending').count(),
-            'approved': Comment.query.filter(Comment.status == 'approved').count(),
-            'spam': Comment.query.filter(Comment.status == 'spam').count(),
-            'trash': Comment.query.filter(Comment.status == 'trash').count(),
-        }
+        stats = comment_status_counts()
         
-        return jsonify({
-            'comments': [comment.to_dict() for comment in comments.items],
-            'current_page': comments.page,
-            'pages': comments.pages,
-            'total': comments.total,
-            'per_page': per_page,
-            'stats': stats
-        })
+        return json_list_response(
+            comments.items, fieldset.serialize if fieldset else serialize_comments,
+            key='comments', current_page=comments.page, pages=comments.pages,
+            total=comments.total, per_page=per_page, stats=stats
+        )
         
+    except FieldsetError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -854,6 +1051,9 @@ def update_comment_admin(comment_id):
         if 'author_website' in data:
             comment.author_website = data['author_website']
         
+        if 'status' in data:
+            db.session.flush()
+            refresh_post_comment_stats([comment.post_id])
         db.session.commit()
         return jsonify(comment.to_dict())
         
@@ -865,13 +1065,10 @@ def update_comment_admin(comment_id):
 @role_required(['admin', 'editor'])
 def delete_comment_admin(comment_id):
     try:
-        comment = Comment.query.get_or_404(comment_id)
-        
-        # Delete all replies first
-        Comment.query.filter(Comment.parent_id == comment_id).delete()
+        Comment.query.get_or_404(comment_id)
         
-        # Delete the comment
-        db.session.delete(comment)
+        # Delete the comment and every reply below it
+        delete_comments([comment_id])
         db.session.commit()
         
         return jsonify({'message': 'Comment deleted successfully'})
@@ -884,36 +1081,36 @@ def delete_comment_admin(comment_id):
 @role_required(['admin', 'editor'])
 def bulk_comment_action():
     try:
-        data = request.get_json()
-        comment_ids = data.get('comment_ids', [])
+        data = request.get_json() or {}
+        # The admin UI sends ``ids``; ``comment_ids`` is the original name
+        comment_ids = data.get('comment_ids') or data.get('ids') or []
+        filters = data.get('filter')
         action = data.get('action')
         
-        if not comment_ids or not action:
-            return jsonify({'error': 'Comment IDs and action are required'}), 400
-        
-        comments = Comment.query.filter(Comment.id.in_(comment_ids)).all()
-        
-        if action == 'approve':
-            for comment in comments:
-                comment.status = 'approved'
-        elif action == 'spam':
-            for comment in comments:
-                comment.status = 'spam'
-        elif action == 'trash':
-            for comment in comments:
-                comment.status = 'trash'
-        elif action == 'delete':
-            # Delete replies first
-            Comment.query.filter(Comment.parent_id.in_(comment_ids)).delete()
-            # Delete comments
-            Comment.query.filter(Comment.id.in_(comment_ids)).delete()
-        else:
-            return jsonify({'error': 'Invalid action'}), 400
+        if not action or not (comment_ids or filters):
+            return jsonify({'error': 'Action and comment IDs or a filter are required'}), 400
+        if comment_ids and filters:
+            return jsonify({'error': 'Send either comment IDs or a filter, not both'}), 400
+        
+        try:
+            if action == 'delete':
+                affected = delete_comments(comment_ids, filters)
+            elif action in COMMENT_ACTIONS:
+                affected = set_comment_status(COMMENT_ACTIONS[action], comment_ids, filters)
+            else:
+                return jsonify({'error': 'Invalid action'}), 400
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
         
         db.session.commit()
-        return jsonify({'message': f'Bulk action {action} completed successfully'})
+        return jsonify({
+            'message': f'Bulk action {action} completed successfully',
+            'affected': affected
+        })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/comments/<int:comment_id>/reply', methods=['POST'])
@@ -942,6 +1139,8 @@ def reply_to_comment(comment_id):
         )
         
         db.session.add(reply)
+        db.session.flush()
+        refresh_post_comment_stats([reply.post_id])
         db.session.commit()
         
         return jsonify(reply.to_dict()), 201
@@ -953,25 +1152,30 @@ def reply_to_comment(comment_id):
 @jwt_required()
 @role_required(['admin', 'editor'])
 def get_posts_list():
-    """Get a simple list of posts for dropdowns/filters"""
+    """Get posts that have comments, most commented first, for dropdowns/filters.
+    
+    Optional ``q`` matches the start of the title and ``limit`` caps the list (default 50).
+    """
     try:
-        # Only get posts that have comments
-        posts_with_comments = db.session.query(Post).join(Comment).distinct().all()
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 500)
+        prefix = request.args.get('q', '').strip()
         
-        posts_list = [
-            {
-                'id': post.id,
-                'title': post.title,
-                'slug': post.slug,
-                'comment_count': Comment.query.filter_by(post_id=post.id).count()
-            }
-            for post in posts_with_comments
-        ]
+        comment_count = func.count(Comment.id).label('comment_count')
+        query = db.session.query(Post.id, Post.title, Post.slug, comment_count).join(
+            Comment, Comment.post_id == Post.id
+        )
+        if prefix:
+            escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query = query.filter(Post.title.like(f'{escaped}%', escape='\\'))
         
-        # Sort by comment count descending
-        posts_list.sort(key=lambda x: x['comment_count'], reverse=True)
+        rows = query.group_by(Post.id, Post.title, Post.slug).order_by(
+            comment_count.desc(), Post.id.desc()
+        ).limit(limit).all()
         
-        return jsonify(posts_list)
+        return jsonify([
+            {'id': row.id, 'title': row.title, 'slug': row.slug, 'comment_count': row.comment_count}
+            for row in rows
+        ])
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -981,29 +1185,24 @@ def get_posts_list():
 def get_tags():
     """Get all unique tags from all published posts"""
     try:
-        # Get all published posts with their tags
-        posts = Post.query.filter_by(status='published').all()
-        
-        # Collect all unique tags with post count
-        tag_dict = {}
-        for post in posts:
-            for tag in post.tags:
-                if tag.id not in tag_dict:
-                    tag_dict[tag.id] = {
-                        'id': tag.id,
-                        'name': tag.name,
-                        'slug': tag.slug,
-                        'description': tag.description,
-                        'post_count': 1
-                    }
-                else:
-                    tag_dict[tag.id]['post_count'] += 1
-        
-        # Convert to list and sort by post count (most used first)
-        tags_list = list(tag_dict.values())
-        tags_list.sort(key=lambda x: x['post_count'], reverse=True)
-        
-        return jsonify(tags_list)
+        # Tags of published posts with their post count (most used first), counted in SQL
+        post_count = func.count(post_tags.c.post_id).label('post_count')
+        rows = db.session.query(Tag.id, Tag.name, Tag.slug, Tag.description, post_count).join(
+            post_tags, post_tags.c.tag_id == Tag.id
+        ).join(Post, Post.id == post_tags.c.post_id).filter(
+            Post.status == 'published'
+        ).group_by(Tag.id).order_by(post_count.desc(), Tag.id).all()
+        
+        return jsonify([
+            {
+                'id': row.id,
+                'name': row.name,
+                'slug': row.slug,
+                'description': row.description,
+                'post_count': row.post_count
+            }
+            for row in rows
+        ])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1011,29 +1210,15 @@ def get_tags():
 def get_featured_keywords():
     """Get featured keywords (top 5 most popular tags)"""
     try:
-        # Get all published posts with their tags
-        posts = Post.query.filter_by(status='published').all()
-        
-        # Collect all unique tags with post count
-        tag_dict = {}
-        for post in posts:
-            for tag in post.tags:
-                if tag.id not in tag_dict:
-                    tag_dict[tag.id] = {
-                        'name': tag.name,
-                        'post_count': 1
-                    }
-                else:
-                    tag_dict[tag.id]['post_count'] += 1
-        
-        # Convert to list and sort by post count (most used first)
-        tags_list = list(tag_dict.values())
-        tags_list.sort(key=lambda x: x['post_count'], reverse=True)
-        
-        # Return top 5 tag names as featured keywords
-        featured_keywords = [tag['name'] for tag in tags_list[:5]]
-        
-        return jsonify(featured_keywords)
+        # Top 5 tag names by number of published posts
+        post_count = func.count(post_tags.c.post_id)
+        rows = db.session.query(Tag.name).join(
+            post_tags, post_tags.c.tag_id == Tag.id
+        ).join(Post, Post.id == post_tags.c.post_id).filter(
+            Post.status == 'published'
+        ).group_by(Tag.id).order_by(post_count.desc(), Tag.id).limit(5).all()
+        
+        return jsonify([row.name for row in rows])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1137,6 +1322,7 @@ def update_theme_settings(theme_id):
 @app.route('/api/admin/backup', methods=['POST'])
 @jwt_required()
 @role_required(['admin'])
+@timed('cms_backup_duration_seconds', operation='backup')
 def create_backup():
     """Create a backup of the database and media files"""
     import zipfile
@@ -1160,18 +1346,6 @@ def create_backup():
             with open(os.path.join(backup_dir, 'database_not_found.txt'), 'w') as f:
                 f.write(f"Database file not found at {db_path}")
         
-        # All files from uploads directory (app.config['UPLOAD_FOLDER'])
-        uploads_path = os.path.join(os.path.dirname(__file__), 'uploads')
-        if os.path.exists(uploads_path) and os.path.isdir(uploads_path):
-            dest_uploads_path = os.path.join(backup_dir, 'uploads')
-            shutil.copytree(uploads_path, dest_uploads_path)
-            print(f"Backed up uploads from: {uploads_path}")
-        else:
-            print(f"Warning: No uploads directory found at {uploads_path}")
-            os.makedirs(os.path.join(backup_dir, 'uploads'), exist_ok=True)
-            with open(os.path.join(backup_dir, 'uploads', 'uploads_not_found.txt'), 'w') as f:
-                f.write(f"Uploads directory not found at {uploads_path}")
-        
         # Create ZIP file with timestamp in cms-backend/backups directory
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         zip_filename = f'cms_backup_{timestamp}.zip'
@@ -1188,6 +1362,19 @@ def create_backup():
                     # Use forward slashes for archive paths (cross-platform compatibility)
                     arc_path = os.path.relpath(file_path, backup_dir).replace('\\', '/')
                     zipf.write(file_path, arc_path)
+            
+            # All stored media files, streamed from the storage backend into the archive
+            storage = get_storage()
+            uploads_count = 0
+            for key, size, mtime in storage.iter_keys():
+                with closing(storage.open(key)) as src, zipf.open(f'uploads/{key}', 'w', force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                uploads_count += 1
+            if uploads_count:
+                print(f"Backed up {uploads_count} uploads from {storage.name} storage")
+            else:
+                print(f"Warning: No uploads found in {storage.name} storage")
+                zipf.writestr('uploads/uploads_not_found.txt', f"No uploads found in {storage.name} storage")
         
         # Cleanup temp directory
         shutil.rmtree(backup_dir)
@@ -1236,6 +1423,7 @@ def download_backup(filename):
 @app.route('/api/admin/restore', methods=['POST'])
 @jwt_required()
 @role_required(['admin'])
+@timed('cms_backup_duration_seconds', operation='restore')
 def restore_backup():
     """Restore database and media files from backup ZIP"""
     import zipfile
@@ -1298,19 +1486,14 @@ def restore_backup():
         
         # Restore uploads
         restored_uploads = os.path.join(extract_dir, 'uploads')
-        current_uploads = os.path.join(os.getcwd(), 'uploads')
+        storage = get_storage()
         if os.path.exists(restored_uploads):
-            if os.path.exists(current_uploads):
-                # Backup current uploads
-                backup_uploads = os.path.join('backups', f'uploads_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
-                shutil.move(current_uploads, backup_uploads)
-                print(f"Backed up existing uploads to: {backup_uploads}")
-            shutil.copytree(restored_uploads, current_uploads)
-            print(f"Restored uploads to: {current_uploads}")
+            storage.restore_tree(restored_uploads)
+            print(f"Restored uploads to {storage.name} storage")
         else:
             print(f"Warning: No uploads directory found in backup archive")
             # Ensure uploads directory exists
-            os.makedirs(current_uploads, exist_ok=True)
+            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         
         # Cleanup
         os.remove(temp_path)
@@ -1324,5 +1507,6 @@ def restore_backup():
 # File serving
 @app.route('/uploads/<path:filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Local storage sends the file; object storage redirects to the bucket
+    return get_storage().serve(filename)
 
@@ -0,0 +1,278 @@
+"""
+Media storage backends.
+
+Uploaded files are addressed by a storage key such as ``images/<sha256>.png``;
+the public URL stays ``/uploads/<key>`` whichever backend is configured, so
+existing post content keeps working. Select the backend with MEDIA_STORAGE:
+
+- ``local`` (default): files under UPLOAD_FOLDER, served by Flask.
+- ``s3``: any S3-compatible bucket (AWS, MinIO, moto). ``/uploads/<key>``
+  redirects to the bucket and clients can upload directly with presigned posts.
+"""
+
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+from flask import current_app, redirect, send_from_directory
+
+class StorageBackend(ABC):
+    """Interface shared by the storage backends; subclasses must implement every abstract method"""
+
+    name = None
+    supports_direct_upload = False
+
+    def temp_dir(self, key):
+        """Directory for temp files that will be stored under key or key prefix (same filesystem where possible)"""
+        return tempfile.gettempdir()
+
+    @abstractmethod
+    def store(self, temp_path, key, content_type=None):
+        """Move a finished local temp file into storage under key"""
+
+    @abstractmethod
+    def exists(self, key):
+        """Whether key is stored"""
+
+    @abstractmethod
+    def copy(self, source_key, key):
+        """Store a copy of source_key under key"""
+
+    @abstractmethod
+    def delete(self, key):
+        """Delete key; missing keys are not an error"""
+
+    @abstractmethod
+    def open(self, key):
+        """Return a readable binary file object for key"""
+
+    @abstractmethod
+    def iter_keys(self, prefix='', start_after=None):
+        """Yield (key, size, mtime) under prefix in key order, resuming after start_after"""
+
+    @abstractmethod
+    def describe(self, key):
+        """Value stored in Media.file_path for key"""
+
+    @abstractmethod
+    def serve(self, key):
+        """Flask response for GET /uploads/<key>"""
+
+    def presign_upload(self, key, content_type, max_size):
+        """Return {'url', 'fields'} for a direct browser-to-storage upload"""
+        raise NotImplementedError(f"{self.name} storage does not support direct uploads")
+
+    def restore_tree(self, source_dir):
+        """Replace stored files with the contents of an extracted backup directory"""
+        for root, dirs, files in os.walk(source_dir):
+            for filename in files:
+                path = os.path.join(root, filename)
+                key = os.path.relpath(path, source_dir).replace(os.sep, '/')
+                fd, temp_path = tempfile.mkstemp(dir=self.temp_dir(key))
+                os.close(fd)
+                shutil.copyfile(path, temp_path)
+                self.store(temp_path, key)
+
+class LocalStorage(StorageBackend):
+    """Files on the local disk under root (UPLOAD_FOLDER)"""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, key.replace('/', os.sep))
+
+    def temp_dir(self, key):
+        directory = os.path.dirname(self.path(key))
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def store(self, temp_path, key, content_type=None):
+        os.replace(temp_path, self.path(key))
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def copy(self, source_key, key):
+        self.temp_dir(key)
+        shutil.copyfile(self.path(source_key), self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def iter_keys(self, prefix='', start_after=None):
+        def sort_key(entry):
+            # Directories sort as "name/" so traversal order matches plain string order of keys
+            return entry.name + '/' if entry.is_dir(follow_symlinks=False) else entry.name
+
+        def walk(directory, key_prefix):
+            # Skip whole subtrees that sort entirely before the cursor
+            if start_after and key_prefix < start_after and not start_after.startswith(key_prefix):
+                return
+            try:
+                entries = sorted(os.scandir(directory), key=sort_key)
+            except FileNotFoundError:
+                return
+            for entry in entries:
+                key = key_prefix + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    yield from walk(entry.path, key + '/')
+                elif entry.is_file(follow_symlinks=False):
+                    if start_after and key <= start_after:
+                        continue
+                    if not key.startswith(prefix):
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    yield key, stat.st_size, stat.st_mtime
+
+        # Only descend into the directory that holds the prefix
+        base = prefix.rsplit('/', 1)[0] + '/' if '/' in prefix else ''
+        yield from walk(self.path(base) if base else self.root, base)
+
+    def describe(self, key):
+        return self.path(key)
+
+    def serve(self, key):
+        return send_from_directory(self.root, key)
+
+    def restore_tree(self, source_dir):
+        # Keep the previous uploads next to the other backups, as restores always have
+        if os.path.exists(self.root):
+            backups_dir = os.path.join(os.path.dirname(self.root), 'backups')
+            os.makedirs(backups_dir, exist_ok=True)
+            backup_uploads = os.path.join(backups_dir, f'uploads_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
+            shutil.move(self.root, backup_uploads)
+            print(f"Backed up existing uploads to: {backup_uploads}")
+        shutil.copytree(source_dir, self.root)
+
+class S3Storage(StorageBackend):
+    """Objects in an S3-compatible bucket; works with AWS, MinIO and moto"""
+
+    name = 's3'
+    supports_direct_upload = True
+
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 prefix='', public_url=None, url_expires=3600):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError('MEDIA_STORAGE=s3 requires boto3 (pip install boto3)')
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expires = url_expires
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key
+        )
+
+    def object_key(self, key):
+        return self.prefix + key
+
+    def store(self, temp_path, key, content_type=None):
+        extra = {'ContentType': content_type} if content_type else None
+        try:
+            self.client.upload_file(temp_path, self.bucket, self.object_key(key), ExtraArgs=extra)
+        finally:
+            os.remove(temp_path)
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.object_key(key))['Body']
+
+    def copy(self, source_key, key):
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            CopySource={'Bucket': self.bucket, 'Key': self.object_key(source_key)}
+        )
+
+    def iter_keys(self, prefix='', start_after=None):
+        paginator = self.client.get_paginator('list_objects_v2')
+        params = {'Bucket': self.bucket, 'Prefix': self.object_key(prefix)}
+        if start_after:
+            params['StartAfter'] = self.object_key(start_after)
+        for page in paginator.paginate(**params):
+            for obj in page.get('Contents', []):
+                yield obj['Key'][len(self.prefix):], obj['Size'], obj['LastModified'].timestamp()
+
+    def describe(self, key):
+        return f"s3://{self.bucket}/{self.object_key(key)}"
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url}/{self.object_key(key)}"
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self.object_key(key)},
+            ExpiresIn=self.url_expires
+        )
+
+    def serve(self, key):
+        response = redirect(self.url(key), code=302)
+        # Let browsers reuse the redirect for part of the presigned URL lifetime
+        response.headers['Cache-Control'] = f'private, max-age={self.url_expires // 2}'
+        return response
+
+    def presign_upload(self, key, content_type, max_size):
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=self.object_key(key),
+            Fields={'Content-Type': content_type},
+            Conditions=[
+                {'Content-Type': content_type},
+                ['content-length-range', 1, max_size]
+            ],
+            ExpiresIn=self.url_expires
+        )
+
+def create_storage(config):
+    """Build the storage backend selected by MEDIA_STORAGE"""
+    backend = config.get('MEDIA_STORAGE', 'local')
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if backend == 's3':
+        return S3Storage(
+            bucket=config['S3_BUCKET'],
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region=config.get('S3_REGION'),
+            access_key=config.get('S3_ACCESS_KEY_ID'),
+            secret_key=config.get('S3_SECRET_ACCESS_KEY'),
+            prefix=config.get('S3_PREFIX', ''),
+            public_url=config.get('S3_PUBLIC_URL'),
+            url_expires=int(config.get('S3_URL_EXPIRES', 3600))
+        )
+    raise RuntimeError(f"Unknown MEDIA_STORAGE backend: {backend}")
+
+def get_storage():
+    """Storage backend for the current app, created on first use"""
+    storage = current_app.extensions.get('media_storage')
+    if storage is None:
+        storage = current_app.extensions['media_storage'] = create_storage(current_app.config)
+    return storage
@@ -40,6 +40,7 @@ function App() {
           <Route index element={<HomePage />} />
           <Route path="post/:slug" element={<PostPage />} />
           <Route path="category/:slug" element={<CategoryPage />} />
+          <Route path="tag/:slug" element={<CategoryPage kind="tag" />} />
           <Route path="search" element={<SearchResultsPage />} />
           <Route path="about" element={<AboutPage />} />
           <Route path="contact" element={<ContactPage />} />
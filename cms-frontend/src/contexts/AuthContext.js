@@ -39,9 +39,10 @@ export const AuthProvider = ({ children }) => {
   const login = async (credentials) => {
     try {
       const response = await apiService.login(credentials);
-      const { access_token, user } = response;
+      const { access_token, refresh_token, user } = response;
 
       localStorage.setItem('token', access_token);
+      localStorage.setItem('refresh_token', refresh_token);
       localStorage.setItem('user', JSON.stringify(user));
       setUser(user);
 
@@ -67,8 +68,11 @@ export const AuthProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+    if (localStorage.getItem('token')) {
+      // Revoke the tokens server-side; the local session ends either way
+      apiService.logout().catch(() => {});
+    }
+    apiService.clearSession();
     setUser(null);
     toast.success('Logged out successfully');
   };
@@ -77,11 +77,8 @@ const Dashboard = () => {
   const handleCreateBackup = async () => {
     try {
       setBackupLoading(true);
-      const response = await fetch('/api/admin/backup', {
+      const response = await apiService.authorizedFetch('/api/admin/backup', {
         method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('token')}`,
-        },
       });
 
       if (!response.ok) {
@@ -128,11 +125,8 @@ const Dashboard = () => {
             const formData = new FormData();
             formData.append('backup', file);
             
-            const response = await fetch('/api/admin/restore', {
+            const response = await apiService.authorizedFetch('/api/admin/restore', {
               method: 'POST',
-              headers: {
-                'Authorization': `Bearer ${localStorage.getItem('token')}`,
-              },
               body: formData,
             });
 
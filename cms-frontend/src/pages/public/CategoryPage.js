@@ -23,7 +23,8 @@ import apiService from '../../services/api';
 import getCategoryColor from '../../utils/categoryColors';
 import CleanSearch from '../../components/CleanSearch';
 
-const CategoryPage = () => {
+// Also lists the posts of a tag, at /tag/:slug
+const CategoryPage = ({ kind = 'category' }) => {
   const [posts, setPosts] = useState([]);
   const [category, setCategory] = useState(null);
   const [categories, setCategories] = useState([]);
@@ -40,28 +41,29 @@ const CategoryPage = () => {
     fetchCategories();
     fetchTags();
     fetchRecentPosts();
-  }, [slug, page]);
+  }, [kind, slug, page]);
 
 
   const fetchCategoryPosts = async () => {
     try {
       setLoading(true);
-      // First, get categories to find the category details
-      const categories = await apiService.getCategories();
-      const currentCategory = categories.find(cat => cat.slug === slug);
+      // First, get the categories (or tags) to find the one shown here
+      const found = kind === 'tag' ? await apiService.getTags() : await apiService.getCategories();
+      const currentCategory = (found || []).find(item => item.slug === slug);
       setCategory(currentCategory);
 
       if (currentCategory) {
+        const filter = kind === 'tag' ? { tag: slug } : { category_id: currentCategory.id };
         const response = await apiService.getPosts({
           page,
           per_page: 12,
           status: 'published',
-          category_id: currentCategory.id,
+          ...filter,
         });
         setPosts(response.posts);
         setTotalPages(response.pages);
       } else {
-        setError('Category not found');
+        setError(kind === 'tag' ? 'Tag not found' : 'Category not found');
       }
     } catch (error) {
       console.error('Failed to fetch category posts:', error);
@@ -144,7 +146,7 @@ const CategoryPage = () => {
           Home
         </Link>
         <Typography color="text.primary" sx={{ display: 'flex', alignItems: 'center' }}>
-          <Category sx={{ mr: 0.5 }} fontSize="inherit" />
+          {kind === 'tag' ? <LocalOffer sx={{ mr: 0.5 }} fontSize="inherit" /> : <Category sx={{ mr: 0.5 }} fontSize="inherit" />}
           {category?.name || slug}
         </Typography>
       </Breadcrumbs>
@@ -192,7 +194,7 @@ const CategoryPage = () => {
                         },
                       }}
                     >
-                      <Typography variant="body2" className="category-name" sx={{ fontWeight: cat.slug === slug ? 600 : 500, transition: 'color 0.2s ease-in-out' }}>
+                      <Typography variant="body2" className="category-name" sx={{ fontWeight: kind === 'category' && cat.slug === slug ? 600 : 500, transition: 'color 0.2s ease-in-out' }}>
                         {cat.name}
                       </Typography>
                       <ChevronRight sx={{ fontSize: 16, opacity: 0.7 }} />
@@ -220,7 +222,7 @@ const CategoryPage = () => {
                       key={tag.id}
                       label={tag.name}
                       component={Link}
-                      to={`/search?q=${encodeURIComponent(tag.name)}`}
+                      to={`/tag/${tag.slug}`}
                       clickable
                       size="small"
                       sx={{
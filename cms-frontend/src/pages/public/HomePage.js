@@ -416,7 +416,7 @@ const HomePage = () => {
                         key={tag.id}
                         label={tag.name}
                         component={Link}
-                        to={`/search?q=${encodeURIComponent(tag.name)}`}
+                        to={`/tag/${tag.slug}`}
                         clickable
                         size="small"
                         sx={{
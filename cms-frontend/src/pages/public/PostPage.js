@@ -42,6 +42,29 @@ import apiService from '../../services/api';
 import getCategoryColor from '../../utils/categoryColors';
 import CleanSearch from '../../components/CleanSearch';
 
+// Replies nest to any depth (an admin may answer a reply), so each one renders its own replies
+const CommentReplies = ({ replies }) => {
+  if (!replies || replies.length === 0) return null;
+  return (
+    <Box sx={{ mt: 2, pl: 2, borderLeft: 2, borderColor: 'divider', display: 'flex', flexDirection: 'column', gap: 1.5 }}>
+      {replies.map((reply) => (
+        <Box key={reply.id}>
+          <Typography variant="subtitle2" fontWeight={600}>
+            {reply.author_name || 'Anonymous'}
+          </Typography>
+          <Typography variant="caption" color="text.secondary">
+            {reply.created_at ? format(new Date(reply.created_at), 'MMM dd, yyyy at h:mm a') : ''}
+          </Typography>
+          <Typography variant="body2" color="text.primary">
+            {reply.content}
+          </Typography>
+          <CommentReplies replies={reply.replies} />
+        </Box>
+      ))}
+    </Box>
+  );
+};
+
 const PostPage = () => {
   const [post, setPost] = useState(null);
   const [categories, setCategories] = useState([]);
@@ -274,7 +297,7 @@ const PostPage = () => {
                         key={tag.id}
                         label={tag.name}
                         component={Link}
-                        to={`/search?q=${encodeURIComponent(tag.name)}`}
+                        to={`/tag/${tag.slug}`}
                         clickable
                         size="small"
                         sx={{
@@ -388,7 +411,7 @@ const PostPage = () => {
               key={tag.id}
               label={tag.name}
               component={Link}
-              to={`/search?q=${encodeURIComponent(tag.name)}`}
+              to={`/tag/${tag.slug}`}
               clickable
               size="small"
               sx={{
@@ -478,7 +501,7 @@ const PostPage = () => {
                   key={tag.id}
                   label={tag.name}
                   component={Link}
-                  to={`/search?q=${encodeURIComponent(tag.name)}`}
+                  to={`/tag/${tag.slug}`}
                   clickable
                   size="small"
                   sx={{
@@ -640,6 +663,7 @@ const PostPage = () => {
                         <Typography variant="body2" color="text.primary">
                           {comment.content}
                         </Typography>
+                        <CommentReplies replies={comment.replies} />
                       </Box>
                     </Box>
                   </CardContent>
@@ -198,7 +198,7 @@ const SearchResultsPage = () => {
                       key={tag.id}
                       label={tag.name}
                       component={Link}
-                      to={`/search?q=${encodeURIComponent(tag.name)}`}
+                      to={`/tag/${tag.slug}`}
                       clickable
                       size="small"
                       sx={{
@@ -2,6 +2,24 @@ import axios from 'axios';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || '';
 
+// API responses embedded in a prerendered page (cms-backend/prerender.py): {path, responses}, keyed like prerenderedKey()
+const readPrerendered = () => {
+  try {
+    return JSON.parse(document.getElementById('prerendered-data')?.textContent || 'null');
+  } catch (error) {
+    return null;
+  }
+};
+
+const prerenderedKey = (url, params = {}) => {
+  const query = Object.keys(params)
+    .filter((key) => params[key] !== undefined && params[key] !== null && params[key] !== '')
+    .sort()
+    .map((key) => `${encodeURIComponent(key)}=${encodeURIComponent(params[key])}`)
+    .join('&');
+  return query ? `${url}?${query}` : url;
+};
+
 class ApiService {
   constructor() {
     this.client = axios.create({
@@ -19,12 +37,27 @@ class ApiService {
       return config;
     });
 
+    this.refreshPromise = null;
+    this.prerendered = readPrerendered();
+
     this.client.interceptors.response.use(
       (response) => response,
-      (error) => {
-        if (error.response?.status === 401) {
-          localStorage.removeItem('token');
-          localStorage.removeItem('user');
+      async (error) => {
+        const original = error.config;
+        const isAuthCall = original?.url?.startsWith('/auth/');
+        // Access tokens are short-lived: renew once with the refresh token and retry
+        if (error.response?.status === 401 && original && !original._retried && !isAuthCall) {
+          original._retried = true;
+          try {
+            const token = await this.refreshAccessToken();
+            original.headers.Authorization = `Bearer ${token}`;
+            return this.client(original);
+          } catch (refreshError) {
+            // Fall through to the login redirect
+          }
+        }
+        if (error.response?.status === 401 && original?.url !== '/auth/login') {
+          this.clearSession();
           window.location.href = '/login';
         }
         return Promise.reject(error);
@@ -32,6 +65,61 @@ class ApiService {
     );
   }
 
+  clearSession = () => {
+    localStorage.removeItem('token');
+    localStorage.removeItem('refresh_token');
+    localStorage.removeItem('user');
+  };
+
+  refreshAccessToken = () => {
+    // Concurrent 401s share one refresh request
+    if (!this.refreshPromise) {
+      const refreshToken = localStorage.getItem('refresh_token');
+      this.refreshPromise = (refreshToken
+        ? axios.post(`${API_BASE_URL}/api/auth/refresh`, null, {
+            headers: { Authorization: `Bearer ${refreshToken}` },
+          }).then((response) => {
+            localStorage.setItem('token', response.data.access_token);
+            return response.data.access_token;
+          })
+        : Promise.reject(new Error('No refresh token'))
+      ).finally(() => {
+        this.refreshPromise = null;
+      });
+    }
+    return this.refreshPromise;
+  };
+
+  // fetch() with the access token, renewed once on 401 (for requests axios cannot make, e.g. blob downloads)
+  authorizedFetch = async (url, options = {}) => {
+    const send = () => fetch(url, {
+      ...options,
+      headers: { ...options.headers, Authorization: `Bearer ${localStorage.getItem('token')}` },
+    });
+    let response = await send();
+    if (response.status === 401) {
+      try {
+        await this.refreshAccessToken();
+        response = await send();
+      } catch (error) {
+        // Return the original 401
+      }
+    }
+    return response;
+  };
+
+  // The embedded response for this request while still on the prerendered page; dropped on the first navigation
+  takePrerendered = (url, params) => {
+    if (!this.prerendered) {
+      return undefined;
+    }
+    if (window.location.pathname !== this.prerendered.path) {
+      this.prerendered = null;
+      return undefined;
+    }
+    return this.prerendered.responses[prerenderedKey(url, params)];
+  };
+
   // Auth endpoints
   login = async (credentials) => {
     const response = await this.client.post('/auth/login', credentials);
@@ -43,6 +131,15 @@ class ApiService {
     return response.data;
   };
 
+  logout = async () => {
+    // Read the tokens now: the caller clears the session right after calling this
+    const token = localStorage.getItem('token');
+    const refreshToken = localStorage.getItem('refresh_token');
+    await axios.post(`${API_BASE_URL}/api/auth/logout`, { refresh_token: refreshToken }, {
+      headers: { Authorization: `Bearer ${token}` },
+    });
+  };
+
   getCurrentUser = async () => {
     const response = await this.client.get('/auth/me');
     return response.data;
@@ -50,11 +147,19 @@ class ApiService {
 
   // Posts endpoints
   getPosts = async (params = {}) => {
+    const prerendered = this.takePrerendered('/posts', params);
+    if (prerendered !== undefined) {
+      return prerendered;
+    }
     const response = await this.client.get('/posts', { params });
     return response.data;
   };
 
   getPost = async (slug) => {
+    const prerendered = this.takePrerendered(`/posts/${slug}`);
+    if (prerendered !== undefined) {
+      return prerendered;
+    }
     const response = await this.client.get(`/posts/${slug}`);
     return response.data;
   };
@@ -75,6 +180,10 @@ class ApiService {
 
   // Categories endpoints
   getCategories = async () => {
+    const prerendered = this.takePrerendered('/categories');
+    if (prerendered !== undefined) {
+      return prerendered;
+    }
     const response = await this.client.get('/categories');
     return response.data;
   };
@@ -101,6 +210,10 @@ class ApiService {
 
   // Tags endpoints
   getTags = async () => {
+    const prerendered = this.takePrerendered('/tags');
+    if (prerendered !== undefined) {
+      return prerendered;
+    }
     const response = await this.client.get('/tags');
     return response.data;
   };
@@ -175,13 +288,18 @@ class ApiService {
     await this.client.delete(`/comments/${id}`);
   };
 
+  bulkUpdateComments = async (actionData) => {
+    const response = await this.client.post('/comments/bulk', actionData);
+    return response.data;
+  };
+
   getCommentStats = async () => {
     const response = await this.client.get('/comments', { params: { per_page: 1 } });
     return response.data.stats;
   };
 
-  getPostsList = async () => {
-    const response = await this.client.get('/posts/list');
+  getPostsList = async (params = {}) => {
+    const response = await this.client.get('/posts/list', { params });
     return response.data;
   };
 
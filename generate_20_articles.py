@@ -6,6 +6,8 @@ Generate 20 additional biotechnology articles for the CMS blog
 import requests
 import json
 import random
+import sys
+import time
 from datetime import datetime, timedelta
 
 # Configuration
@@ -964,6 +966,37 @@ def create_article(token, article_data):
         print(f"Error creating article: {e}")
         return None
 
+def create_articles_bulk(token, articles):
+    """Create all articles in one request through the NDJSON bulk endpoint"""
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/x-ndjson'
+    }
+    body = '\n'.join(json.dumps(article, ensure_ascii=False) for article in articles).encode('utf-8')
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/posts/bulk",
+            data=body,
+            headers=headers,
+            timeout=300
+        )
+        
+        if response.status_code in (200, 207):
+            result = response.json()
+            for item in result['results']:
+                if item['status'] != 'created':
+                    print(f"Failed to create article on line {item['line']}: {item['error']}")
+            print(f"Bulk import created {result['created']} articles, {result['failed']} failed")
+            return [item for item in result['results'] if item['status'] == 'created']
+        else:
+            print(f"Bulk import failed: {response.status_code}")
+            print(f"   Response: {response.text}")
+            return []
+    except Exception as e:
+        print(f"Error during bulk import: {e}")
+        return []
+
 def main():
     print("Generating 20 Biotechnology Articles")
     print("=" * 50)
@@ -982,15 +1015,18 @@ def main():
     print("Creating sample articles...")
     created_articles = []
     
-    for i, article in enumerate(BIOTECHNOLOGY_ARTICLES, 1):
-        print(f"Creating article {i}/{len(BIOTECHNOLOGY_ARTICLES)}...")
-        created_article = create_article(token, article)
-        if created_article:
-            created_articles.append(created_article)
-        
-        # Small delay to avoid overwhelming server
-        import time
-        time.sleep(0.5)
+    if '--bulk' in sys.argv:
+        # One request for all articles; tags, slugs and inserts are batched server-side
+        created_articles = create_articles_bulk(token, BIOTECHNOLOGY_ARTICLES)
+    else:
+        for i, article in enumerate(BIOTECHNOLOGY_ARTICLES, 1):
+            print(f"Creating article {i}/{len(BIOTECHNOLOGY_ARTICLES)}...")
+            created_article = create_article(token, article)
+            if created_article:
+                created_articles.append(created_article)
+            
+            # Small delay to avoid overwhelming server
+            time.sleep(0.5)
     
     print()
     print("=" * 50)
@@ -6,6 +6,7 @@ Generate sample biotechnology articles for the CMS blog
 import requests
 import json
 import random
+import sys
 from datetime import datetime, timedelta
 
 # Configuration
@@ -238,18 +239,13 @@ def get_auth_token():
         print(f"Login error: {e}")
         return None
 
-def create_article(token, article_data):
-    """Create a single article"""
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
-    
+def build_post_data(article_data):
+    """Add publishing fields to an article"""
     # Add some randomness to publication date
     days_ago = random.randint(1, 30)
     pub_date = datetime.now() - timedelta(days=days_ago)
     
-    post_data = {
+    return {
         **article_data,
         'status': 'published',
         'post_type': 'post',
@@ -257,6 +253,15 @@ def create_article(token, article_data):
         'published_at': pub_date.isoformat(),
         'tags': ['công nghệ sinh học', 'khoa học', 'y học']
     }
+
+def create_article(token, article_data):
+    """Create a single article"""
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
+    
+    post_data = build_post_data(article_data)
     
     try:
         response = requests.post(
@@ -278,6 +283,37 @@ def create_article(token, article_data):
         print(f"Error creating article: {e}")
         return None
 
+def create_articles_bulk(token, articles):
+    """Create all articles in one request through the NDJSON bulk endpoint"""
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/x-ndjson'
+    }
+    body = '\n'.join(json.dumps(article, ensure_ascii=False) for article in articles).encode('utf-8')
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/posts/bulk",
+            data=body,
+            headers=headers,
+            timeout=300
+        )
+        
+        if response.status_code in (200, 207):
+            result = response.json()
+            for item in result['results']:
+                if item['status'] != 'created':
+                    print(f"Failed to create article on line {item['line']}: {item['error']}")
+            print(f"Bulk import created {result['created']} articles, {result['failed']} failed")
+            return [item for item in result['results'] if item['status'] == 'created']
+        else:
+            print(f"Bulk import failed: {response.status_code}")
+            print(f"   Response: {response.text}")
+            return []
+    except Exception as e:
+        print(f"Error during bulk import: {e}")
+        return []
+
 def main():
     print("Generating Biotechnology Sample Articles")
     print("=" * 50)
@@ -296,11 +332,16 @@ def main():
     print("Creating sample articles...")
     created_articles = []
     
-    for i, article in enumerate(BIOTECHNOLOGY_ARTICLES, 1):
-        print(f"Creating article {i}/{len(BIOTECHNOLOGY_ARTICLES)}...")
-        created_article = create_article(token, article)
-        if created_article:
-            created_articles.append(created_article)
+    if '--bulk' in sys.argv:
+        # One request for all articles; tags, slugs and inserts are batched server-side
+        articles = [build_post_data(article) for article in BIOTECHNOLOGY_ARTICLES]
+        created_articles = create_articles_bulk(token, articles)
+    else:
+        for i, article in enumerate(BIOTECHNOLOGY_ARTICLES, 1):
+            print(f"Creating article {i}/{len(BIOTECHNOLOGY_ARTICLES)}...")
+            created_article = create_article(token, article)
+            if created_article:
+                created_articles.append(created_article)
     
     print()
     print("=" * 50)
@@ -11,7 +11,7 @@ sys.path.insert(0, cms_backend_path)
 os.chdir(cms_backend_path)
 
 # Import the Flask app from app_unified
-from app_unified import app
+from app_unified import app, ensure_initialized
 
 # Make the app available for gunicorn at root level
 app = app
@@ -19,4 +19,5 @@ app = app
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') != 'production'
+    ensure_initialized()
     app.run(debug=debug, host='0.0.0.0', port=port)
\ No newline at end of file